@@ -0,0 +1,269 @@
+"""Vectorized Monte Carlo balance simulator for role mixes and special events.
+
+Кожна гра - рядок масивів NumPy (живі, ролі, предмети), усі ігри пакета
+проходять ніч і день одночасно, тому мільйони ігор з ботами рахуються за
+секунди. Правила ті ж, що в GameEngine для ботів: мафія вбиває випадкового
+мирного, лікар рятує випадкового гравця, 80% ботів висувають випадкового
+кандидата (нічия або ніхто - день пропущено), ЗА/ПРОТИ - навпіл.
+Шанси предметів беруться з SPECIAL_EVENTS, решта ймовірностей - з engine.
+
+Ефекти предметів, яких ще немає в рушії, змодельовані за описом у
+config: мізки рятують від мафії одну ніч, одеський гумор - від одного
+виключення, кава на ботів не впливає. Картоплю бот кидає першої ночі.
+З --detective детектив перевіряє гравців і голосує проти знайденої
+мафії - тоді помилка детектива впливає на результат.
+
+NumPy потрібен лише для симулятора: pip install numpy
+
+Запуск:
+    python balance.py --games 1000000 --players 5-15 --mafia default,1,2
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import SPECIAL_EVENTS
+from engine import BOT_VOTE_CHANCE, DETECTIVE_ERROR_CHANCE, POTATO_HIT_CHANCE
+
+# Ролі в масивах
+DEMYAN, KISHKEL, ROHALSKYI, DETECTIVE, FEDORCHAK = range(5)
+MAFIA = (KISHKEL, ROHALSKYI)
+
+# Предмети в масивах
+NO_ITEM, POTATO, BRAIN, COFFEE, HUMOR = range(5)
+ITEM_CODES = {'potato': POTATO, 'brain': BRAIN, 'coffee': COFFEE, 'humor': HUMOR}
+
+# Ігор в одному пакеті (обмежує пам'ять: ~10 масивів games x players)
+BATCH = 200_000
+
+
+def role_layout(players: int, mafia: Optional[int] = None) -> np.ndarray:
+    """Ролі за місцями, як у assign_roles (боти однакові, тож порядок не важливий)"""
+    if mafia is None:
+        mafia = 2 if players >= 7 else 1
+    roles = [KISHKEL, ROHALSKYI, ROHALSKYI][:mafia] + [DETECTIVE, FEDORCHAK]
+    roles += [DEMYAN] * (players - len(roles))
+    return np.array(roles[:players], dtype=np.int8)
+
+
+def pick(valid: np.ndarray, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """Випадковий індекс серед valid у кожному рядку; (індекси, чи був вибір)"""
+    count = valid.sum(axis=1)
+    # Дійсні місця першими, далі r-те з них
+    order = np.argsort(~valid, axis=1, kind='stable')
+    r = (rng.random(len(valid)) * count).astype(np.intp)
+    chosen = np.take_along_axis(order, np.minimum(r, valid.shape[1] - 1)[:, None], axis=1)[:, 0]
+    return chosen, count > 0
+
+
+def pick_each(valid: np.ndarray, exclude_self: bool, rng: np.random.Generator) -> np.ndarray:
+    """Випадкова дійсна ціль для кожного гравця кожної гри (без себе)"""
+    games, players = valid.shape
+    count = valid.sum(axis=1)[:, None]
+    order = np.argsort(~valid, axis=1, kind='stable')
+    # Місце гравця серед дійсних: ціль обирається з count-1 інших
+    rank = np.cumsum(valid, axis=1) - 1
+    r = (rng.random((games, players)) * np.maximum(count - exclude_self, 1)).astype(np.intp)
+    if exclude_self:
+        r += valid & (r >= rank)
+    return np.take_along_axis(order, np.minimum(r, players - 1), axis=1)
+
+
+class Batch:
+    """Пакет однакових ігор (кількість гравців, подія, ролі) у масивах"""
+
+    def __init__(self, games: int, roles: np.ndarray, event: Optional[str],
+                 rng: np.random.Generator, informed_detective: bool = False):
+        self.rng = rng
+        self.games = games
+        self.players = len(roles)
+        self.informed_detective = informed_detective
+        self.roles = np.broadcast_to(roles, (games, self.players))
+        self.is_mafia = np.isin(self.roles, MAFIA)
+        self.alive = np.ones((games, self.players), dtype=bool)
+        self.active = np.ones(games, dtype=bool)
+        self.winner_mafia = np.zeros(games, dtype=bool)
+        self.rows = np.arange(games)
+        self.items = np.zeros((games, self.players), dtype=np.int8)
+        if event:
+            spec = SPECIAL_EVENTS[event]
+            given = rng.random((games, self.players)) < spec['item_chance']
+            self.items[given] = ITEM_CODES[spec['special_item']]
+        self.suspect = np.full(games, -1)  # кого детектив вважає мафією
+        self.nights = 0
+
+    def _seat(self, role: int) -> int:
+        seats = np.flatnonzero(self.roles[0] == role)
+        return int(seats[0]) if len(seats) else -1
+
+    def check_victory(self):
+        """Завершує ігри, де одна з команд перемогла"""
+        mafia_alive = (self.alive & self.is_mafia).sum(axis=1)
+        citizens_alive = (self.alive & ~self.is_mafia).sum(axis=1)
+        citizens_won = self.active & (mafia_alive == 0)
+        mafia_won = self.active & (mafia_alive > 0) & (mafia_alive >= citizens_alive)
+        self.winner_mafia |= mafia_won
+        self.active &= ~(citizens_won | mafia_won)
+
+    def night(self):
+        rng, rows, alive = self.rng, self.rows, self.alive
+        self.nights += 1
+        victims = np.zeros_like(alive)
+
+        # Мафія: випадковий живий мирний (рішення останнього мафіозі = випадкове)
+        mafia_acts = (alive & self.is_mafia).any(axis=1)
+        target, has_target = pick(alive & ~self.is_mafia, rng)
+        kill = self.active & mafia_acts & has_target
+
+        # Лікар: випадковий живий гравець, крім себе
+        doctor = self._seat(FEDORCHAK)
+        if doctor >= 0:
+            candidates = alive.copy()
+            candidates[:, doctor] = False
+            healed, has_heal = pick(candidates, rng)
+            kill &= ~(alive[:, doctor] & has_heal & (healed == target))
+
+        # Мізки захищають від мафії одну ніч
+        brain = kill & (self.items[rows, target] == BRAIN)
+        self.items[rows[brain], target[brain]] = NO_ITEM
+        kill &= ~brain
+        victims[rows[kill], target[kill]] = True
+
+        # Картопля: бот кидає першої ночі, влучання вбиває
+        if self.nights == 1:
+            throwers = self.active[:, None] & alive & (self.items == POTATO)
+            if throwers.any():
+                targets = pick_each(alive, True, rng)
+                hit = throwers & (rng.random(alive.shape) < POTATO_HIT_CHANCE)
+                game_idx, seat = np.nonzero(hit)
+                victims[game_idx, targets[game_idx, seat]] = True
+                self.items[throwers] = NO_ITEM
+
+        # Детектив перевіряє випадкового гравця (Дон має імунітет)
+        detective = self._seat(DETECTIVE)
+        if self.informed_detective and detective >= 0:
+            candidates = alive.copy()
+            candidates[:, detective] = False
+            checked, has_check = pick(candidates, rng)
+            role = self.roles[rows, checked]
+            looks_mafia = role == ROHALSKYI
+            error = (role != KISHKEL) & (rng.random(self.games) < DETECTIVE_ERROR_CHANCE)
+            looks_mafia ^= error
+            found = self.active & alive[:, detective] & has_check & looks_mafia
+            self.suspect[found] = checked[found]
+
+        self.alive &= ~(victims & self.active[:, None])
+
+    def day(self):
+        rng, rows, alive = self.rng, self.rows, self.alive
+        games, players = alive.shape
+
+        # Висунення: 80% живих голосують за випадкового іншого, решта пропускає
+        targets = pick_each(alive, True, rng)
+        votes = alive & (rng.random((games, players)) < BOT_VOTE_CHANCE) & (alive.sum(axis=1) > 1)[:, None]
+        detective = self._seat(DETECTIVE)
+        if self.informed_detective and detective >= 0:
+            knows = alive[:, detective] & (self.suspect >= 0) & alive[rows, np.maximum(self.suspect, 0)]
+            targets[knows, detective] = self.suspect[knows]
+            votes[knows, detective] = True
+        game_idx, voter = np.nonzero(votes & self.active[:, None])
+        counts = np.bincount(game_idx * players + targets[game_idx, voter],
+                             minlength=games * players).reshape(games, players)
+        top = counts.max(axis=1)
+        nominee = counts.argmax(axis=1)
+        nominated = self.active & (top > 0) & ((counts == top[:, None]).sum(axis=1) == 1)
+
+        # ЗА/ПРОТИ навпіл; детектив, що знає кандидата-мафію, голосує ЗА
+        voters = alive.sum(axis=1)
+        yes = rng.binomial(voters, 0.5)
+        if self.informed_detective and detective >= 0:
+            sure = nominated & alive[:, detective] & (nominee == self.suspect)
+            # Голос детектива замість випадкового: ЗА з імовірністю 1 замість 1/2
+            yes += sure & (rng.random(games) < 0.5)
+        eliminated = nominated & (yes > voters - yes)
+
+        # Одеський гумор рятує від одного виключення
+        humor = eliminated & (self.items[rows, nominee] == HUMOR)
+        self.items[rows[humor], nominee[humor]] = NO_ITEM
+        eliminated &= ~humor
+        self.alive[rows[eliminated], nominee[eliminated]] = False
+
+    def run(self, max_days: int = 50) -> int:
+        """Проганяє пакет до кінця; повертає кількість перемог мафії"""
+        for _ in range(max_days):
+            self.night()
+            self.check_victory()
+            if not self.active.any():
+                break
+            self.day()
+            self.check_victory()
+            if not self.active.any():
+                break
+        return int(self.winner_mafia.sum())
+
+
+def mafia_win_rate(games: int, players: int, event: Optional[str] = None, mafia: Optional[int] = None,
+                   seed: Optional[int] = None, informed_detective: bool = False) -> float:
+    """Частка перемог мафії в games іграх з ботами"""
+    rng = np.random.default_rng(seed)
+    roles = role_layout(players, mafia)
+    wins = 0
+    for start in range(0, games, BATCH):
+        size = min(BATCH, games - start)
+        wins += Batch(size, roles, event, rng, informed_detective).run()
+    return wins / games
+
+
+def parse_players(text: str) -> List[int]:
+    if '-' in text:
+        low, high = text.split('-')
+        return list(range(int(low), int(high) + 1))
+    return [int(n) for n in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=100_000, help='ігор на кожну клітинку таблиці')
+    parser.add_argument('--players', default='5-15', help='кількість гравців: 5-15 або 5,10,15')
+    parser.add_argument('--events', default='none,' + ','.join(SPECIAL_EVENTS),
+                        help='події через кому (none - без події)')
+    parser.add_argument('--mafia', default='default', help='кількість мафії: default,1,2,3')
+    parser.add_argument('--detective', action='store_true', help='детектив перевіряє і голосує проти мафії')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    players_list = parse_players(args.players)
+    events = [None if e == 'none' else e for e in args.events.split(',')]
+    mafia_list = [None if m == 'default' else int(m) for m in args.mafia.split(',')]
+
+    results: Dict[Tuple, float] = {}
+    total = 0
+    started = time.perf_counter()
+    for mafia in mafia_list:
+        for event in events:
+            for players in players_list:
+                if mafia is not None and mafia + 2 > players:
+                    continue
+                results[(mafia, event, players)] = mafia_win_rate(
+                    args.games, players, event, mafia, args.seed, args.detective)
+                total += args.games
+    elapsed = time.perf_counter() - started
+
+    print("mafia win rate, %")
+    header = f"{'mafia':<8} {'event':<8}" + "".join(f"{p:>6}" for p in players_list)
+    print(header)
+    for mafia in mafia_list:
+        for event in events:
+            cells = "".join(
+                f"{results[(mafia, event, p)] * 100:6.1f}" if (mafia, event, p) in results else f"{'-':>6}"
+                for p in players_list
+            )
+            print(f"{'default' if mafia is None else mafia:<8} {event or 'none':<8}{cells}")
+    print(f"{total} games in {elapsed:.1f} s ({total / elapsed * 60 / 1e6:.1f}M games/min)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark: game duration and resident games with fixed vs adaptive phase timers.
+
+Повні ігри через GameHarness (справжні хендлери, віртуальний годинник).
+Ігри приходять по одній кожні ARRIVAL сек у різному складі - від однієї
+людини з ботами до восьми людей. Люди натискають кнопки через секунду,
+а в обговоренні пишуть у чат випадковий час (0-40 с, повідомлення кожні
+2-10 с), тож тиша настає не одразу.
+
+"fixed" - game_engine.adaptive = False: кожна фаза триває свій таймер
+з config.TIMERS, ніч чекає і на мирних без дій. "adaptive" - як зараз:
+фази закриваються, щойно живим людям нічого робити, обговорення - після
+DISCUSSION_QUIET сек тиші, у грі переважно ботів таймери коротші.
+
+Тривалість гри - віртуальні секунди від /newgame до закриття. Ігри в
+пам'яті - len(mafia_game.games) щосекунди віртуального часу; середнє -
+за час, поки приходять нові ігри (однаковий для обох режимів).
+
+Запуск: python benchmarks/bench_adaptive_timers.py [ігор] [seed]
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DISCUSSION_QUIET  # noqa: E402
+from engine import game_engine  # noqa: E402
+from fake_telegram import text_update  # noqa: E402
+from game_state import mafia_game  # noqa: E402
+from harness import GameHarness  # noqa: E402
+
+ARRIVAL = 15.0  # сек між новими іграми
+MIXES = [(1, 9), (2, 8), (5, 5), (8, 2)]  # (людей, ботів)
+
+
+async def chatter(harness: GameHarness, chat_id: int, rng: random.Random):
+    """Люди пишуть у групу на початку кожного обговорення"""
+    seen = set()
+    while True:
+        game = mafia_game.games.get(chat_id)
+        if game is not None and game.phase == 'discussion' and game.generation not in seen:
+            seen.add(game.generation)
+            generation = game.generation
+            until = harness.clock.now() + rng.uniform(0, 40)
+            while harness.clock.now() < until and game.generation == generation and game.alive_humans:
+                user_id = rng.choice(sorted(game.alive_humans))
+                await harness.send(text_update(chat_id, user_id, "Я думаю, це він!"))
+                await harness.clock.sleep(rng.uniform(2, 10))
+        await harness.clock.sleep(1.0)
+
+
+async def run(games: int, adaptive: bool, seed: int) -> dict:
+    game_engine.adaptive = adaptive
+    rng = random.Random(seed)
+    durations = defaultdict(list)  # склад: [сек]
+    resident = []
+    async with GameHarness(seed=seed) as harness:
+        clock = harness.clock
+
+        async def arrive(i: int) -> bool:
+            await clock.sleep(i * ARRIVAL)
+            chat_id = -(1000 + i)
+            people, bots = MIXES[i % len(MIXES)]
+            talk = asyncio.ensure_future(chatter(harness, chat_id, random.Random(rng.random())))
+            started = clock.now()
+            try:
+                return await harness.play(chat_id, people, bots)
+            finally:
+                talk.cancel()
+                durations[(people, bots)].append(clock.now() - started)
+
+        async def sample():
+            while True:
+                resident.append(len(mafia_game.games))
+                await clock.sleep(1.0)
+
+        sampler = asyncio.ensure_future(sample())
+        wall = time.perf_counter()
+        finished = await harness.run(*(arrive(i) for i in range(games)))
+        wall = time.perf_counter() - wall
+        sampler.cancel()
+        errors = len(harness.errors.records)
+    everything = [d for values in durations.values() for d in values]
+    arrivals = resident[:int(games * ARRIVAL)]
+    return {
+        'finished': sum(finished), 'errors': errors, 'wall': wall,
+        'durations': {mix: sum(values) / len(values) for mix, values in durations.items()},
+        'avg': sum(everything) / len(everything),
+        'resident_avg': sum(arrivals) / len(arrivals), 'resident_peak': max(resident),
+        'span': len(resident),
+    }
+
+
+async def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    results = {'fixed': await run(games, False, seed), 'adaptive': await run(games, True, seed)}
+    print(f"games: {games}, one every {ARRIVAL:.0f} s, mixes (people, bots) {MIXES}, "
+          f"quiet {DISCUSSION_QUIET:.0f} s, seed {seed}")
+    print(f"  {'':<22} {'fixed':>10} {'adaptive':>10}")
+    fixed, adaptive = results['fixed'], results['adaptive']
+    for mix in MIXES:
+        print(f"  duration {str(mix):<13} {fixed['durations'][mix]:9.0f}s {adaptive['durations'][mix]:9.0f}s")
+    print(f"  {'duration avg':<22} {fixed['avg']:9.0f}s {adaptive['avg']:9.0f}s")
+    print(f"  {'resident games avg':<22} {fixed['resident_avg']:10.1f} {adaptive['resident_avg']:10.1f}")
+    print(f"  {'resident games peak':<22} {fixed['resident_peak']:10d} {adaptive['resident_peak']:10d}")
+    print(f"  {'all games done at':<22} {fixed['span']:9d}s {adaptive['span']:9d}s")
+    for name, result in results.items():
+        print(f"  {name}: finished {result['finished']}/{games}, errors {result['errors']}, "
+              f"wall {result['wall']:.1f} s")
+
+
+if __name__ == '__main__':
+    # handlers при імпорті вмикає INFO - тут лише попередження і помилки
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""Benchmark: incremental Ballot vs recounting the whole tally on every vote.
+
+Для гри на N гравців кожен голосує (частина переголосовує), і після
+кожного голосу перевіряється, чи всі проголосували і хто лідер.
+Перерахунок - як було раніше: словник голосів обходиться заново.
+Ballot оновлює лічильники на місці, тож ціна голосу не залежить від N.
+
+Запуск: python benchmarks/bench_ballot.py [повторів]
+"""
+
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_state import Ballot  # noqa: E402
+
+
+def recount(votes: dict, alive: set):
+    """Старий підхід: повний перерахунок після кожного голосу"""
+    complete = len(votes) >= len(alive)
+    nominations = defaultdict(int)
+    for nominated in votes.values():
+        if nominated != 0:
+            nominations[nominated] += 1
+    if not nominations:
+        return complete, None
+    max_votes = max(nominations.values())
+    candidates = [uid for uid, count in nominations.items() if count == max_votes]
+    return complete, candidates[0] if len(candidates) == 1 else None
+
+
+def ballots(players: int, rng: random.Random):
+    """Голоси всіх гравців і ~20% переголосувань"""
+    voters = list(range(1, players + 1))
+    sequence = [(voter, rng.choice(voters + [0])) for voter in voters]
+    sequence += [(rng.choice(voters), rng.choice(voters)) for _ in range(players // 5)]
+    rng.shuffle(sequence)
+    return voters, sequence
+
+
+def run(players: int, repeats: int) -> str:
+    rng = random.Random(players)
+    rounds = [ballots(players, rng) for _ in range(repeats)]
+    total = sum(len(sequence) for _, sequence in rounds)
+
+    started = time.perf_counter()
+    for voters, sequence in rounds:
+        alive, votes = set(voters), {}
+        for voter, choice in sequence:
+            votes[voter] = choice
+            recount(votes, alive)
+    old = (time.perf_counter() - started) / total
+
+    started = time.perf_counter()
+    for voters, sequence in rounds:
+        ballot = Ballot(voters, abstain=0)
+        for voter, choice in sequence:
+            ballot.cast(voter, choice)
+            ballot.complete, ballot.leader()
+    new = (time.perf_counter() - started) / total
+
+    return (f"  {players:4d} players: recount {old * 1e6:7.2f} us/vote   "
+            f"ballot {new * 1e6:5.2f} us/vote   x{old / new:.0f}")
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"repeats: {repeats}")
+    for players in (15, 100, 1000):
+        print(run(players, repeats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark: routing cost per button press, regex handler chain vs payload router.
+
+Старий шлях - як диспетчер python-telegram-bot: CallbackQueryHandler-и з
+регулярними виразами перевіряються по черзі до першого збігу, потім
+хендлер розбирає query.data через split('_'). Новий - один
+CallbackQueryHandler без патерна, decode() payload і пошук у
+CALLBACK_ROUTES з перевіркою токена і покоління гри. Самі хендлери не
+викликаються: міряється лише вибір хендлера і розбір кнопки.
+
+Запуск: python benchmarks/bench_callbacks.py [натискань]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import CallbackQuery, Update, User  # noqa: E402
+from telegram.ext import CallbackQueryHandler  # noqa: E402
+
+import callbacks  # noqa: E402
+from game_state import MafiaGame  # noqa: E402
+from handlers import CALLBACK_ROUTES  # noqa: E402
+
+
+async def noop(update, context):
+    return None
+
+
+# Ланцюжок, який був у main.py, у тому ж порядку
+OLD_PATTERNS = ["^join_game$", "^add_bots_menu$", "^add_bots_", "^leave_game$", "^start_game$",
+                "^back_to_game$", "^night_(kill|heal|check)_", "^(nominate|votefor)_", "^potato_"]
+
+
+def old_parse(data: str):
+    """Розбір у хендлерах: chat_id, ціль і покоління з split('_')"""
+    parts = data.split('_')
+    if parts[0] == 'night':
+        return int(parts[2]), int(parts[3]), int(parts[4])
+    if parts[0] in ('nominate', 'votefor'):
+        return int(parts[1]), int(parts[2]), int(parts[-1])
+    if parts[0] == 'potato':
+        return int(parts[1]), int(parts[2]), None
+    return None
+
+
+def presses(count: int, chat_id: int, token: int, generation: int, rng: random.Random):
+    """Суміш натискань реальної гри: здебільшого ніч і голосування, трохи лобі"""
+    target = 123456789
+    old_new = [
+        (f"night_kill_{chat_id}_{target}_{generation}", callbacks.encode(callbacks.NIGHT_KILL, chat_id, token, generation, target)),
+        (f"night_check_{chat_id}_{target}_{generation}", callbacks.encode(callbacks.NIGHT_CHECK, chat_id, token, generation, target)),
+        (f"nominate_{chat_id}_{target}_{generation}", callbacks.encode(callbacks.NOMINATE, chat_id, token, generation, target)),
+        (f"votefor_{chat_id}_{target}_yes_{generation}",
+         callbacks.encode(callbacks.VOTE_FOR, chat_id, token, generation, target, callbacks.YES)),
+        ("join_game", callbacks.encode(callbacks.JOIN, chat_id, token)),
+    ]
+    weights = [3, 1, 4, 4, 1]
+    user = User(1, 'player', False)
+    result = []
+    for i in range(count):
+        old, new = rng.choices(old_new, weights)[0]
+        result.append((
+            Update(i, callback_query=CallbackQuery(str(i), user, 'x', data=old)),
+            Update(i, callback_query=CallbackQuery(str(i), user, 'x', data=new)),
+        ))
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    games = MafiaGame()
+    chat_id = -1001234567890
+    game = games.create_game(chat_id, 1)
+    pairs = presses(count, chat_id, game.token, game.generation, random.Random(1))
+
+    chain = [CallbackQueryHandler(noop, pattern=pattern) for pattern in OLD_PATTERNS]
+    started = time.perf_counter()
+    for update, _ in pairs:
+        for handler in chain:
+            if handler.check_update(update):
+                old_parse(update.callback_query.data)
+                break
+    old = (time.perf_counter() - started) / count
+
+    router = CallbackQueryHandler(noop)
+    routes, decode, active = CALLBACK_ROUTES, callbacks.decode, games.games
+    started = time.perf_counter()
+    for _, update in pairs:
+        if router.check_update(update):
+            payload = decode(update.callback_query.data)
+            route = routes.get(payload.action)
+            game = active.get(payload.chat_id)
+            assert route and game.token == payload.token and \
+                (not route.phase_bound or game.generation == payload.generation)
+    new = (time.perf_counter() - started) / count
+
+    started = time.perf_counter()
+    for _, update in pairs:
+        decode(update.callback_query.data)
+    decode_only = (time.perf_counter() - started) / count
+
+    print(f"presses: {count}")
+    print(f"  regex chain + split:  {old * 1e6:5.2f} us/press")
+    print(f"  payload router:       {new * 1e6:5.2f} us/press (decode alone {decode_only * 1e6:4.2f} us)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark: throughput of the dead-player message handler under a text flood.
+
+Порівнює стару реєстрацію (TEXT & ~COMMAND, гра перевіряється вже в
+хендлері) з O(1) пре-фільтром DEAD_PLAYER. Більшість повідомлень - з
+груп без гри або від живих гравців.
+
+Запуск: python benchmarks/bench_dead_filter.py [кількість_повідомлень]
+"""
+
+import asyncio
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Chat, Message, Update, User  # noqa: E402
+from telegram.ext import MessageHandler, filters  # noqa: E402
+
+from game_state import mafia_game  # noqa: E402
+from handlers import DEAD_PLAYER  # noqa: E402
+
+
+def make_games(game_count: int):
+    """Ігри з 5 людьми, по одному мертвому в кожній"""
+    for i in range(game_count):
+        chat_id = -(i + 1)
+        mafia_game.create_game(chat_id, admin_id=1)
+        for user_id in range(1, 6):
+            mafia_game.add_player(chat_id, chat_id * -100 + user_id, f"user{user_id}")
+        mafia_game.add_bots(chat_id, 2)
+        mafia_game.assign_roles(chat_id)
+        mafia_game.kill_players(chat_id, [chat_id * -100 + 1])
+
+
+def make_flood(count: int, game_count: int) -> list:
+    """Повідомлення: 70% з чатів без гри, 29% від живих, 1% від мертвих"""
+    now = datetime.datetime.now()
+    updates = []
+    for i in range(count):
+        roll = random.random()
+        if roll < 0.70:
+            chat_id, user_id = -(game_count + 1 + i % 1000), 10_000_000 + i % 5000
+        else:
+            game = random.randint(1, game_count)
+            chat_id = -game
+            user_id = game * 100 + (1 if roll < 0.71 else random.randint(2, 5))
+        message = Message(i, now, Chat(chat_id, Chat.GROUP), from_user=User(user_id, 'u', False), text='привіт')
+        updates.append(Update(i, message=message))
+    return updates
+
+
+async def legacy_check(update: Update):
+    """Перевірка всередині хендлера (як до пре-фільтра)"""
+    chat_id = update.message.chat_id
+    user_id = update.message.from_user.id
+    game = mafia_game.games.get(chat_id)
+    return bool(game and game.started and user_id in game.players and not game.players[user_id].alive)
+
+
+def run(handler: MessageHandler, updates: list) -> tuple:
+    loop = asyncio.new_event_loop()
+    invoked = 0
+    started = time.perf_counter()
+    for update in updates:
+        if handler.check_update(update):
+            invoked += 1
+            # Хендлер запускається як корутина для кожного пропущеного повідомлення
+            loop.run_until_complete(legacy_check(update))
+    elapsed = time.perf_counter() - started
+    loop.close()
+    return len(updates) / elapsed, invoked
+
+
+async def noop(update, context):
+    pass
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    game_count = 1000
+    make_games(game_count)
+    updates = make_flood(count, game_count)
+
+    legacy = MessageHandler(filters.TEXT & ~filters.COMMAND, noop)
+    prefiltered = MessageHandler(DEAD_PLAYER & filters.TEXT & ~filters.COMMAND, noop)
+
+    legacy_rate, legacy_invoked = run(legacy, updates)
+    new_rate, new_invoked = run(prefiltered, updates)
+
+    print(f"messages:       {count} ({game_count} active games)")
+    print(f"legacy:         {legacy_rate:,.0f} msg/s, handler invoked {legacy_invoked} times")
+    print(f"pre-filtered:   {new_rate:,.0f} msg/s, handler invoked {new_invoked} times")
+
+
+if __name__ == '__main__':
+    main()
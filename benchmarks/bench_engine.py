@@ -0,0 +1,57 @@
+"""Benchmark: headless engine throughput in full games per second.
+
+Повні гри на 15 гравців (1 людина + 14 ботів та 15 ботів) проганяються
+через GameEngine без Telegram і без очікування: таймер фази спрацьовує,
+щойно люди походили. Стан змінюється через MafiaGame з журналом у
+MemoryStore, як у боті без збереження на диск.
+
+Запуск: python benchmarks/bench_engine.py [кількість_ігор] [seed]
+"""
+
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import GameEngine, simulate  # noqa: E402
+from game_state import MafiaGame  # noqa: E402
+
+
+class CountingEngine(GameEngine):
+    """Рахує фази, через які пройшла гра"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.nights = 0
+
+    def start_night(self, chat_id, day_number=None):
+        self.nights += 1
+        return super().start_night(chat_id, day_number)
+
+
+def run(games: int, humans: int, bots: int, seed: int) -> str:
+    engine = CountingEngine(MafiaGame(), random.Random(seed))
+    winners = Counter()
+    started = time.perf_counter()
+    for chat_id in range(1, games + 1):
+        winners[simulate(engine, -chat_id, humans=humans, bots=bots)] += 1
+    elapsed = time.perf_counter() - started
+    assert not engine.games.games, "усі ігри мають завершитись"
+    return (f"  {humans} humans + {bots} bots: {games / elapsed:8.0f} games/s  "
+            f"{elapsed / games * 1e6:7.0f} us/game  {engine.nights / games:.1f} nights/game  "
+            f"winners {dict(winners)}")
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    print(f"games: {games}, seed: {seed}")
+    print(run(games, humans=1, bots=14, seed=seed))
+    print(run(games, humans=0, bots=15, seed=seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark: event log size, recording overhead and replay speed.
+
+Повні ігри на 15 гравців (1 людина + 14 ботів) проганяються через
+GameEngine, як у bench_engine.py, з логом подій у тимчасовому каталозі.
+
+- size: байтів на подію в лозі проти JSON-рядка op + args (так подія
+  лежала б у журналі SQLite);
+- overhead: мкс на подію, які додає запис логу до _apply;
+- replay: файл читається, декодується, і кожна гра відтворюється до кінця
+  (подій/с), плюс стан випадкової гри на випадковій події;
+- check: для перших ігор стан після кожної події порівнюється зі знімком
+  dump_game, зробленим під час гри.
+
+Запуск: python benchmarks/bench_event_log.py [кількість_ігор] [seed]
+"""
+
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import GameEngine, simulate  # noqa: E402
+from eventlog import EventLog, load_games  # noqa: E402
+from game_state import MafiaGame  # noqa: E402
+from replay import rebuild  # noqa: E402
+from storage import MemoryStore  # noqa: E402
+
+CHECKED_GAMES = 50
+
+
+class ShadowStore(MemoryStore):
+    """Журнал, що запам'ятовує знімок гри після кожного запису"""
+
+    def __init__(self):
+        super().__init__()
+        self.games = None
+        self.dumps = {}  # chat_id: [стан після кожної події]
+
+    def append(self, chat_id, op, args):
+        self.dumps.setdefault(chat_id, []).append(json.dumps(self.games.dump_game(chat_id), sort_keys=True))
+        return super().append(chat_id, op, args)
+
+
+def play(games: int, seed: int, directory=None, shadow: bool = False):
+    """Ігри з логом подій (directory) або без; повертає (сек, MafiaGame, EventLog)"""
+    store = ShadowStore() if shadow else MemoryStore()
+    mafia = MafiaGame(store)
+    store.games = mafia
+    events = EventLog(directory) if directory is not None else None
+    mafia.attach_event_log(events)
+    engine = GameEngine(mafia, random.Random(seed))
+    random.seed(seed)
+    started = time.perf_counter()
+    for chat_id in range(1, games + 1):
+        simulate(engine, -chat_id, humans=1, bots=14)
+    if events is not None:
+        events.flush()
+    return time.perf_counter() - started, mafia, events
+
+
+def check(directory: str, seed: int) -> int:
+    """Стан після кожної події з логу збігається зі знімком під час гри; повертає перевірених подій"""
+    _, mafia, _ = play(CHECKED_GAMES, seed, directory, shadow=True)
+    games = load_games(glob.glob(os.path.join(directory, '*.bin')))
+    checked = 0
+    for (chat_id, _), records in games.items():
+        dumps = mafia.store.dumps[chat_id]
+        assert len(records) == len(dumps) + 1 and records[-1][0] == 'end', chat_id
+        for at, expected in enumerate(dumps, 1):
+            state, _ = rebuild(chat_id, records, at)
+            assert json.dumps(state.dump_game(chat_id), sort_keys=True) == expected, (chat_id, at)
+            checked += 1
+    return checked
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    with tempfile.TemporaryDirectory() as tmp:
+        checked = check(os.path.join(tmp, 'check'), seed)
+
+        directory = os.path.join(tmp, 'log')
+        plain, _, _ = play(games, seed)
+        logged, _, events = play(games, seed, directory)
+        paths = glob.glob(os.path.join(directory, '*.bin'))
+
+        started = time.perf_counter()
+        recorded = load_games(paths)
+        decoded = time.perf_counter() - started
+        started = time.perf_counter()
+        winners = {}
+        for (chat_id, _), records in recorded.items():
+            winners[chat_id] = rebuild(chat_id, records)[1]
+        replayed = time.perf_counter() - started
+
+        rng = random.Random(seed)
+        keys = list(recorded)
+        started = time.perf_counter()
+        for _ in range(1000):
+            key = rng.choice(keys)
+            rebuild(key[0], recorded[key], rng.randint(1, len(recorded[key])))
+        seek = (time.perf_counter() - started) / 1000
+
+    count = events.stats['events']
+    json_bytes = sum(len(json.dumps([op, args], ensure_ascii=False, separators=(',', ':')).encode())
+                     for records in recorded.values() for op, args in records)
+    print(f"games: {games} (1 human + 14 bots), seed {seed}, events {count}, "
+          f"blocks {events.stats['blocks']}, flushes {events.stats['flushes']}")
+    print(f"  size      {events.stats['bytes'] / count:5.1f} B/event binary, "
+          f"{json_bytes / count:5.1f} B/event JSON ({json_bytes / events.stats['bytes']:.1f}x)")
+    print(f"  overhead  {(logged - plain) / count * 1e6:5.2f} us/event "
+          f"(games {plain:.2f} s without log, {logged:.2f} s with)")
+    print(f"  decode    {count / decoded:10,.0f} events/s")
+    print(f"  replay    {count / replayed:10,.0f} events/s")
+    print(f"  both      {count / (decoded + replayed):10,.0f} events/s")
+    print(f"  state at a random event: {seek * 1e6:.0f} us")
+    print(f"  games with a winner: {sum(1 for winner in winners.values() if winner)}/{len(winners)}, "
+          f"checked {checked} states of {CHECKED_GAMES} games against live snapshots")
+
+
+if __name__ == '__main__':
+    main()
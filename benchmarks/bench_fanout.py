@@ -0,0 +1,170 @@
+"""Benchmark: phase-start latency with sequential vs scheduled fan-out.
+
+Бот працює через справжній ExtBot, але HTTP-запити обслуговує
+FakeTelegram у тому ж процесі з імітацією затримки мережі (RTT).
+Гра - 15 людей. Для кожної фази (ролі, ніч, висунення, фінальне
+голосування) міряється час від виклику до останнього надісланого
+повідомлення: спершу з послідовною розсилкою, як раніше, потім через
+fan_out + OutboundScheduler. Окремо перевіряються глобальний ліміт і
+повтори на RetryAfter.
+
+Запуск: python benchmarks/bench_fanout.py [rtt_ms] [повторів]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import ExtBot  # noqa: E402
+from telegram.request import BaseRequest  # noqa: E402
+
+import handlers  # noqa: E402
+from fake_telegram import FakeTelegram, percentile  # noqa: E402
+from game_state import mafia_game  # noqa: E402
+from outbound import OutboundScheduler  # noqa: E402
+
+CHAT_ID = -100
+PLAYERS = 15
+
+
+class FakeRequest(BaseRequest):
+    """Запити Bot API до FakeTelegram з фіксованою затримкою"""
+
+    def __init__(self, server: FakeTelegram, rtt: float, flood_every: int = 0):
+        self.server = server
+        self.rtt = rtt
+        self.flood_every = flood_every  # кожен N-й sendMessage отримує 429
+        self.sent = 0
+        self.delivered = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        await asyncio.sleep(self.rtt)
+        endpoint = url.rsplit('/', 1)[1]
+        if endpoint == 'sendMessage' and self.flood_every:
+            self.sent += 1
+            if self.sent % self.flood_every == 0:
+                body = {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                        'parameters': {'retry_after': 1}}
+                return 429, json.dumps(body).encode()
+        params = request_data.parameters if request_data else {}
+        result = await self.server.call(endpoint, params)
+        if endpoint == 'sendMessage':
+            self.delivered += 1
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+class NoJobs:
+    """JobQueue без запуску таймерів - бенчмарк міряє лише старт фази"""
+
+    def run_once(self, *args, **kwargs):
+        pass
+
+
+async def sequential_fan_out(sends):
+    """Стара поведінка: повідомлення по одному"""
+    for send in sends:
+        await send
+
+
+def make_game():
+    mafia_game.games.pop(CHAT_ID, None)
+    mafia_game.create_game(CHAT_ID, admin_id=1)
+    for user_id in range(1, PLAYERS + 1):
+        mafia_game.add_player(CHAT_ID, user_id, f"player{user_id}")
+    mafia_game.assign_roles(CHAT_ID)
+    mafia_game.update_game(CHAT_ID, vote_nominee=1)
+
+
+PHASES = {
+    'roles': lambda context: handlers.send_roles_to_players(context, CHAT_ID),
+    'night': lambda context: handlers.start_night(context, CHAT_ID),
+    'voting': lambda context: handlers.start_voting(context, CHAT_ID),
+    'final_voting': lambda context: handlers.start_final_voting(context, CHAT_ID),
+}
+
+
+async def measure(bot: ExtBot, repeats: int) -> dict:
+    context = SimpleNamespace(bot=bot, job_queue=NoJobs())
+    latencies = {phase: [] for phase in PHASES}
+    for _ in range(repeats):
+        for phase, start in PHASES.items():
+            started = time.perf_counter()
+            await start(context)
+            latencies[phase].append(time.perf_counter() - started)
+            # Фази йдуть з інтервалом у десятки секунд - bucket встигає наповнитись
+            await asyncio.sleep(1)
+    return latencies
+
+
+def report(title: str, latencies: dict):
+    print(title)
+    for phase, values in latencies.items():
+        print(f"  {phase:<13} p50={percentile(values, 50) * 1000:7.1f}ms  "
+              f"p99={percentile(values, 99) * 1000:7.1f}ms")
+
+
+async def check_global_limit(server: FakeTelegram) -> float:
+    """90 особистих повідомлень різним людям: 30 одразу, решта 30/с"""
+    scheduler = OutboundScheduler()
+    bot = ExtBot('1:fake', request=FakeRequest(server, 0.001), rate_limiter=scheduler)
+    await bot.initialize()
+    started = time.perf_counter()
+    await handlers.fan_out([bot.send_message(chat_id=user_id, text='hi') for user_id in range(1000, 1090)])
+    elapsed = time.perf_counter() - started
+    await bot.shutdown()
+    return elapsed
+
+
+async def check_retry_after(server: FakeTelegram, rtt: float) -> dict:
+    """Кожен 10-й sendMessage отримує 429 - всі 15 ролей мають дійти"""
+    scheduler = OutboundScheduler()
+    request = FakeRequest(server, rtt, flood_every=10)
+    bot = ExtBot('1:fake', request=request, rate_limiter=scheduler)
+    await bot.initialize()
+    await handlers.send_roles_to_players(SimpleNamespace(bot=bot), CHAT_ID)
+    await bot.shutdown()
+    return {'delivered': request.delivered, **scheduler.stats}
+
+
+async def main():
+    rtt = (float(sys.argv[1]) if len(sys.argv) > 1 else 50) / 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    make_game()
+
+    server = FakeTelegram()
+    print(f"players: {PLAYERS} humans, rtt: {rtt * 1000:.0f}ms, repeats: {repeats}")
+
+    # Без rate limiter і з послідовною розсилкою - як було до планувальника
+    bot = ExtBot('1:fake', request=FakeRequest(server, rtt))
+    await bot.initialize()
+    parallel_fan_out = handlers.fan_out
+    handlers.fan_out = sequential_fan_out
+    report("sequential:", await measure(bot, repeats))
+    handlers.fan_out = parallel_fan_out
+    await bot.shutdown()
+
+    scheduler = OutboundScheduler()
+    bot = ExtBot('1:fake', request=FakeRequest(server, rtt), rate_limiter=scheduler)
+    await bot.initialize()
+    report("scheduled fan-out:", await measure(bot, repeats))
+    await bot.shutdown()
+
+    print(f"  scheduler stats: {dict(scheduler.stats)}")
+    print(f"global limit: 90 DMs in {await check_global_limit(server):.2f}s (expected ~2s at 30 msg/s)")
+    print(f"retry after 429: {await check_retry_after(server, rtt)}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""Benchmark: memory per game, memory returned on eviction, and sweep cost.
+
+Пам'ять гри міряється tracemalloc: лобі з людьми і ботами та гра, що
+вже йде (ролі, фаза, голоси). Після закриття всіх ігор пам'ять має
+повернутись - інакше індекси (повідомлення, user_id, мертві, черга
+простою) щось тримають; лишається лише ємність таблиць словників.
+Обхід sweeper міряється на N іграх, з яких простоює 1%: ціна залежить
+від простійних, а не від усіх.
+
+Запуск: python benchmarks/bench_lifecycle.py [ігор]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_state import MafiaGame  # noqa: E402
+from lifecycle import GameSweeper  # noqa: E402
+
+
+def fill(games: MafiaGame, count: int, started: bool):
+    for chat_id in range(1, count + 1):
+        chat_id = -chat_id
+        games.create_game(chat_id, chat_id)
+        for user in range(5):
+            games.add_player(chat_id, chat_id * 100 - user, f"user{user}")
+        games.add_bots(chat_id, 5)
+        if started:
+            games.assign_roles(chat_id)
+            games.set_phase(chat_id, 'voting', timeout=45, day_number=1)
+            for user_id in list(games.games[chat_id].players)[:3]:
+                games.record_vote(chat_id, user_id, 0)
+
+
+def memory(count: int, started: bool) -> str:
+    games = MafiaGame()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    fill(games, count, started)
+    used = tracemalloc.get_traced_memory()[0] - base
+    # Два цикли "заповнити - закрити": словники не зменшують таблиці після
+    # видалень, тож після першого лишається їх ємність; витік - це ріст між циклами
+    left = []
+    for _ in range(2):
+        for chat_id in list(games.games):
+            games.end_game(chat_id)
+        left.append(tracemalloc.get_traced_memory()[0] - base)
+        fill(games, count, started)
+    tracemalloc.stop()
+    kind = 'started game' if started else 'lobby       '
+    return (f"  {kind}: {used / count / 1024:5.1f} KiB/game   after eviction: "
+            f"{left[0] / count:4.0f} B/game of table capacity, growth per cycle {(left[1] - left[0]) / count:+.1f} B/game")
+
+
+def sweep_cost(count: int) -> str:
+    now = [0.0]
+    games = MafiaGame()
+    games.clock = lambda: now[0]
+    fill(games, count, started=False)
+    sweeper = GameSweeper(games, ttl={'registration': 1800}, default_ttl=600, max_lobbies=count)
+    # Усі ігри змінені годину тому, потім 99% знову активні
+    now[0] = 3600.0
+    for chat_id in list(games.games)[count // 100:]:
+        games._touch(chat_id)
+
+    started = time.perf_counter()
+    due = sweeper.candidates()
+    scan = time.perf_counter() - started
+
+    started = time.perf_counter()
+    naive = [chat_id for chat_id in games.games if sweeper.idle(chat_id)]
+    full = time.perf_counter() - started
+    assert sorted(naive) == sorted(chat_id for chat_id, _ in due)
+
+    started = time.perf_counter()
+    for chat_id, _ in due:
+        games.end_game(chat_id)
+    evict = time.perf_counter() - started
+    return (f"  sweep over {count} games, {len(due)} idle: ordered scan {scan * 1000:7.3f} ms   "
+            f"full scan {full * 1000:7.2f} ms   eviction {evict / len(due) * 1e6:5.1f} us/game")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    print(f"games: {count}")
+    print(memory(count, started=False))
+    print(memory(count, started=True))
+    print(sweep_cost(count))
+    print(sweep_cost(count * 10))
+
+
+if __name__ == '__main__':
+    main()
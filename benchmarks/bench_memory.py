@@ -0,0 +1,44 @@
+"""Benchmark: per-game memory footprint of idle registrations.
+
+Запуск: python benchmarks/bench_memory.py [кількість_ігор]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_state import MafiaGame  # noqa: E402
+
+
+def main():
+    game_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    games = MafiaGame()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+
+    # Лобі з одним гравцем, яке ніхто не запускає
+    for i in range(game_count):
+        chat_id = -(i + 1)
+        games.create_game(chat_id, admin_id=i + 1)
+        games.add_player(chat_id, i + 1, f"user{i}")
+
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"games:     {game_count}")
+    print(f"total:     {used / 1024 / 1024:.1f} MiB")
+    print(f"per game:  {used / game_count:.0f} B")
+    print(f"create:    {elapsed / game_count * 1e6:.1f} us/game")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark: latency of critical messages under a synthetic 429 storm, with and without priority lanes.
+
+Сценарій кінця ночі в багатьох чатах одночасно: у кожну групу летить
+пачка декоративних рядків ("X зробив свій вибір...") і кілька
+оголошень фази, гравцям з нічними ролями в особисті - кнопки дій. Перші секунди Bot API
+відповідає 429 на частину запитів. Ліміти зменшені пропорційно, щоб
+прогін тривав секунди: глобальний bucket 50/с (вузьке місце), група -
+5 повідомлень/с з запасом 5.
+
+"fifo" - усі запити в одній смузі (як до смуг), "lanes" - з позначками
+FLAVOR і смугами за замовчуванням. Латентність - від виклику до
+відповіді, для відкинутих і злитих - до повернення None.
+
+Запуск: python benchmarks/bench_outbound_lanes.py [груп]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.error import RetryAfter  # noqa: E402
+
+from outbound import CRITICAL, FLAVOR, LANES, PHASE, OutboundScheduler  # noqa: E402
+
+STORM_SECONDS = 3.0
+STORM_RATE = 0.3  # частка 429 під час шторму
+RETRY_AFTER = 1
+API_LATENCY = 0.01
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def run(groups: int, lanes: bool, seed: int = 1) -> str:
+    rng, storm = random.Random(seed), random.Random(seed)
+    scheduler = OutboundScheduler(global_rate=50, group_per_minute=300, max_retries=5)
+    scheduler.group_rate, scheduler.group_capacity = 5.0, 5
+    started = time.monotonic()
+
+    async def api(endpoint, data):
+        await asyncio.sleep(API_LATENCY)
+        if time.monotonic() - started < STORM_SECONDS and storm.random() < STORM_RATE:
+            raise RetryAfter(RETRY_AFTER)
+        return {'ok': True}
+
+    latencies = defaultdict(list)
+
+    async def send(chat_id: int, text: str, lane: int, delay: float):
+        await asyncio.sleep(delay)
+        data = {'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'}
+        args = {'priority': lane if lanes else PHASE}
+        sent = time.monotonic()
+        await scheduler.process_request(api, (('sendMessage', data)), {}, 'sendMessage', data, args)
+        latencies[lane].append(time.monotonic() - sent)
+
+    sends = []
+    for group in range(groups):
+        chat_id = -(1000 + group)
+        for i in range(30):
+            sends.append(send(chat_id, f"🤖 Бот {i} зробив свій вибір...", FLAVOR, rng.uniform(0, 1.5)))
+        for i in range(3):
+            sends.append(send(chat_id, f"☀️ Ранок {i}", PHASE, 1.0 + i * 0.3))
+        for player in range(5):
+            sends.append(send(group * 100 + player + 1, "🌙 Кнопки дії", CRITICAL, rng.uniform(1.0, 4.0)))
+    begin = time.monotonic()
+    await asyncio.gather(*sends)
+    elapsed = time.monotonic() - begin
+
+    lines = [f"  {'lanes' if lanes else 'fifo '}: all sends done in {elapsed:5.1f} s, "
+             f"{scheduler.stats['sent']} API sends, dropped {scheduler.stats['dropped']}, "
+             f"merged {scheduler.stats['merged']}, retried {scheduler.stats['retried']}"]
+    for lane in (CRITICAL, PHASE, FLAVOR):
+        values = latencies[lane]
+        lines.append(f"    {LANES[lane]:<8} n={len(values):4d}  p50={percentile(values, 0.5):6.2f} s  "
+                     f"p99={percentile(values, 0.99):6.2f} s")
+    return '\n'.join(lines)
+
+
+async def main():
+    groups = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"groups: {groups}, 429 storm: {STORM_RATE:.0%} of calls for {STORM_SECONDS} s")
+    print(await run(groups, lanes=False))
+    print(await run(groups, lanes=True))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
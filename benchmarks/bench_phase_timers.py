@@ -0,0 +1,126 @@
+"""Benchmark: phase timer overhead at 50k concurrent games.
+
+Порівнює PhaseTimers (одна купа і одна задача на всі ігри) з попереднім
+підходом - окремий job APScheduler (JobQueue.run_once) на кожну фазу, а
+скасування через get_jobs_by_name + schedule_removal. Сценарій для
+кожної гри: поставити таймер, перейти у наступну фазу (новий таймер),
+половина ігор завершує фазу достроково (скасування). Окремо міряється
+затримка спрацювання PhaseTimers, коли 50k дедлайнів припадають на 2 с.
+
+Запуск: python benchmarks/bench_phase_timers.py [кількість_ігор]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import Application  # noqa: E402
+
+from fake_telegram import percentile  # noqa: E402
+from timers import PhaseTimers  # noqa: E402
+
+
+async def noop(*args):
+    pass
+
+
+def timed(action) -> float:
+    started = time.perf_counter()
+    action()
+    return time.perf_counter() - started
+
+
+async def bench_phase_timers(games: int) -> dict:
+    timers = PhaseTimers()
+    tracemalloc.start()
+    result = {
+        'arm': timed(lambda: [timers.arm(chat_id, noop, 45) for chat_id in range(games)]),
+        're-arm': timed(lambda: [timers.arm(chat_id, noop, 60) for chat_id in range(games)]),
+        'cancel': timed(lambda: [timers.cancel(chat_id) for chat_id in range(0, games, 2)]),
+        'remaining': timed(lambda: [timers.remaining(chat_id) for chat_id in range(games)]),
+    }
+    result['memory'] = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result
+
+
+async def bench_job_queue(games: int) -> dict:
+    application = Application.builder().token('1:fake').build()
+    job_queue = application.job_queue
+    await job_queue.start()
+    # get_jobs_by_name перебирає всі job, тому re-arm і cancel міряються на вибірці
+    sample = min(games, 500)
+
+    def rearm():
+        for chat_id in range(sample):
+            for job in job_queue.get_jobs_by_name(f"night_{chat_id}"):
+                job.schedule_removal()
+            job_queue.run_once(noop, when=60, chat_id=chat_id, name=f"discussion_{chat_id}")
+
+    def cancel():
+        for chat_id in range(0, sample, 2):
+            for job in job_queue.get_jobs_by_name(f"discussion_{chat_id}"):
+                job.schedule_removal()
+
+    tracemalloc.start()
+    result = {
+        'arm': timed(lambda: [job_queue.run_once(noop, when=45, chat_id=chat_id, name=f"night_{chat_id}")
+                              for chat_id in range(games)]),
+    }
+    result['memory'] = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    result['re-arm'] = timed(rearm) * games / sample
+    result['cancel'] = timed(cancel) * games / sample
+    result['remaining'] = float('nan')
+    job_queue.scheduler.remove_all_jobs()
+    await job_queue.stop()
+    return result
+
+
+async def bench_firing(games: int, spread: float = 2.0) -> dict:
+    timers = PhaseTimers()
+    lags = []
+    done = asyncio.Event()
+
+    async def dispatch(timer):
+        lags.append(timers.clock() - timer.deadline)
+        if len(lags) == games:
+            done.set()
+
+    timers.start(dispatch)
+    for chat_id in range(games):
+        timers.arm(chat_id, noop, 0.5 + spread * chat_id / games)
+    started = time.perf_counter()
+    await asyncio.wait_for(done.wait(), 60)
+    elapsed = time.perf_counter() - started
+    await timers.stop()
+    return {'fired': len(lags), 'elapsed': elapsed, 'lags': lags}
+
+
+async def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    logging.getLogger('apscheduler').setLevel(logging.WARNING)
+    print(f"games: {games}")
+
+    heap = await bench_phase_timers(games)
+    jobs = await bench_job_queue(games)
+    print(f"  {'operation':<10} {'PhaseTimers':>14} {'JobQueue':>14}")
+    for op in ('arm', 're-arm', 'cancel', 'remaining'):
+        print(f"  {op:<10} {heap[op] * 1e6 / games:>11.2f} us {jobs[op] * 1e6 / games:>11.2f} us")
+    print(f"  {'memory':<10} {heap['memory'] / games:>11.0f} B  {jobs['memory'] / games:>11.0f} B   (per game)")
+    print("  JobQueue re-arm/cancel extrapolated from the first 500 games")
+
+    firing = await bench_firing(games)
+    lags = firing['lags']
+    print(f"firing: {firing['fired']} deadlines over 2 s, "
+          f"lag p50={percentile(lags, 50) * 1000:.2f}ms p99={percentile(lags, 99) * 1000:.2f}ms "
+          f"max={max(lags) * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""Benchmark: recovery time of MafiaGame from the SQLite journal.
+
+Запуск: python benchmarks/bench_recovery.py [кількість_ігор]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_state import MafiaGame  # noqa: E402
+from storage import SQLiteStore  # noqa: E402
+
+
+def populate(game_count: int, path: str):
+    """Створює game_count ігор у різних фазах"""
+    games = MafiaGame(SQLiteStore(path))
+    for chat_id in range(-1, -game_count - 1, -1):
+        games.create_game(chat_id, admin_id=1)
+        for user_id in range(1, 6):
+            games.add_player(chat_id, user_id, f"user{user_id}")
+        games.add_bots(chat_id, 5)
+        games.assign_roles(chat_id)
+        games.set_phase(chat_id, 'night', timeout=45, day_number=1)
+        alive = list(games.games[chat_id].alive_players)
+        for user_id in alive[:4]:
+            games.record_night_action(chat_id, user_id, 'kill', random.choice(alive))
+        if chat_id % 2:
+            games.set_phase(chat_id, 'voting', timeout=30)
+            for user_id in alive:
+                games.record_vote(chat_id, user_id, random.choice(alive))
+    games.store.close()
+
+
+def main():
+    game_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'games.db')
+
+        started = time.perf_counter()
+        populate(game_count, path)
+        write_time = time.perf_counter() - started
+
+        store = SQLiteStore(path)
+        journal_rows = store.conn.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+        snapshot_rows = store.conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+
+        games = MafiaGame(store)
+        started = time.perf_counter()
+        restored = games.restore()
+        restore_time = time.perf_counter() - started
+        store.close()
+
+        print(f"games:          {game_count}")
+        print(f"write:          {write_time:.2f} s")
+        print(f"journal rows:   {journal_rows} (snapshots: {snapshot_rows})")
+        print(f"db size:        {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+        print(f"restored:       {restored} games in {restore_time:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""Benchmark: allocations and time per phase render, per-recipient building vs the rendering cache.
+
+Старий шлях - як у handlers до rendering.py: f-рядок картки ролі на
+кожного гравця, окрема клавіатура з n-1 кнопок на кожного отримувача
+нічних дій і висунення, повна перебудова лобі на кожне оновлення.
+Новий - ROLE_CARDS, TargetKeyboard і cached_lobby. Результати обох
+шляхів порівнюються: тексти і кнопки мають збігатися.
+
+Алокації - блоки пам'яті (tracemalloc), що живуть у готових
+повідомленнях після рендеру фази, і пік пам'яті під час рендеру.
+Лобі: 30 оновлень, з яких 10 змінюють склад.
+
+Запуск: python benchmarks/bench_render.py [гравців, не більше MAX_PLAYERS]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import InlineKeyboardMarkup  # noqa: E402
+
+from callbacks import ADD_BOTS_MENU, JOIN, LEAVE, NIGHT_CHECK, NIGHT_HEAL, NIGHT_KILL, NOMINATE, SHOOT_MENU, START  # noqa: E402
+from config import MAX_PLAYERS, SPECIAL_EVENTS  # noqa: E402
+from game_state import MafiaGame  # noqa: E402
+from rendering import NIGHT_BUTTONS, TargetKeyboard, cached_lobby, game_button, lobby_renders, role_card  # noqa: E402
+
+CHAT_ID = -100500
+LOBBY_CHAT_ID = -100501
+
+
+# ============================================
+# СТАРИЙ ШЛЯХ (як було в handlers)
+# ============================================
+
+def old_roles(games: MafiaGame, game):
+    texts = []
+    for player_info in game.all_players.values():
+        if player_info.is_bot:
+            continue
+        role_info = games.get_role_info(player_info.role)
+        texts.append(f"""
+🎭 <b>ВАША РОЛЬ:</b>
+
+{role_info['emoji']} <b>{role_info['full_name']}</b>
+
+📋 <b>Опис:</b>
+{role_info['description']}
+
+🎯 <b>Команда:</b> {'<b>🔴 МАФІЯ</b>' if role_info['team'] == 'mafia' else '<b>🔵 МИРНІ</b>'}
+""")
+    return texts
+
+
+def old_night(games: MafiaGame, game):
+    alive_targets = [(uid, p.username) for uid, p in game.all_players.items() if p.alive]
+    markups = []
+    for user_id in game.alive_humans:
+        action = games.get_role_info(game.all_players[user_id].role).get('action')
+        if not action:
+            continue
+        targets = [target for target in alive_targets if target[0] != user_id]
+        if not targets:
+            continue
+        keyboard = []
+        for target_id, target_name in targets:
+            if action == 'kill':
+                keyboard.append([game_button(f"🔪 {target_name}", game, NIGHT_KILL, target_id)])
+            elif action == 'heal':
+                keyboard.append([game_button(f"💉 {target_name}", game, NIGHT_HEAL, target_id)])
+            elif action == 'check':
+                keyboard.append([game_button(f"🔍 {target_name}", game, NIGHT_CHECK, target_id)])
+        if action == 'check' and not game.detective_shot_used:
+            keyboard.append([game_button("🔫 Постріл (один раз)", game, SHOOT_MENU)])
+        markups.append(InlineKeyboardMarkup(keyboard))
+    return markups
+
+
+def old_voting(game):
+    alive = {uid: p for uid, p in game.all_players.items() if p.alive}
+    markups = []
+    for user_id, player_info in alive.items():
+        if player_info.is_bot:
+            continue
+        keyboard = [[game_button(f"👤 {p.username}", game, NOMINATE, uid)] for uid, p in alive.items() if uid != user_id]
+        keyboard.append([game_button("🚫 Пропустити день", game, NOMINATE, 0)])
+        markups.append(InlineKeyboardMarkup(keyboard))
+    return markups
+
+
+def old_lobby(game):
+    event_text = ""
+    if game.special_event:
+        event_info = SPECIAL_EVENTS[game.special_event]
+        event_text = f"\n\n🎲 <b>{event_info['emoji']} {event_info['name']}</b>\n<i>{event_info['description']}</i>"
+    keyboard = [
+        [game_button("➕ ПРИЄДНАТИСЯ", game, JOIN)],
+        [game_button("🤖 ДОДАТИ БОТІВ", game, ADD_BOTS_MENU)],
+        [game_button("🎯 ПОЧАТИ ГРУ", game, START)],
+        [game_button("❌ ВИЙТИ", game, LEAVE)],
+    ]
+    players_list = ""
+    if game.players:
+        players_list += "<b>👥 Гравці:</b>\n"
+        for i, pinfo in enumerate(game.players.values(), 1):
+            players_list += f"   {i}. ✅ {pinfo.username}\n"
+    if game.bots:
+        players_list += f"\n<b>🤖 Боти ({len(game.bots)}):</b>\n"
+        for i, binfo in enumerate(game.bots.values(), 1):
+            players_list += f"   {i}. 🤖 {binfo.username}\n"
+    if not players_list:
+        players_list = "<i>Поки що немає...</i>"
+    text = f"""
+🎮 <b>ГРА: МАФІЯ</b> 🎮{event_text}
+
+<b>📊 Учасників ({len(game.all_players)}/{MAX_PLAYERS}):</b>
+{players_list}
+"""
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+# ============================================
+# НОВИЙ ШЛЯХ (як зараз у handlers)
+# ============================================
+
+def new_roles(games: MafiaGame, game):
+    return [role_card(p.role) for p in game.all_players.values() if not p.is_bot]
+
+
+def new_night(games: MafiaGame, game):
+    alive_targets = [(uid, p.username) for uid, p in game.all_players.items() if p.alive]
+    keyboards = {}
+    markups = []
+    for user_id in game.alive_humans:
+        action = games.get_role_info(game.all_players[user_id].role).get('action')
+        if not action:
+            continue
+        keyboard = keyboards.get(action)
+        if keyboard is None:
+            label, button_action = NIGHT_BUTTONS[action]
+            tail = [game_button("🔫 Постріл (один раз)", game, SHOOT_MENU)] \
+                if action == 'check' and not game.detective_shot_used else ()
+            keyboard = keyboards[action] = TargetKeyboard(game, button_action, label, alive_targets, tail)
+        if not keyboard.targets_for(user_id):
+            continue
+        markups.append(keyboard.markup_for(user_id))
+    return markups
+
+
+def new_voting(game):
+    alive = {uid: p for uid, p in game.all_players.items() if p.alive}
+    keyboard = TargetKeyboard(game, NOMINATE, "👤", [(uid, p.username) for uid, p in alive.items()],
+                              [game_button("🚫 Пропустити день", game, NOMINATE, 0)])
+    return [keyboard.markup_for(uid) for uid, p in alive.items() if not p.is_bot]
+
+
+# ============================================
+# ВИМІРЮВАННЯ
+# ============================================
+
+def measure(render, repeat: int = 200):
+    """(мкс на рендер, живих блоків у результаті, пік KiB)"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        render()
+    elapsed = (time.perf_counter() - started) / repeat
+
+    tracemalloc.start()
+    before = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    result = render()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    after = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del result
+    return elapsed * 1e6, after - before, peak / 1024
+
+
+def lobby_updates(games: MafiaGame, render):
+    """30 оновлень лобі: кожне третє - новий гравець, решта - без змін"""
+    games.end_game(LOBBY_CHAT_ID)
+    lobby_renders.forget(LOBBY_CHAT_ID)
+    games.create_game(LOBBY_CHAT_ID, 1)
+    game = games.games[LOBBY_CHAT_ID]
+    results = []
+    for i in range(30):
+        if i % 3 == 0:
+            games.add_player(LOBBY_CHAT_ID, 1000 + i, f"Гравець{i}")
+        results.append(render(game))
+    return results
+
+
+def same_lobby(game):
+    """Перевірка: кешоване лобі збігається зі старим рендером"""
+    assert old_lobby(game) == cached_lobby(game)
+    return True
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else MAX_PLAYERS
+    games = MafiaGame()
+    games.create_game(CHAT_ID, 1)
+    for user_id in range(1, players + 1):
+        games.add_player(CHAT_ID, user_id, f"Гравець{user_id}")
+    games.assign_roles(CHAT_ID)
+    game = games.games[CHAT_ID]
+    games.set_phase(CHAT_ID, 'night', timeout=45, day_number=1)
+
+    assert old_roles(games, game) == new_roles(games, game)
+    assert old_night(games, game) == new_night(games, game)
+    assert old_voting(game) == new_voting(game)
+    assert all(lobby_updates(games, same_lobby))
+
+    phases = [
+        ('roles', lambda: old_roles(games, game), lambda: new_roles(games, game)),
+        ('night actions', lambda: old_night(games, game), lambda: new_night(games, game)),
+        ('nominations', lambda: old_voting(game), lambda: new_voting(game)),
+        ('lobby x30', lambda: lobby_updates(games, old_lobby),
+         lambda: lobby_updates(games, cached_lobby)),
+    ]
+    print(f"players: {players} (all human)")
+    print(f"  {'phase':<14} {'old us':>8} {'new us':>8}   {'old blocks':>10} {'new blocks':>10}   "
+          f"{'old peak':>9} {'new peak':>9}")
+    for name, old, new in phases:
+        old_us, old_blocks, old_peak = measure(old, repeat=20 if name.startswith('lobby') else 200)
+        new_us, new_blocks, new_peak = measure(new, repeat=20 if name.startswith('lobby') else 200)
+        print(f"  {name:<14} {old_us:8.1f} {new_us:8.1f}   {old_blocks:10d} {new_blocks:10d}   "
+              f"{old_peak:7.1f}Ki {new_peak:7.1f}Ki")
+
+
+if __name__ == '__main__':
+    main()
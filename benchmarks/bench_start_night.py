@@ -0,0 +1,110 @@
+"""Benchmark: how long start_night holds the handler in a game with 14 bots.
+
+Гра: 1 людина + 14 ботів у GameHarness (справжні хендлери, віртуальний
+годинник), кожен запит до Bot API відповідає через RTT віртуального часу.
+Міряється час повернення start_night (саме стільки хендлер, що запустив
+ніч, тримає обробку), чи поставлено таймер ночі на момент повернення і
+коли останнє оголошення "бот зробив вибір" дійшло в чат - тобто коли
+виконались усі відкладені дії гри, а не скільки повідомлень прийшло
+(у режимі 'live' ходи - це редагування одного підсумку).
+
+Оголошення йдуть по одному на бота з дією, через 1-3 с одне від одного,
+у грі переважно ботів - з коефіцієнтом BOT_MAJORITY_PACE.
+
+Запуск: python benchmarks/bench_start_night.py [повторів] [rtt_ms]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import CallbackContext  # noqa: E402
+
+import handlers  # noqa: E402
+from clock import game_clock  # noqa: E402
+from fake_telegram import percentile  # noqa: E402
+from game_state import mafia_game  # noqa: E402
+from harness import GameHarness, InProcessRequest  # noqa: E402
+
+BOTS = 14
+
+
+class SlowRequest(InProcessRequest):
+    """Запит до Bot API з RTT віртуального часу"""
+
+    def __init__(self, server):
+        super().__init__(server)
+        # Лише поки хтось переводить годинник (getMe при старті чекав би вічно)
+        self.rtt = 0.0
+
+    async def do_request(self, url: str, method: str, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        if self.rtt:
+            await game_clock.sleep(self.rtt)
+        return await super().do_request(url, method, request_data)
+
+
+def make_game(chat_id: int) -> int:
+    """Гра з розданими ролями; повертає кількість ботів з нічною дією"""
+    mafia_game.create_game(chat_id, admin_id=1)
+    mafia_game.add_player(chat_id, 1, "player1")
+    mafia_game.add_bots(chat_id, BOTS)
+    mafia_game.assign_roles(chat_id)
+    game = mafia_game.games[chat_id]
+    return sum(1 for bot in game.bots.values()
+               if bot.alive and mafia_game.get_role_info(bot.role).get('action') in ('kill', 'heal'))
+
+
+async def measure(harness: GameHarness, chat_id: int) -> dict:
+    """Один запуск ночі: віртуальні секунди до повернення і до останнього оголошення"""
+    clock = harness.clock
+    acting = make_game(chat_id)
+    context = CallbackContext(harness.application, chat_id=chat_id)
+    started = clock.now()
+    task = asyncio.ensure_future(handlers.start_night(context, chat_id))
+    await clock.run_until(task.done, limit=60)
+    returned = clock.now() - started
+    armed = handlers.phase_timers.get(chat_id) is not None
+    await clock.run_until(lambda: chat_id not in handlers._delayed, limit=120)
+    announced = clock.now() - started
+    progress = handlers._progress.get(chat_id)
+    moves = len(progress.names) if progress is not None else 0
+    handlers.close_game(chat_id)
+    await clock.settle()
+    return {'returned': returned, 'armed': armed, 'announced': announced, 'acting': acting, 'moves': moves}
+
+
+async def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rtt = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+
+    harness = GameHarness(seed=1)
+    harness.request = SlowRequest(harness.server)
+    results = []
+    wall = time.perf_counter()
+    async with harness:
+        harness.request.rtt = rtt
+        for run in range(repeats):
+            results.append(await measure(harness, -(run + 1)))
+        harness.request.rtt = 0.0
+    wall = time.perf_counter() - wall
+
+    print(f"start_night with {BOTS} bots, rtt {rtt * 1000:.0f}ms, {repeats} runs (virtual time)")
+    for title, key in (("handler returned", 'returned'), ("bot announcements done", 'announced')):
+        values = [result[key] for result in results]
+        print(f"  {title:<24} p50={percentile(values, 50) * 1000:8.1f}ms  "
+              f"p99={percentile(values, 99) * 1000:8.1f}ms")
+    print(f"  acting bots per night: {min(r['acting'] for r in results)}-{max(r['acting'] for r in results)}, "
+          f"announced {sum(r['moves'] for r in results)}/{sum(r['acting'] for r in results)}")
+    print(f"  night timer armed on return: {sum(r['armed'] for r in results)}/{repeats}")
+    print(f"  wall {wall:.2f} s, errors {len(harness.errors.records)}")
+
+
+if __name__ == '__main__':
+    # handlers при імпорті вмикає INFO - тут лише попередження і помилки
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(main())
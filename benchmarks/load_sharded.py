@@ -0,0 +1,84 @@
+"""Load test: sharded deployment (front + N worker processes) against the fake Bot API.
+
+Фейковий Bot API і генератор навантаження працюють у цьому процесі,
+бот - окремим процесом main.py у режимі 'sharded' (фронт запускає
+воркерів сам). Для кожної кількості шардів проганяється той самий
+сценарій: групи реєструються, стартують гру і гравці натискають кнопки
+в особистих - ці колбеки фронт має відправити у шард, що володіє грою.
+Ліміт вихідних повідомлень піднято, щоб міряти саме обробку оновлень.
+
+Запуск: python benchmarks/load_sharded.py [чатів] [шарди,через,кому]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_telegram import FakeTelegram, WebhookLoad, percentile  # noqa: E402
+
+API_PORT = 8091
+FRONT_PORT = 8453
+SECRET = 'load-secret'
+
+
+async def run(chats: int, shards: int) -> str:
+    server = FakeTelegram()
+    runner = web.AppRunner(server.app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', API_PORT).start()
+
+    env = dict(
+        os.environ, TELEGRAM_BOT_TOKEN='123:load', TELEGRAM_API_URL=f"http://127.0.0.1:{API_PORT}",
+        MAFIA_RUN_MODE='sharded', MAFIA_SHARDS=str(shards), MAFIA_SHARD_FRONT='webhook',
+        MAFIA_WEBHOOK_URL=f"http://127.0.0.1:{FRONT_PORT}", MAFIA_WEBHOOK_LISTEN='127.0.0.1',
+        MAFIA_WEBHOOK_PORT=str(FRONT_PORT), MAFIA_WEBHOOK_SECRET=SECRET,
+        MAFIA_OUTBOUND_RATE='100000', MAFIA_MEDIA_CACHE=os.path.join(ROOT, 'media_cache.json'),
+    )
+    env.pop('MAFIA_GAME_DB', None)
+    log = open(f"/tmp/load_sharded_{shards}.log", 'w')
+    bot = await asyncio.create_subprocess_exec(sys.executable, os.path.join(ROOT, 'main.py'),
+                                               env=env, stdout=log, stderr=log)
+    try:
+        # Фронт реєструє webhook, коли всі воркери готові
+        started = time.perf_counter()
+        while server.webhook_url is None:
+            if bot.returncode is not None or time.perf_counter() - started > 60:
+                raise RuntimeError(f"бот не запустився, див. /tmp/load_sharded_{shards}.log")
+            await asyncio.sleep(0.1)
+
+        load = WebhookLoad(server, server.webhook_url, SECRET)
+        elapsed = await load.run(chats, rounds=3)
+        latencies = [value for values in load.latencies.values() for value in values]
+        private = [value for kind, values in load.latencies.items()
+                   if kind in ('cb:night', 'cb:nominate', 'cb:votefor') for value in values]
+        # Колбек з особистих, що потрапив не в той шард, отримав би "гру не знайдено"
+        misrouted = sum(n for text, n in load.answer_texts.items() if 'не знайдена' in text)
+        return (f"shards={shards}: {load.sent} updates in {elapsed:.2f} s "
+                f"({load.sent / elapsed:.0f} updates/s), "
+                f"p50={percentile(latencies, 50) * 1000:.1f}ms p99={percentile(latencies, 99) * 1000:.1f}ms, "
+                f"private callbacks n={len(private)}, misrouted={misrouted}, errors={sum(load.errors.values())} "
+                f"{dict(load.errors) if load.errors else ''}")
+    finally:
+        if bot.returncode is None:
+            bot.terminate()
+            await bot.wait()
+        log.close()
+        await runner.cleanup()
+
+
+async def main():
+    chats = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    counts = [int(n) for n in sys.argv[2].split(',')] if len(sys.argv) > 2 else [1, 4]
+    print(f"chats: {chats}, cpus: {os.cpu_count()}")
+    for shards in counts:
+        print(await run(chats, shards))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""Compact callback_data for inline buttons: a versioned binary payload in base64.
+
+Кожна кнопка бота несе одні й ті самі поля фіксованого розміру:
+версія формату, дія, chat_id гри, токен гри, покоління фази, ціль і
+додатковий аргумент. 27 байт у base64url - рівно 36 символів (ліміт
+Telegram - 64 байти). Розбір - одна перевірка довжини, base64 і
+struct.unpack, без регулярних виразів і split('_').
+
+Токен - випадкове число, яке гра отримує при створенні: кнопка з
+попередньої гри в тому ж чаті має інший токен, навіть якщо покоління
+фази збігається. Покоління відсікає кнопки минулих фаз поточної гри.
+
+Номери дій і розкладку не можна змінювати: кнопки, надіслані раніше,
+лишаються в чатах. Нова розкладка - нова VERSION.
+"""
+
+import base64
+import binascii
+import struct
+from typing import NamedTuple, Optional
+
+VERSION = 1
+
+# версія, дія, chat_id, токен гри, покоління фази, ціль, аргумент
+_LAYOUT = struct.Struct('>BBqIIqB')
+ENCODED_LENGTH = 36  # символів base64 для 27 байт
+
+# Дії кнопок (нові - лише в кінець)
+(JOIN, ADD_BOTS_MENU, ADD_BOTS, LEAVE, START, BACK_TO_GAME,
+ NIGHT_KILL, NIGHT_HEAL, NIGHT_CHECK, SHOOT_MENU,
+ NOMINATE, VOTE_FOR, POTATO) = range(1, 14)
+
+ACTION_NAMES = {
+    JOIN: 'join', ADD_BOTS_MENU: 'add_bots_menu', ADD_BOTS: 'add_bots', LEAVE: 'leave',
+    START: 'start', BACK_TO_GAME: 'back_to_game',
+    NIGHT_KILL: 'night_kill', NIGHT_HEAL: 'night_heal', NIGHT_CHECK: 'night_check',
+    SHOOT_MENU: 'shoot_menu', NOMINATE: 'nominate', VOTE_FOR: 'vote_for', POTATO: 'potato',
+}
+
+# Аргумент VOTE_FOR
+YES, NO = 1, 2
+
+
+class Callback(NamedTuple):
+    """Розібрана кнопка"""
+    action: int
+    chat_id: int
+    token: int
+    generation: int
+    target: int
+    arg: int
+
+
+def encode(action: int, chat_id: int, token: int, generation: int = 0, target: int = 0, arg: int = 0) -> str:
+    """callback_data кнопки"""
+    raw = _LAYOUT.pack(VERSION, action, chat_id, token, generation, target, arg)
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode(data: Optional[str]) -> Optional[Callback]:
+    """Розбір callback_data; None - чужий формат, інша версія або пошкоджені дані"""
+    if not data or len(data) != ENCODED_LENGTH:
+        return None
+    try:
+        # base64url вручну: urlsafe_b64decode через translate утричі повільніший
+        values = _unpack(binascii.a2b_base64(data.replace('-', '+').replace('_', '/')))
+    except (binascii.Error, ValueError, struct.error):
+        return None
+    if values[0] != VERSION:
+        return None
+    return _make(values[1:])
+
+
+_unpack = _LAYOUT.unpack
+_make = Callback._make
@@ -0,0 +1,176 @@
+"""Game clock: one source of time for phase timers, bot pacing, edits and rate limits.
+
+Усі таймери і паузи бота - дедлайни фаз, оголошення ботів, вікна
+редагувань, обхід покинутих ігор, токени outbound - беруть час з
+game_clock. За замовчуванням це реальний час (time.monotonic і
+asyncio.sleep). У тестах і симуляціях game_clock.use(VirtualClock())
+підміняє джерело: sleep не чекає, а годинник перескакує до найближчого
+дедлайну, тож повна гра з нічними таймерами по 45 с проходить за
+мілісекунди.
+
+now() - монотонний час для інтервалів, wall() - час епохи для
+дедлайнів, що переживають рестарт (phase_deadline у знімку гри).
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Callable, List, Optional, Tuple
+
+
+class RealClock:
+    """Реальний час"""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def wall(self) -> float:
+        return time.time()
+
+    async def sleep(self, delay: float):
+        await asyncio.sleep(delay)
+
+    async def wait(self, event: asyncio.Event, timeout: Optional[float]) -> bool:
+        """Очікування події не довше timeout; False - вийшов час"""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class VirtualClock:
+    """Віртуальний час: годинник стоїть, поки його не переведуть advance() або run_until()
+
+    Сплячі (sleep, wait з timeout) лежать у купі за дедлайном. Перед кожним
+    стрибком годинника цикл подій виконує все, що готове, тож задачі
+    бачать час так само, як у реальному режимі, лише без очікування.
+    """
+
+    # Скільки разів поступитись циклу, поки він не спорожніє
+    SETTLE_LIMIT = 10_000
+
+    def __init__(self, start: float = 0.0, epoch: float = 1_700_000_000.0):
+        self._now = start
+        self.epoch = epoch  # wall() = epoch + now()
+        self._sleepers: List[Tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.jumps = 0
+
+    def now(self) -> float:
+        return self._now
+
+    def wall(self) -> float:
+        return self.epoch + self._now
+
+    async def sleep(self, delay: float):
+        if delay <= 0:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self._now + delay, next(self._seq), future))
+        # Скасований sleep лишається в купі і пропускається при стрибку
+        await future
+
+    async def wait(self, event: asyncio.Event, timeout: Optional[float]) -> bool:
+        if event.is_set():
+            return True
+        if timeout is None:
+            await event.wait()
+            return True
+        waiter = asyncio.ensure_future(event.wait())
+        sleeper = asyncio.ensure_future(self.sleep(timeout))
+        try:
+            await asyncio.wait((waiter, sleeper), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            sleeper.cancel()
+        return event.is_set()
+
+    @property
+    def pending(self) -> int:
+        """Скільки сплячих чекає на годинник"""
+        return sum(1 for _, _, future in self._sleepers if not future.done())
+
+    def next_deadline(self) -> Optional[float]:
+        """Найближчий дедлайн сплячого"""
+        sleepers = self._sleepers
+        while sleepers and sleepers[0][2].done():
+            heapq.heappop(sleepers)
+        return sleepers[0][0] if sleepers else None
+
+    async def settle(self):
+        """Дає циклу виконати все готове: після цього кожна задача чекає на годинник"""
+        # Порожня черга готових колбеків циклу (_ready) - нічого не виконується;
+        # для циклів без неї - фіксована кількість поступок
+        ready = getattr(asyncio.get_running_loop(), '_ready', None)
+        for _ in range(self.SETTLE_LIMIT if ready is not None else 100):
+            await asyncio.sleep(0)
+            if ready is not None and not ready:
+                return
+
+    def _jump(self, deadline: float):
+        self._now = max(self._now, deadline)
+        self.jumps += 1
+        sleepers = self._sleepers
+        while sleepers and sleepers[0][0] <= self._now:
+            future = heapq.heappop(sleepers)[2]
+            if not future.done():
+                future.set_result(None)
+
+    async def advance(self, seconds: float):
+        """Переводить годинник на seconds вперед, будячи сплячих по черзі"""
+        target = self._now + seconds
+        await self.settle()
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > target:
+                break
+            self._jump(deadline)
+            await self.settle()
+        self._now = max(self._now, target)
+        await self.settle()
+
+    async def run_until(self, done: Callable[[], bool], limit: float = 3600.0) -> bool:
+        """Стрибає від дедлайну до дедлайну, поки done() не справдиться; False - минув limit"""
+        end = self._now + limit
+        await self.settle()
+        while not done():
+            deadline = self.next_deadline()
+            if deadline is None or deadline > end:
+                return done()
+            self._jump(deadline)
+            await self.settle()
+        return True
+
+
+class GameClock:
+    """Годинник бота: делегує поточному джерелу часу"""
+
+    def __init__(self):
+        self.source = RealClock()
+
+    def use(self, source) -> object:
+        """Підміна джерела часу; повертає попереднє"""
+        previous, self.source = self.source, source
+        return previous
+
+    @property
+    def virtual(self) -> bool:
+        return isinstance(self.source, VirtualClock)
+
+    def now(self) -> float:
+        return self.source.now()
+
+    def wall(self) -> float:
+        return self.source.wall()
+
+    async def sleep(self, delay: float):
+        await self.source.sleep(delay)
+
+    async def wait(self, event: asyncio.Event, timeout: Optional[float]) -> bool:
+        return await self.source.wait(event, timeout)
+
+
+game_clock = GameClock()
@@ -49,6 +49,9 @@ ROLES = {
     }
 }
 
+# Максимум гравців у грі (людей і ботів разом)
+MAX_PLAYERS = int(os.getenv('MAFIA_MAX_PLAYERS', '15'))
+
 # Імена ботів
 BOT_NAMES = [
     "Інокентій", "Євлампій", "Параска", "Мокрина", "Тиміш",
@@ -227,6 +230,15 @@ TIMERS = {
     'voting': 45,
     'final_vote': 30,
 }
+# Межі таймерів, які чат може задати командою /timers, сек
+TIMER_LIMITS = (10, 300)
+
+# Адаптивні фази: фаза закривається, щойно живим людям нічого робити,
+# обговорення - після DISCUSSION_QUIET сек тиші в чаті, а в грі, де ботів
+# більше, ніж живих людей, таймери і паузи ботів множаться на BOT_MAJORITY_PACE
+ADAPTIVE_TIMERS = os.getenv('MAFIA_ADAPTIVE_TIMERS', '1') == '1'
+DISCUSSION_QUIET = float(os.getenv('MAFIA_DISCUSSION_QUIET', '20'))  # сек
+BOT_MAJORITY_PACE = 0.5
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -237,3 +249,74 @@ GIF_PATHS = {
     'vote': os.path.join(BASE_DIR, 'vote.gif'),
     'win': os.path.join(BASE_DIR, 'win.gif')
 }
+
+# Кеш file_id для GIF (щоб не завантажувати файли в Telegram щоразу)
+MEDIA_CACHE_PATH = os.getenv('MAFIA_MEDIA_CACHE', os.path.join(BASE_DIR, 'media_cache.json'))
+
+# Файл SQLite для збереження ігор між рестартами (порожньо - лише пам'ять)
+GAME_DB_PATH = os.getenv('MAFIA_GAME_DB')
+
+# Лог подій ігор (eventlog.py): каталог файлів events-YYYY-MM-DD.bin (порожньо - вимкнено)
+EVENT_LOG_DIR = os.getenv('MAFIA_EVENT_LOG')
+EVENT_LOG_FLUSH_BYTES = 64 * 1024  # буфер подій, після якого блоки дописуються у файл
+EVENT_LOG_FLUSH_INTERVAL = float(os.getenv('MAFIA_EVENT_LOG_FLUSH', '5'))  # сек між дописуваннями
+
+# Режим запуску: 'polling', 'webhook', 'sharded' (фронт + воркери) або 'shard' (воркер)
+RUN_MODE = os.getenv('MAFIA_RUN_MODE', 'polling')
+
+# Адреса Bot API (можна вказати локальний фейковий сервер для тестів)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+
+# Налаштування webhook
+WEBHOOK_URL = os.getenv('MAFIA_WEBHOOK_URL', '')  # публічна адреса, напр. https://example.com
+WEBHOOK_LISTEN = os.getenv('MAFIA_WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('MAFIA_WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('MAFIA_WEBHOOK_PATH', '/telegram')
+# Секретний токен webhook (заголовок X-Telegram-Bot-Api-Secret-Token); якщо не
+# задано - при кожному старті генерується випадковий і передається в setWebhook
+WEBHOOK_SECRET = os.getenv('MAFIA_WEBHOOK_SECRET') or None
+# Відповідати на натискання кнопок прямо у відповіді на webhook
+WEBHOOK_INLINE_ANSWERS = os.getenv('MAFIA_WEBHOOK_INLINE_ANSWERS', '1') == '1'
+WEBHOOK_INLINE_TIMEOUT = 0.5  # сек очікування першого answerCallbackQuery
+
+# Шардування: фронт приймає оновлення (polling або webhook) і розподіляє
+# їх за chat_id між воркерами; кожен воркер слухає 127.0.0.1:<порт + номер>
+# Одна активна гра на людину між шардами перевіряє фронт (див. sharding.py)
+SHARD_FRONT_MODE = os.getenv('MAFIA_SHARD_FRONT', 'webhook')  # як фронт отримує оновлення
+SHARD_COUNT = int(os.getenv('MAFIA_SHARDS', '4'))
+SHARD_BASE_PORT = int(os.getenv('MAFIA_SHARD_BASE_PORT', '9100'))
+SHARD_INDEX = int(os.getenv('MAFIA_SHARD_INDEX', '0'))  # задає фронт для воркера
+SHARD_SECRET = os.getenv('MAFIA_SHARD_SECRET')  # задає фронт для воркера
+
+# Ліміти вихідних повідомлень Telegram (token bucket)
+OUTBOUND_GLOBAL_RATE = float(os.getenv('MAFIA_OUTBOUND_RATE', '30'))  # повідомлень на секунду для всього бота
+OUTBOUND_GROUP_RATE = 20  # повідомлень на хвилину в одну групу
+OUTBOUND_MAX_RETRIES = 3  # повторів після RetryAfter
+# Декоративні повідомлення (FLAVOR), що чекали в черзі довше, відкидаються
+OUTBOUND_FLAVOR_MAX_WAIT = float(os.getenv('MAFIA_OUTBOUND_FLAVOR_WAIT', '5'))  # сек
+if RUN_MODE == 'shard':
+    # Ліміт на токен бота спільний - ділимо його між воркерами
+    OUTBOUND_GLOBAL_RATE = OUTBOUND_GLOBAL_RATE / SHARD_COUNT
+
+# Редагування лобі: запити в межах вікна зливаються в одне редагування
+LOBBY_EDIT_WINDOW = float(os.getenv('MAFIA_LOBBY_EDIT_WINDOW', '1.0'))  # сек
+
+# Живий підсумок ходів фази (одне повідомлення, що редагується)
+PROGRESS_EDIT_WINDOW = float(os.getenv('MAFIA_PROGRESS_EDIT_WINDOW', '1.5'))  # сек
+PROGRESS_MODES = ('live', 'each')  # live - підсумок, each - повідомлення на кожен хід
+
+# Метрики Prometheus (/metrics); порт 0 вимикає сервер
+METRICS_LISTEN = os.getenv('MAFIA_METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('MAFIA_METRICS_PORT', '9464'))
+if RUN_MODE == 'shard' and METRICS_PORT:
+    # Кожен воркер має власний ендпоінт
+    METRICS_PORT += 1 + SHARD_INDEX
+
+# Прибирання покинутих ігор: сек без жодної зміни стану гри за фазою
+# (у фазах з таймером зміни йдуть щохвилини, тож простій там - зависла гра)
+GAME_IDLE_TTL_DEFAULT = float(os.getenv('MAFIA_GAME_TTL', '600'))
+GAME_IDLE_TTL = {
+    'registration': float(os.getenv('MAFIA_LOBBY_TTL', '1800')),
+}  # решта фаз - GAME_IDLE_TTL_DEFAULT
+MAX_LOBBIES = int(os.getenv('MAFIA_MAX_LOBBIES', '5000'))  # відкритих лобі; найдавніші закриваються
+SWEEP_INTERVAL = float(os.getenv('MAFIA_SWEEP_INTERVAL', '60'))  # сек між обходами
@@ -0,0 +1,108 @@
+"""Coalesced message edits: at most one edit in flight per chat, latest state wins.
+
+Лобі гри редагується при кожному вході, виході чи додаванні ботів. Коли
+десять людей тиснуть "ПРИЄДНАТИСЯ" за секунду, десять edit_message_text
+впираються в ліміт чату. Тут запити на редагування одного чату
+зливаються: перше редагування чекає коротке вікно, за цей час нові
+запити лише замінюють функцію рендера, і в Telegram іде один виклик з
+останнім станом. Поки редагування в дорозі, наступне не стартує, а
+запити, що прийшли під час нього, дають ще одне редагування після вікна.
+Якщо текст і кнопки не змінились з минулого разу, виклик не робиться.
+Ключ - chat_id або будь-який інший хешований ідентифікатор повідомлення.
+"""
+
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from clock import game_clock
+from config import LOBBY_EDIT_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# Рендер повертає (текст, розмітка) або None, якщо редагувати вже нічого
+Content = Tuple[str, Any]
+Render = Callable[[], Optional[Content]]
+Send = Callable[[str, Any], Awaitable[Any]]
+
+
+class CoalescedEdits:
+    """Злиття редагувань одного повідомлення на чат"""
+
+    def __init__(self, window: float = LOBBY_EDIT_WINDOW):
+        self.window = window
+        self._pending: Dict[Hashable, Tuple[Render, Send]] = {}  # ключ: останній запит
+        self._tasks: Dict[Hashable, asyncio.Task] = {}  # ключ: задача, що редагує
+        self._last: Dict[Hashable, Content] = {}  # ключ: вміст, що зараз у повідомленні
+        self._closing: set = set()  # ключі, стан яких звільняється після останнього редагування
+        self.stats: Counter = Counter()  # requested, coalesced, unchanged, edited, failed
+
+    def request(self, key: Hashable, render: Render, send: Send):
+        """Запит на редагування; рендер викличеться пізніше з актуальним станом"""
+        self.stats['requested'] += 1
+        if key in self._pending:
+            self.stats['coalesced'] += 1
+        self._pending[key] = (render, send)
+        self._closing.discard(key)
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.get_running_loop().create_task(self._run(key))
+
+    def sent(self, key: Hashable, content: Content):
+        """Повідомлення надіслано або змінено в обхід - запам'ятовуємо його вміст"""
+        self._last[key] = content
+
+    def invalidate(self, key: Hashable):
+        """Вміст повідомлення невідомий (його змінили іншим текстом)"""
+        self._last.pop(key, None)
+
+    def close(self, key: Hashable):
+        """Запитів більше не буде: відкладене редагування ще піде, потім стан звільняється"""
+        if key in self._tasks:
+            self._closing.add(key)
+        else:
+            self._last.pop(key, None)
+
+    def forget(self, key: Hashable):
+        """Повідомлення більше не редагується: скасовуємо відкладене редагування"""
+        self._pending.pop(key, None)
+        self._last.pop(key, None)
+        self._closing.discard(key)
+        task = self._tasks.pop(key, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    @property
+    def saved(self) -> int:
+        """Скільки викликів edit_message_text не знадобилось"""
+        return self.stats['coalesced'] + self.stats['unchanged']
+
+    async def _run(self, key: Hashable):
+        try:
+            while key in self._pending:
+                await game_clock.sleep(self.window)
+                render, send = self._pending.pop(key)
+                content = render()
+                if content is None:
+                    continue
+                if self._last.get(key) == content:
+                    self.stats['unchanged'] += 1
+                    continue
+                try:
+                    await send(*content)
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    self._last.pop(key, None)
+                    logger.error(f"Помилка оновлення повідомлення: {e}")
+                    continue
+                self._last[key] = content
+                self.stats['edited'] += 1
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+                if key in self._closing:
+                    self._closing.discard(key)
+                    self._last.pop(key, None)
+
+
+lobby_edits = CoalescedEdits()
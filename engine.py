@@ -0,0 +1,442 @@
+"""Headless game engine: the Mafia rules as pure state transitions over MafiaGame.
+
+Рушій не знає про Telegram і не чекає: кожен метод приймає подію гри
+(хід гравця, кінець таймера фази), змінює стан через MafiaGame (тобто
+з записом у журнал) і повертає список подій для відображення. handlers.py
+перетворює події на повідомлення, клавіатури і таймери, а simulate()
+проганяє повну гру без мережі - таймери фаз там спрацьовують одразу.
+Усі випадкові рішення (боти, помилка детектива, картопля) беруться з
+переданого random.Random, тож симуляцію можна відтворити за seed.
+"""
+
+import random
+from typing import Callable, List, Optional
+
+from config import ADAPTIVE_TIMERS, BOT_MAJORITY_PACE, TIMER_LIMITS, TIMERS
+from game_state import GameState, MafiaGame, Player, mafia_game
+
+# Фаза гри: ключ її тривалості в config.TIMERS і таймерах чату
+TIMER_KEYS = {'night': 'night', 'discussion': 'discussion', 'voting': 'voting', 'final_voting': 'final_vote'}
+
+# Пауза перед ніччю після підсумків голосування, сек
+NIGHT_DELAY_SKIPPED = 2
+NIGHT_DELAY_VERDICT = 3
+
+MAFIA_ROLES = frozenset({'kishkel', 'rohalskyi'})
+
+DETECTIVE_ERROR_CHANCE = 0.05
+POTATO_HIT_CHANCE = 0.20
+BOT_VOTE_CHANCE = 0.80
+
+
+class Event:
+    """Подія гри для відображення: тип і дані"""
+
+    __slots__ = ('kind', 'data')
+
+    def __init__(self, kind: str, **data):
+        self.kind = kind
+        self.data = data
+
+    def __getitem__(self, key: str):
+        return self.data[key]
+
+    def __repr__(self) -> str:
+        return f"Event({self.kind!r}, {self.data!r})"
+
+
+Events = List[Event]
+
+
+class GameEngine:
+    """Правила гри: переходи фаз, ходи гравців і ботів, підрахунки, перемога"""
+
+    def __init__(self, games: MafiaGame, rng: Optional[random.Random] = None, adaptive: bool = ADAPTIVE_TIMERS):
+        self.games = games
+        self.rng = rng or random.Random()
+        self.adaptive = adaptive  # фази закриваються, щойно людям нічого робити; ігри ботів швидші
+
+    # ============================================
+    # ТРИВАЛІСТЬ ФАЗ
+    # ============================================
+
+    def pace(self, game: GameState) -> float:
+        """Множник таймерів і пауз ботів: у грі, де ботів більше за живих людей, - BOT_MAJORITY_PACE"""
+        humans = len(game.alive_humans)
+        if self.adaptive and len(game.alive_players) - humans > humans:
+            return BOT_MAJORITY_PACE
+        return 1.0
+
+    def phase_timeout(self, game: GameState, phase: str) -> int:
+        """Тривалість фази, сек: таймери чату поверх config.TIMERS з урахуванням темпу гри
+
+        0 - у фазі нікому з живих людей ходити (боти вже походили), її таймер
+        спрацьовує одразу.
+        """
+        if self.adaptive and not self._humans_to_act(game, phase):
+            return 0
+        key = TIMER_KEYS[phase]
+        seconds = (game.timers or TIMERS).get(key, TIMERS[key])
+        # Стиснення не опускає таймер нижче мінімуму /timers (якщо він не був меншим)
+        return max(min(seconds, TIMER_LIMITS[0]), round(seconds * self.pace(game)))
+
+    def _has_night_action(self, game: GameState, user_id: int) -> bool:
+        return bool(self.games.get_role_info(game.all_players[user_id].role).get('action'))
+
+    def _humans_to_act(self, game: GameState, phase: str) -> bool:
+        """Чи є у фазі хід у когось із живих людей"""
+        if phase == 'night':
+            return any(self._has_night_action(game, uid) for uid in game.alive_humans)
+        return bool(game.alive_humans)
+
+    def _night_done(self, game: GameState) -> bool:
+        """Усі живі люди, яким є що робити вночі, походили"""
+        if not self.adaptive:
+            return not game.night_pending
+        # Мирні без нічної дії ніч не затримують
+        return not any(self._has_night_action(game, uid) for uid in game.night_pending)
+
+    # ============================================
+    # ЛОГІКА БОТІВ
+    # ============================================
+
+    def bot_mafia_choice(self, game: GameState, bot_id: int) -> Optional[int]:
+        """Вибір жертви для мафії (своїх не вбиває)"""
+        all_players = game.all_players
+        targets = [pid for pid in game.alive_players if all_players[pid].role not in MAFIA_ROLES]
+        return self.rng.choice(targets) if targets else None
+
+    def bot_doctor_choice(self, game: GameState, bot_id: int) -> Optional[int]:
+        """Вибір цілі для лікаря (себе не лікує)"""
+        targets = [pid for pid in game.alive_players if pid != bot_id]
+        return self.rng.choice(targets) if targets else None
+
+    def bot_voting_choice(self, game: GameState, bot_id: int) -> int:
+        """Кандидат від бота або 0 - пропустити день"""
+        if self.rng.random() < BOT_VOTE_CHANCE:
+            targets = [pid for pid in game.alive_players if pid != bot_id]
+            if targets:
+                return self.rng.choice(targets)
+        return 0
+
+    def _alive_bots(self, game: GameState) -> List[Player]:
+        return [bot for bot in game.bots.values() if bot.alive]
+
+    # ============================================
+    # ПОЧАТОК ГРИ І НІЧ
+    # ============================================
+
+    def start_game(self, chat_id: int) -> Events:
+        """Роздача ролей і перша ніч; порожній список - гравців замало"""
+        if not self.games.assign_roles(chat_id):
+            return []
+        game = self.games.games[chat_id]
+        return [Event('roles_assigned', players=list(game.all_players.values()))] + \
+            self.start_night(chat_id, day_number=1)
+
+    def start_night(self, chat_id: int, day_number: Optional[int] = None) -> Events:
+        """Нова ніч: скидання нічних дій і ходи ботів"""
+        game = self.games.games[chat_id]
+        if day_number is None:
+            day_number = game.day_number + 1
+        timeout = self.phase_timeout(game, 'night')
+        self.games.set_phase(chat_id, 'night', timeout=timeout, day_number=day_number)
+
+        acted = []
+        for bot in self._alive_bots(game):
+            action = self.games.get_role_info(bot.role).get('action')
+            target = None
+            if action == 'kill':
+                target = self.bot_mafia_choice(game, bot.id)
+            elif action == 'heal':
+                target = self.bot_doctor_choice(game, bot.id)
+            # Детектив ботам не випадає
+            if target:
+                self.games.record_night_action(chat_id, bot.id, action, target)
+                acted.append(bot)
+
+        return [Event('night_started', day=day_number, timeout=timeout),
+                Event('bots_acted', phase='night', bots=acted)]
+
+    def night_action(self, chat_id: int, user_id: int, action: str, target: int) -> Events:
+        """Нічна дія гравця; якщо всі живі люди походили - ніч закінчується"""
+        game = self.games.games.get(chat_id)
+        if not game or game.phase != 'night' or game.night_resolved or user_id not in game.alive_humans:
+            return []
+        self.games.record_night_action(chat_id, user_id, action, target)
+        if self._night_done(game):
+            return self._resolve_night(chat_id, 'all_acted')
+        return []
+
+    def end_night(self, chat_id: int) -> Events:
+        """Таймер ночі: підсумки з тими діями, що є"""
+        game = self.games.games.get(chat_id)
+        if not game or game.phase != 'night' or game.night_resolved:
+            return []
+        # Нульовий таймер ночі, де людям нічого робити, - це теж "усі походили"
+        return self._resolve_night(chat_id, 'all_acted' if self._night_done(game) else 'timeout')
+
+    def _resolve_night(self, chat_id: int, reason: str) -> Events:
+        """Розбір нічних дій: смерті, порятунок, перевірки детектива"""
+        game = self.games.games[chat_id]
+        all_players = game.all_players
+        rng = self.rng
+        self.games.update_game(chat_id, night_resolved=True)
+        events = [Event('night_ended', reason=reason)]
+
+        mafia_target: Optional[int] = None
+        healed_target: Optional[int] = None
+        detective_shot: Optional[int] = None
+        checks = []
+        perks = []  # (тип, гравець) для блоку подій ночі
+
+        # Картопля з Буковеля
+        potato_victims = []
+        if game.special_event == 'bukovel':
+            for thrower_id, target_id in game.potato_throws.items():
+                if rng.random() < POTATO_HIT_CHANCE:
+                    potato_victims.append(target_id)
+                    perks.append(('potato', all_players[target_id]))
+
+        for user_id, action_info in game.night_actions.items():
+            action = action_info['action']
+            target = action_info['target']
+
+            if action == 'kill':
+                mafia_target = target
+            elif action == 'heal':
+                healed_target = target
+                self.games.update_game(chat_id, last_healed=healed_target)
+            elif action == 'check':
+                target_role_key = all_players[target].role
+                detective_error = rng.random() < DETECTIVE_ERROR_CHANCE
+                if target_role_key == 'kishkel':
+                    is_mafia = False
+                else:
+                    is_mafia = self.games.get_role_info(target_role_key)['team'] == 'mafia'
+                    if detective_error:
+                        is_mafia = not is_mafia
+                        self.games.update_game(chat_id, detective_error_target=target)
+                checks.append((user_id, target, is_mafia))
+            elif action == 'shoot':
+                detective_shot = target
+
+        victims = set()
+        saved: Optional[Player] = None
+
+        if mafia_target:
+            if mafia_target == healed_target:
+                saved = all_players[healed_target]
+                perks.append(('saved', saved))
+            else:
+                victims.add(mafia_target)
+
+        if detective_shot and detective_shot != healed_target:
+            victims.add(detective_shot)
+            self.games.update_game(chat_id, detective_shot_used=True)
+            perks.append(('shot', all_players[detective_shot]))
+
+        victims.update(potato_victims)
+
+        self.games.update_game(chat_id, mafia_misfire=False)
+        self.games.kill_players(chat_id, victims)
+
+        for detective_id, target_id, is_mafia in checks:
+            if detective_id in game.players:
+                events.append(Event('detective_result', detective_id=detective_id,
+                                    target=all_players[target_id], is_mafia=is_mafia))
+
+        self.games.set_phase(chat_id, 'day')
+        discussion = self.phase_timeout(game, 'discussion')  # 0 - без живих людей обговорювати нікому
+        events.append(Event('morning', day=game.day_number, victims=[all_players[v] for v in victims],
+                            saved=saved, perks=perks, discussion=discussion))
+
+        if self._check_victory(chat_id, events):
+            return events
+
+        self.games.set_phase(chat_id, 'discussion', timeout=discussion)
+        self.games.update_game(chat_id, discussion_started=True)
+        events.append(Event('discussion_started', timeout=discussion))
+        return events
+
+    # ============================================
+    # ДЕНЬ: ВИСУНЕННЯ І ФІНАЛЬНЕ ГОЛОСУВАННЯ
+    # ============================================
+
+    def end_discussion(self, chat_id: int) -> Events:
+        """Таймер обговорення: переходимо до висунення"""
+        game = self.games.games.get(chat_id)
+        if not game or game.phase != 'discussion':
+            return []
+        return [Event('discussion_ended')] + self.start_voting(chat_id)
+
+    def start_voting(self, chat_id: int) -> Events:
+        """Висунення кандидатів; боти голосують одразу"""
+        game = self.games.games[chat_id]
+        timeout = self.phase_timeout(game, 'voting')
+        self.games.set_phase(chat_id, 'voting', timeout=timeout)
+
+        acted = self._alive_bots(game)
+        for bot in acted:
+            self.games.record_vote(chat_id, bot.id, self.bot_voting_choice(game, bot.id))
+
+        return [Event('voting_started', timeout=timeout),
+                Event('bots_acted', phase='voting', bots=acted)]
+
+    def nominate(self, chat_id: int, user_id: int, target: int) -> Events:
+        """Голос гравця за кандидата (0 - пропустити день)"""
+        game = self.games.games.get(chat_id)
+        if not game or game.phase != 'voting' or game.nominations_done or user_id not in game.alive_humans:
+            return []
+        self.games.record_vote(chat_id, user_id, target)
+        if game.nominations.complete:
+            return self.close_nominations(chat_id)
+        return []
+
+    def close_nominations(self, chat_id: int) -> Events:
+        """Підсумки висунення (всі проголосували або вийшов час)"""
+        game = self.games.games.get(chat_id)
+        if not game or game.phase != 'voting' or game.nominations_done:
+            return []
+        # Підсумки рахуються один раз, навіть якщо голос прийде під час паузи
+        self.games.update_game(chat_id, nominations_done=True)
+
+        # Підсумок вже пораховано інкрементально в Ballot
+        ballot = game.nominations
+        if not ballot.top:
+            return [Event('nominations_closed', outcome='skipped', nominee=None),
+                    Event('night_scheduled', delay=NIGHT_DELAY_SKIPPED)]
+
+        if ballot.tie:
+            # Нічия - нікого не виключаємо
+            return [Event('nominations_closed', outcome='tie', nominee=None),
+                    Event('night_scheduled', delay=NIGHT_DELAY_SKIPPED)]
+
+        nominee_id = ballot.leader()
+        self.games.update_game(chat_id, vote_nominee=nominee_id)
+        return [Event('nominations_closed', outcome='nominee', nominee=game.all_players[nominee_id])] + \
+            self.start_final_voting(chat_id)
+
+    def start_final_voting(self, chat_id: int) -> Events:
+        """Голосування ЗА/ПРОТИ виключення кандидата"""
+        game = self.games.games[chat_id]
+        timeout = self.phase_timeout(game, 'final_voting')
+        self.games.set_phase(chat_id, 'final_voting', timeout=timeout)
+
+        acted = self._alive_bots(game)
+        for bot in acted:
+            self.games.record_final_vote(chat_id, bot.id, self.rng.choice(('yes', 'no')))
+
+        return [Event('final_voting_started', nominee=game.all_players[game.vote_nominee], timeout=timeout),
+                Event('bots_acted', phase='final_voting', bots=acted)]
+
+    def final_vote(self, chat_id: int, user_id: int, vote: str) -> Events:
+        """Голос гравця ЗА ('yes') або ПРОТИ ('no')"""
+        game = self.games.games.get(chat_id)
+        if not game or game.phase != 'final_voting' or game.final_voting_done or \
+                user_id not in game.alive_humans:
+            return []
+        self.games.record_final_vote(chat_id, user_id, vote)
+        if game.final_ballot.complete:
+            return self.close_final_voting(chat_id)
+        return []
+
+    def close_final_voting(self, chat_id: int) -> Events:
+        """Підсумки фінального голосування"""
+        game = self.games.games.get(chat_id)
+        if not game or game.phase != 'final_voting' or game.final_voting_done:
+            return []
+        self.games.update_game(chat_id, final_voting_done=True)
+
+        yes_votes = game.final_ballot.count('yes')
+        no_votes = game.final_ballot.count('no')
+        nominee = game.all_players[game.vote_nominee]
+        eliminated = yes_votes > no_votes
+        if eliminated:
+            self.games.kill_players(chat_id, [nominee.id])
+
+        events = [Event('verdict', nominee=nominee, eliminated=eliminated, yes=yes_votes, no=no_votes)]
+        if eliminated and self._check_victory(chat_id, events):
+            return events
+        events.append(Event('night_scheduled', delay=NIGHT_DELAY_VERDICT))
+        return events
+
+    # ============================================
+    # ПЕРЕМОГА
+    # ============================================
+
+    def _check_victory(self, chat_id: int, events: Events) -> bool:
+        """Якщо одна з команд перемогла - гра завершується"""
+        winner = self.games.games[chat_id].winner()
+        if winner is None:
+            return False
+        self.games.end_game(chat_id, winner)
+        events.append(Event('victory', winner=winner))
+        return True
+
+
+game_engine = GameEngine(mafia_game)
+
+
+# ============================================
+# СИМУЛЯЦІЯ
+# ============================================
+
+# Подія, що ставить таймер фази: метод рушія, який викличе таймер
+PHASE_DEADLINES = {
+    'night_started': 'end_night',
+    'discussion_started': 'end_discussion',
+    'voting_started': 'close_nominations',
+    'final_voting_started': 'close_final_voting',
+    'night_scheduled': 'start_night',
+}
+
+# Хід людини: (рушій, гра, user_id) -> події
+Policy = Callable[[GameEngine, GameState, int], Events]
+
+
+def random_policy(engine: GameEngine, game: GameState, user_id: int) -> Events:
+    """Людина ходить як бот: випадкова ціль своєї ролі"""
+    chat_id = game.chat_id
+    if game.phase == 'night':
+        action = engine.games.get_role_info(game.all_players[user_id].role).get('action')
+        if not action:
+            return []
+        targets = [pid for pid in game.alive_players if pid != user_id]
+        return engine.night_action(chat_id, user_id, action, engine.rng.choice(targets)) if targets else []
+    if game.phase == 'voting':
+        return engine.nominate(chat_id, user_id, engine.bot_voting_choice(game, user_id))
+    if game.phase == 'final_voting':
+        return engine.final_vote(chat_id, user_id, engine.rng.choice(('yes', 'no')))
+    return []
+
+
+def simulate(engine: GameEngine, chat_id: int, humans: int = 1, bots: int = 14,
+             policy: Policy = random_policy, max_phases: int = 1000) -> Optional[str]:
+    """Повна гра без Telegram; повертає переможця (None - гра не завершилась)"""
+    games = engine.games
+    games.create_game(chat_id, admin_id=1)
+    for user_id in range(1, humans + 1):
+        games.add_player(chat_id, user_id, f"player{user_id}")
+    games.add_bots(chat_id, bots)
+
+    events = engine.start_game(chat_id)
+    for _ in range(max_phases):
+        deadline = None
+        for event in events:
+            if event.kind == 'victory':
+                return event['winner']
+            deadline = PHASE_DEADLINES.get(event.kind, deadline)
+        game = games.games.get(chat_id)
+        if game is None or deadline is None:
+            return None
+
+        # Спершу ходять люди; якщо фаза не закрилась - спрацьовує її таймер
+        events = []
+        if deadline != 'start_night':
+            for user_id in list(game.alive_humans):
+                events += policy(engine, game, user_id)
+        if not any(event.kind in PHASE_DEADLINES or event.kind == 'victory' for event in events):
+            events += getattr(engine, deadline)(chat_id)
+    games.end_game(chat_id)
+    return None
@@ -0,0 +1,361 @@
+"""Per-game event log: every state change of every game in compact binary day files.
+
+Лог подій - ті самі записи (op, args), що й журнал сховища: create,
+join, leave, roles (ролі і предмети), lobby, phase, night (нічна дія),
+potato, kill (смерть), vote (висунення), fvote (ЗА/ПРОТИ), set
+(прапорці, зокрема detective_error_target) і end з переможцем. Журнал
+SQLite обрізається знімками і зникає з кінцем гри, а лог подій лишається
+для налагодження й аналітики: replay.py відтворює стан будь-якої гри на
+будь-якому індексі події.
+
+Формат msgpack-подібний: тег-байт, числа 0-127 - в самому тезі. Рядки і
+решта чисел (id гравців, чатів, повідомлень) інтернуються: перша поява
+пише значення, далі - лише номер у таблиці. Події гри накопичуються в
+буфері і дописуються у файл дня (events-YYYY-MM-DD.bin) блоками: коли
+буфери виростають до flush_bytes, раз на interval секунд і при зупинці.
+Кожен блок самодостатній (свої таблиці інтернування), тож блоки гри,
+записані до і після рестарту, читаються незалежно; відновлена гра
+починає новий блок записом restore з повним станом.
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from clock import game_clock
+from config import EVENT_LOG_FLUSH_BYTES, EVENT_LOG_FLUSH_INTERVAL
+from storage import Record
+
+logger = logging.getLogger(__name__)
+
+# Операції MafiaGame._apply у порядку кодів; restore - повний стан після рестарту
+OPS = ('create', 'end', 'join', 'leave', 'roles', 'lobby', 'phase', 'night', 'vote', 'fvote',
+       'potato', 'kill', 'set', 'restore')
+OP_CODES = {op: code for code, op in enumerate(OPS)}
+
+MAGIC = b'\xa7G'  # початок блоку
+
+# Теги значень (0x00-0x7f - число 0-127)
+FIXLIST = 0x80  # 0x80-0x8f: список до 15 елементів
+FIXSTR_REF = 0x90  # 0x90-0xbf: інтернований рядок 0-47
+NIL, FALSE, TRUE = 0xc0, 0xc2, 0xc3
+INT_DEF, INT_REF = 0xc5, 0xc6
+STR_DEF, STR_REF = 0xc7, 0xc8
+LIST, DICT, FLOAT = 0xc9, 0xca, 0xcb
+FIXINT_REF = 0xe0  # 0xe0-0xff: інтерноване число 0-31
+
+_DOUBLE = struct.Struct('<d')
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+# ============================================
+# ЗАПИС
+# ============================================
+
+class _GameBlock:
+    """Буфер подій однієї гри з таблицями інтернування поточного блоку"""
+
+    __slots__ = ('chat_id', 'token', 'data', 'count', 'strings', 'ints')
+
+    def __init__(self, chat_id: int, token: int):
+        self.chat_id = chat_id
+        self.token = token
+        self.reset()
+
+    def reset(self):
+        self.data = bytearray()
+        self.count = 0
+        self.strings: Dict[str, int] = {}
+        self.ints: Dict[int, int] = {}
+
+    def add(self, code: int, args) -> int:
+        """Кодує подію; повертає, на скільки байтів виріс буфер"""
+        data = self.data
+        size = len(data)
+        data.append(code)
+        self._value(data, args)
+        self.count += 1
+        return len(data) - size
+
+    def _value(self, out: bytearray, value):
+        kind = type(value)
+        if kind is int:
+            if 0 <= value < 0x80:
+                out.append(value)
+                return
+            ref = self.ints.get(value)
+            if ref is None:
+                self.ints[value] = len(self.ints)
+                out.append(INT_DEF)
+                _write_varint(out, _zigzag(value))
+            elif ref < 32:
+                out.append(FIXINT_REF + ref)
+            else:
+                out.append(INT_REF)
+                _write_varint(out, ref)
+        elif kind is str:
+            ref = self.strings.get(value)
+            if ref is None:
+                self.strings[value] = len(self.strings)
+                encoded = value.encode()
+                out.append(STR_DEF)
+                _write_varint(out, len(encoded))
+                out += encoded
+            elif ref < 48:
+                out.append(FIXSTR_REF + ref)
+            else:
+                out.append(STR_REF)
+                _write_varint(out, ref)
+        elif kind is list or kind is tuple:
+            if len(value) < 16:
+                out.append(FIXLIST + len(value))
+            else:
+                out.append(LIST)
+                _write_varint(out, len(value))
+            for item in value:
+                self._value(out, item)
+        elif value is None:
+            out.append(NIL)
+        elif kind is bool:
+            out.append(TRUE if value else FALSE)
+        elif kind is dict:
+            out.append(DICT)
+            _write_varint(out, len(value))
+            for key, item in value.items():
+                self._value(out, key)
+                self._value(out, item)
+        elif kind is float:
+            out.append(FLOAT)
+            out += _DOUBLE.pack(value)
+        else:
+            raise TypeError(f"Непідтримуване значення в лозі подій: {value!r}")
+
+    def block(self) -> bytes:
+        """Блок для файлу: заголовок (чат, токен, подій, довжина) і події"""
+        header = bytearray(MAGIC)
+        for value in (_zigzag(self.chat_id), self.token, self.count, len(self.data)):
+            _write_varint(header, value)
+        return bytes(header + self.data)
+
+
+class EventLog:
+    """Лог подій ігор: буфери в пам'яті, дописування у файл дня блоками"""
+
+    def __init__(self, directory: str, flush_bytes: int = EVENT_LOG_FLUSH_BYTES,
+                 interval: float = EVENT_LOG_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_bytes = flush_bytes
+        self.interval = interval
+        os.makedirs(directory, exist_ok=True)
+        self._games: Dict[int, _GameBlock] = {}  # chat_id: блок поточної гри
+        self._ready: List[bytes] = []  # блоки завершених ігор, що чекають запису
+        self._buffered = 0
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Counter = Counter()  # events, blocks, bytes, flushes, dropped
+
+    def append(self, chat_id: int, op: str, args: list):
+        """Подія гри (викликає MafiaGame._apply після зміни стану)"""
+        if op == 'create':
+            self._close(chat_id)
+            game = self._games[chat_id] = _GameBlock(chat_id, args[2] if len(args) > 2 else 0)
+        else:
+            game = self._games.get(chat_id)
+            if game is None:
+                return
+        self._buffered += game.add(OP_CODES[op], args)
+        self.stats['events'] += 1
+        if op == 'end':
+            self._close(chat_id)
+        if self._buffered >= self.flush_bytes:
+            self.flush()
+
+    def resume(self, chat_id: int, token: int, state: dict):
+        """Гра, відновлена після рестарту: новий блок з її повним станом"""
+        self._close(chat_id)
+        game = self._games[chat_id] = _GameBlock(chat_id, token)
+        self._buffered += game.add(OP_CODES['restore'], [state])
+        self.stats['events'] += 1
+
+    def _close(self, chat_id: int):
+        game = self._games.pop(chat_id, None)
+        if game is not None and game.count:
+            self._ready.append(game.block())
+
+    def path(self) -> str:
+        """Файл поточного дня (UTC)"""
+        day = time.strftime('%Y-%m-%d', time.gmtime(game_clock.wall()))
+        return os.path.join(self.directory, f"events-{day}.bin")
+
+    def flush(self):
+        """Дописує у файл дня блоки завершених ігор і буфери поточних"""
+        blocks = self._ready
+        for game in self._games.values():
+            if game.count:
+                blocks.append(game.block())
+                game.reset()
+        self._ready = []
+        self._buffered = 0
+        if not blocks:
+            return
+        data = b''.join(blocks)
+        try:
+            with open(self.path(), 'ab') as f:
+                f.write(data)
+        except OSError as e:
+            # Лог подій - для аналізу: гра без нього триває
+            self.stats['dropped'] += len(blocks)
+            logger.error(f"❌ Лог подій: не вдалося записати {len(blocks)} блоків: {e}")
+            return
+        self.stats['blocks'] += len(blocks)
+        self.stats['bytes'] += len(data)
+        self.stats['flushes'] += 1
+
+    def start(self):
+        """Періодичне дописування буферів"""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Зупинка з дописуванням усього, що лишилось у буферах"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+    async def _run(self):
+        while True:
+            await game_clock.sleep(self.interval)
+            self.flush()
+
+
+# ============================================
+# ЧИТАННЯ
+# ============================================
+
+def read_blocks(path: str) -> Iterator[Tuple[int, int, int, bytes]]:
+    """(chat_id, токен, подій, події блоку) кожного блоку файлу"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos = 0
+    while pos < len(data):
+        if data[pos:pos + 2] != MAGIC:
+            raise ValueError(f"{path}: немає початку блоку на байті {pos}")
+        chat_id, pos = _read_varint(data, pos + 2)
+        token, pos = _read_varint(data, pos)
+        count, pos = _read_varint(data, pos)
+        length, pos = _read_varint(data, pos)
+        if pos + length > len(data):
+            # Обірваний запис (падіння під час flush) - решти файлу немає
+            logger.warning(f"⚠️ {path}: обірваний останній блок на байті {pos}")
+            return
+        yield _unzigzag(chat_id), token, count, data[pos:pos + length]
+        pos += length
+
+
+def decode_block(payload: bytes) -> List[Record]:
+    """Події блоку: [(op, args)]"""
+    strings: List[str] = []
+    ints: List[int] = []
+    pos = 0
+
+    def varint() -> int:
+        nonlocal pos
+        result = shift = 0
+        while True:
+            byte = payload[pos]
+            pos += 1
+            result |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def value():
+        nonlocal pos
+        tag = payload[pos]
+        pos += 1
+        if tag < FIXLIST:
+            return tag
+        if tag < FIXSTR_REF:
+            return [value() for _ in range(tag - FIXLIST)]
+        if tag < NIL:
+            return strings[tag - FIXSTR_REF]
+        if tag >= FIXINT_REF:
+            return ints[tag - FIXINT_REF]
+        if tag == INT_DEF:
+            number = _unzigzag(varint())
+            ints.append(number)
+            return number
+        if tag == STR_DEF:
+            length = varint()
+            text = payload[pos:pos + length].decode()
+            pos += length
+            strings.append(text)
+            return text
+        if tag == NIL:
+            return None
+        if tag == TRUE:
+            return True
+        if tag == FALSE:
+            return False
+        if tag == INT_REF:
+            return ints[varint()]
+        if tag == STR_REF:
+            return strings[varint()]
+        if tag == LIST:
+            return [value() for _ in range(varint())]
+        if tag == DICT:
+            return {value(): value() for _ in range(varint())}
+        if tag == FLOAT:
+            number = _DOUBLE.unpack_from(payload, pos)[0]
+            pos += 8
+            return number
+        raise ValueError(f"Невідомий тег {tag:#x} на байті {pos - 1}")
+
+    records = []
+    end = len(payload)
+    while pos < end:
+        code = payload[pos]
+        pos += 1
+        records.append((OPS[code], value()))
+    return records
+
+
+def load_games(paths: Iterable[str]) -> Dict[Tuple[int, int], List[Record]]:
+    """(chat_id, токен): усі події гри з файлів у порядку запису"""
+    games: Dict[Tuple[int, int], List[Record]] = defaultdict(list)
+    for path in paths:
+        for chat_id, token, _, payload in read_blocks(path):
+            games[(chat_id, token)] += decode_block(payload)
+    return games
@@ -0,0 +1,483 @@
+"""Local stand-in for the Telegram Bot API and an end-to-end load driver.
+
+Фейковий сервер відповідає на методи Bot API, які використовує бот
+(включно з getUpdates), і запам'ятовує надіслані клавіатури, щоб
+генератор навантаження міг "натискати" кнопки як справжні гравці.
+Сервер може додавати затримку до кожної відповіді та відповідати 429
+з retry_after на частину надсилань. Бот запускається з
+TELEGRAM_API_URL=http://127.0.0.1:<port> у режимі polling (оновлення
+через getUpdates) або webhook (оновлення POST-ом на адресу бота).
+
+Запуск:
+    python fake_telegram.py --port 8081 --polling --chats 1000 --latency 30 --flood-rate 0.01
+    python fake_telegram.py --port 8081 --webhook http://127.0.0.1:8443/telegram \\
+        --secret SECRET --chats 100
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from collections import Counter, defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from aiohttp import ClientSession, web
+
+from callbacks import ACTION_NAMES, ADD_BOTS, JOIN, START, Callback, decode, encode
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {'id': 1000000, 'is_bot': True, 'first_name': 'Mafia', 'username': 'mafia_test_bot'}
+
+# Методи, на які сервер може відповісти 429 (як ліміти надсилань Telegram)
+FLOOD_METHODS = frozenset({'sendMessage', 'sendAnimation', 'editMessageText', 'deleteMessage'})
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Перцентиль без numpy"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FakeTelegram:
+    """Мінімальна реалізація Bot API в пам'яті"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 flood_rate: float = 0.0, retry_after: int = 1):
+        self.latency = latency  # сек до кожної HTTP-відповіді
+        self.jitter = jitter  # + випадкові 0..jitter сек
+        self.flood_rate = flood_rate  # частка надсилань, що отримують 429
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()  # method: кількість
+        self.floods: Counter = Counter()  # method: відповідей 429
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        # chat_id: {message_id: callback_data кнопок inline клавіатури}
+        self.keyboards: Dict[int, Dict[int, List[str]]] = defaultdict(dict)
+        # Черга для getUpdates (підтверджені offset-ом оновлення видаляються)
+        self.updates: Deque[dict] = deque()
+        self._new_updates = asyncio.Event()
+        # Очікування відповіді бота: id колбеку або chat_id
+        self._answer_waiters: Dict[str, asyncio.Future] = {}
+        self._chat_waiters: Dict[int, List[asyncio.Future]] = defaultdict(list)
+        # Telegram приймає файли до 50 МБ (GIF завантажуються multipart)
+        self.app = web.Application(client_max_size=50 * 1024 * 1024)
+        self.app.router.add_route('*', '/bot{token}/{method}', self.handle)
+
+    # ---------- оновлення для polling ----------
+
+    def push_update(self, update: dict):
+        """Оновлення, яке бот отримає наступним getUpdates"""
+        self.updates.append(update)
+        self._new_updates.set()
+
+    async def get_updates(self, params: dict) -> List[dict]:
+        offset = params.get('offset')
+        if offset is not None:
+            offset = int(offset)
+            while self.updates and self.updates[0]['update_id'] < offset:
+                self.updates.popleft()
+        timeout = float(params.get('timeout') or 0)
+        if not self.updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self.updates, int(params.get('limit') or 100)))
+
+    def expect_answer(self, callback_query_id: str) -> asyncio.Future:
+        """Future, що завершиться, коли бот відповість на колбек"""
+        future = self._answer_waiters[callback_query_id] = asyncio.get_running_loop().create_future()
+        return future
+
+    def expect_message(self, chat_id: int) -> asyncio.Future:
+        """Future, що завершиться з наступним повідомленням бота в чат"""
+        future = asyncio.get_running_loop().create_future()
+        self._chat_waiters[chat_id].append(future)
+        return future
+
+    def _notify_chat(self, chat_id: int):
+        for future in self._chat_waiters.pop(chat_id, ()):
+            if not future.done():
+                future.set_result(chat_id)
+
+    async def _params(self, request: web.Request) -> dict:
+        if request.content_type == 'application/json':
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            if isinstance(value, str) and value[:1] in '{[':
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            params[key] = value
+        return params
+
+    def _message(self, params: dict, **extra) -> dict:
+        chat_id = int(params['chat_id'])
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'},
+            'from': BOT_USER,
+        }
+        message.update(extra)
+        self._remember_keyboard(chat_id, message['message_id'], params.get('reply_markup'))
+        self._notify_chat(chat_id)
+        return message
+
+    def _remember_keyboard(self, chat_id: int, message_id: int, markup):
+        if isinstance(markup, dict) and markup.get('inline_keyboard'):
+            self.keyboards[chat_id][message_id] = [
+                button['callback_data'] for row in markup['inline_keyboard']
+                for button in row if 'callback_data' in button
+            ]
+        elif chat_id in self.keyboards:
+            self.keyboards[chat_id].pop(message_id, None)
+
+    async def call(self, method: str, params: dict):
+        """Обробка одного методу Bot API; повертає result"""
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'setWebhook':
+            self.webhook_url = params.get('url')
+            self.webhook_secret = params.get('secret_token')
+            return True
+        if method == 'getUpdates':
+            return await self.get_updates(params)
+        if method == 'answerCallbackQuery':
+            future = self._answer_waiters.pop(str(params.get('callback_query_id')), None)
+            if future is not None and not future.done():
+                future.set_result(params)
+            return True
+        if method in ('deleteWebhook', 'deleteMessage'):
+            return True
+        if method == 'sendMessage':
+            return self._message(params, text=params.get('text', ''))
+        if method == 'sendAnimation':
+            file_id = params['animation'] if isinstance(params.get('animation'), str) \
+                else f"fake-animation-{next(self._file_ids)}"
+            return self._message(params, caption=params.get('caption'), animation={
+                'file_id': file_id, 'file_unique_id': file_id,
+                'width': 320, 'height': 240, 'duration': 3,
+            })
+        if method == 'editMessageText':
+            chat_id, message_id = int(params['chat_id']), int(params['message_id'])
+            self._remember_keyboard(chat_id, message_id, params.get('reply_markup'))
+            self._notify_chat(chat_id)
+            return {
+                'message_id': message_id, 'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'},
+                'from': BOT_USER, 'text': params.get('text', ''),
+            }
+        raise LookupError(method)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.calls[method] += 1
+        params = await self._params(request)
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if method in FLOOD_METHODS and self.flood_rate and random.random() < self.flood_rate:
+            self.floods[method] += 1
+            return web.json_response({
+                'ok': False, 'error_code': 429,
+                'description': f"Too Many Requests: retry after {self.retry_after}",
+                'parameters': {'retry_after': self.retry_after},
+            }, status=429)
+        try:
+            result = await self.call(method, params)
+        except LookupError:
+            return web.json_response({'ok': False, 'error_code': 404, 'description': 'Not Found'}, status=404)
+        return web.json_response({'ok': True, 'result': result})
+
+
+# ============================================
+# ГЕНЕРАЦІЯ ОНОВЛЕНЬ
+# ============================================
+
+_update_ids = itertools.count(1)
+_query_ids = itertools.count(1)
+
+
+def _user(user_id: int) -> dict:
+    return {'id': user_id, 'is_bot': False, 'first_name': f"Player{user_id}", 'username': f"player{user_id}"}
+
+
+def _chat(chat_id: int) -> dict:
+    return {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group', 'title': f"Group {chat_id}"}
+
+
+def command_update(chat_id: int, user_id: int, command: str) -> dict:
+    """Оновлення з командою (/newgame тощо)"""
+    return {
+        'update_id': next(_update_ids),
+        'message': {
+            'message_id': next(_update_ids), 'date': int(time.time()),
+            'chat': _chat(chat_id), 'from': _user(user_id), 'text': command,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command.split()[0])}],
+        },
+    }
+
+
+def text_update(chat_id: int, user_id: int, text: str) -> dict:
+    """Звичайне текстове повідомлення"""
+    return {
+        'update_id': next(_update_ids),
+        'message': {
+            'message_id': next(_update_ids), 'date': int(time.time()),
+            'chat': _chat(chat_id), 'from': _user(user_id), 'text': text,
+        },
+    }
+
+
+def callback_update(chat_id: int, message_id: int, user_id: int, data: str) -> dict:
+    """Натискання inline-кнопки"""
+    return {
+        'update_id': next(_update_ids),
+        'callback_query': {
+            'id': str(next(_query_ids)), 'from': _user(user_id), 'chat_instance': str(chat_id),
+            'data': data,
+            'message': {
+                'message_id': message_id, 'date': int(time.time()),
+                'chat': _chat(chat_id), 'from': BOT_USER, 'text': '...',
+            },
+        },
+    }
+
+
+def update_kind(update: dict) -> str:
+    """Коротка назва типу оновлення для статистики"""
+    if 'callback_query' in update:
+        payload = decode(update['callback_query']['data'])
+        return 'cb:' + (ACTION_NAMES.get(payload.action, 'unknown') if payload else 'invalid')
+    text = update['message']['text']
+    return text.split()[0] if text.startswith('/') else 'text'
+
+
+# ============================================
+# ГЕНЕРАТОР НАВАНТАЖЕННЯ
+# ============================================
+
+class LoadGenerator:
+    """Проганяє групи через реєстрацію, старт і натискання кнопок"""
+
+    # Скільки чекати на реакцію бота, сек
+    RESPONSE_TIMEOUT = 10
+
+    def __init__(self, server: FakeTelegram, players: int = 5):
+        self.server = server
+        self.players = players
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.inline_answers = 0
+        self.answer_texts: Counter = Counter()  # текст inline-відповіді: кількість
+        self.sent = 0
+        self.sent_by_kind: Counter = Counter()
+
+    async def deliver(self, session: ClientSession, update: dict, kind: str) -> bool:
+        """Доставка оновлення боту; False - помилку вже пораховано"""
+        raise NotImplementedError
+
+    async def post(self, session: ClientSession, update: dict):
+        kind = update_kind(update)
+        started = time.perf_counter()
+        try:
+            measured = await self.deliver(session, update, kind)
+        except asyncio.TimeoutError:
+            self.errors[f"{kind}:timeout"] += 1
+            measured = False
+        except Exception as e:
+            self.errors[f"{kind}:{type(e).__name__}"] += 1
+            measured = False
+        if measured:
+            self.latencies[kind].append(time.perf_counter() - started)
+        self.sent += 1
+        self.sent_by_kind[kind] += 1
+
+    def lobby_message(self, chat_id: int) -> Optional[Tuple[int, Callback]]:
+        """Останнє повідомлення з кнопкою ПРИЄДНАТИСЯ у групі і payload цієї кнопки"""
+        found = []
+        for mid, buttons in self.server.keyboards.get(chat_id, {}).items():
+            for data in buttons:
+                payload = decode(data)
+                if payload is not None and payload.action == JOIN:
+                    found.append((mid, payload))
+        return max(found) if found else None
+
+    async def run_group(self, session: ClientSession, chat_id: int, rounds: int):
+        user_ids = [abs(chat_id) * 100 + i for i in range(1, self.players + 1)]
+        await self.post(session, command_update(chat_id, user_ids[0], '/newgame'))
+
+        # Оновлення обробляються асинхронно - чекаємо на повідомлення з реєстрацією
+        lobby = None
+        for _ in range(50):
+            lobby = self.lobby_message(chat_id)
+            if lobby is not None:
+                break
+            await asyncio.sleep(0.1)
+        if lobby is None:
+            self.errors['lobby:missing'] += 1
+            return
+        message_id, join = lobby
+        for user_id in user_ids:
+            await self.post(session, callback_update(chat_id, message_id, user_id, encode(*join)))
+        # "Додати 5 ботів" - з меню, але без відкриття самого меню
+        add_bots = encode(ADD_BOTS, chat_id, join.token, arg=5)
+        await self.post(session, callback_update(chat_id, message_id, user_ids[0], add_bots))
+        await self.post(session, callback_update(chat_id, message_id, user_ids[0], encode(START, chat_id, join.token)))
+
+        # Гравці натискають кнопки, які бот надіслав їм в особисті
+        keyboards = self.server.keyboards
+        for _ in range(rounds):
+            # Чекаємо, поки бот розішле кнопки фази (ролі, ніч, голосування)
+            for _ in range(50):
+                if any(keyboards.get(user_id) for user_id in user_ids):
+                    break
+                await asyncio.sleep(0.1)
+            for user_id in user_ids:
+                pending = [(mid, buttons) for mid, buttons in list(keyboards.get(user_id, {}).items()) if buttons]
+                for mid, buttons in pending:
+                    keyboards[user_id].pop(mid, None)
+                    await self.post(session, callback_update(user_id, mid, user_id, random.choice(buttons)))
+            await self.post(session, text_update(chat_id, user_ids[-1], 'хто мафія?'))
+            await asyncio.sleep(0.1)
+
+    async def run(self, chats: int, rounds: int = 3, concurrency: int = 50):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(chat_id: int):
+            async with semaphore:
+                await self.run_group(session, chat_id, rounds)
+
+        started = time.perf_counter()
+        async with ClientSession() as session:
+            await asyncio.gather(*(limited(-(1000 + i)) for i in range(chats)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> str:
+        errors = sum(self.errors.values())
+        lines = [f"updates: {self.sent} in {elapsed:.2f} s ({self.sent / elapsed:.0f} updates/s)",
+                 f"inline answers: {self.inline_answers}",
+                 f"errors: {errors} ({errors / max(self.sent, 1):.2%}) {dict(self.errors) if self.errors else ''}"]
+        for kind, values in sorted(self.latencies.items()):
+            failed = sum(n for key, n in self.errors.items() if key.startswith(kind + ':'))
+            lines.append(
+                f"  {kind:<16} n={len(values):<6} p50={percentile(values, 50) * 1000:.1f}ms "
+                f"p99={percentile(values, 99) * 1000:.1f}ms errors={failed / self.sent_by_kind[kind]:.2%}"
+            )
+        lines.append("bot api calls: " + ", ".join(f"{m}={n}" for m, n in self.server.calls.most_common()))
+        if self.server.floods:
+            lines.append("injected 429: " + ", ".join(f"{m}={n}" for m, n in self.server.floods.most_common()))
+        return "\n".join(lines)
+
+
+class WebhookLoad(LoadGenerator):
+    """Оновлення надходять POST-ом на webhook бота; латентність - до HTTP-відповіді"""
+
+    def __init__(self, server: FakeTelegram, url: str, secret: Optional[str], players: int = 5):
+        super().__init__(server, players)
+        self.url = url
+        self.secret = secret
+
+    async def deliver(self, session: ClientSession, update: dict, kind: str) -> bool:
+        # Без --secret - токен, який бот передав у setWebhook (як робить Telegram)
+        secret = self.secret or self.server.webhook_secret
+        headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+        async with session.post(self.url, json=update, headers=headers) as response:
+            body = await response.read()
+            if response.status != 200:
+                self.errors[f"{kind}:{response.status}"] += 1
+                return True
+            if body:
+                answer = json.loads(body)
+                if answer.get('method') == 'answerCallbackQuery':
+                    self.inline_answers += 1
+                    self.answer_texts[answer.get('text', '')] += 1
+        return True
+
+
+class PollingLoad(LoadGenerator):
+    """Оновлення бот забирає через getUpdates; латентність - до першої реакції бота.
+
+    Реакція на колбек - answerCallbackQuery з його id, на команду -
+    перше повідомлення бота в чат. На звичайний текст бот не відповідає,
+    тому для нього латентність не міряється.
+    """
+
+    async def deliver(self, session: ClientSession, update: dict, kind: str) -> bool:
+        server = self.server
+        if 'callback_query' in update:
+            waiter = server.expect_answer(update['callback_query']['id'])
+        elif kind.startswith('/'):
+            waiter = server.expect_message(update['message']['chat']['id'])
+        else:
+            server.push_update(update)
+            return False
+        server.push_update(update)
+        answer = await asyncio.wait_for(waiter, self.RESPONSE_TIMEOUT)
+        if isinstance(answer, dict):
+            self.answer_texts[answer.get('text', '')] += 1
+        return True
+
+
+async def _main(args):
+    server = FakeTelegram(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                          flood_rate=args.flood_rate, retry_after=args.retry_after)
+    runner = web.AppRunner(server.app)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    logger.info(f"Фейковий Bot API слухає {args.host}:{args.port}")
+
+    if args.polling:
+        # Чекаємо, поки бот запуститься і почне забирати оновлення
+        while not server.calls['getUpdates']:
+            await asyncio.sleep(0.1)
+        load = PollingLoad(server, players=args.players)
+    elif args.webhook:
+        # Чекаємо, поки бот запуститься і зареєструє webhook
+        while server.webhook_url is None:
+            await asyncio.sleep(0.1)
+        load = WebhookLoad(server, args.webhook, args.secret, players=args.players)
+    else:
+        await asyncio.Event().wait()
+        return
+
+    elapsed = await load.run(args.chats, rounds=args.rounds, concurrency=args.concurrency)
+    print(load.report(elapsed))
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--polling', action='store_true', help='навантаження через getUpdates')
+    parser.add_argument('--webhook', help='URL webhook бота; без нього і --polling сервер просто працює')
+    parser.add_argument('--secret', help='секретний токен webhook')
+    parser.add_argument('--latency', type=float, default=0, help='затримка відповіді, мс')
+    parser.add_argument('--jitter', type=float, default=0, help='випадкова добавка до затримки, мс')
+    parser.add_argument('--flood-rate', type=float, default=0, help='частка надсилань з відповіддю 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after у відповіді 429, сек')
+    parser.add_argument('--chats', type=int, default=100)
+    parser.add_argument('--players', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=50)
+    logging.basicConfig(level=logging.INFO)
+    # Лог кожного запиту при тисячах груп лише гальмує сервер
+    logging.getLogger('aiohttp.access').setLevel(logging.WARNING)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,54 +1,569 @@
 """Game state and core logic for the Mafia bot."""
 
+import logging
 import random
-from typing import Dict, Optional
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-from config import ROLES, BOT_NAMES, SPECIAL_EVENTS
+from clock import game_clock
+from config import ROLES, BOT_NAMES, MAX_PLAYERS, SPECIAL_EVENTS
+from storage import MemoryStore, Record
+
+logger = logging.getLogger(__name__)
+
+# Спільна порожня множина для ігор, де ролі ще не роздані (економія пам'яті)
+_NO_PLAYERS = frozenset()
+
+
+class Player:
+    """Гравець (людина або бот)"""
+
+    __slots__ = ('id', 'username', 'role', 'alive', 'is_bot')
+
+    def __init__(self, user_id: int, username: str, is_bot: bool = False,
+                 role: Optional[str] = None, alive: bool = True):
+        self.id = user_id
+        self.username = username
+        self.role = role
+        self.alive = alive
+        self.is_bot = is_bot
+
+    @property
+    def team(self) -> str:
+        return ROLES.get(self.role, ROLES['demyan'])['team']
+
+    def to_state(self) -> list:
+        return [self.id, self.username, self.role, self.alive, self.is_bot]
+
+    @classmethod
+    def from_state(cls, state: list) -> 'Player':
+        user_id, username, role, alive, is_bot = state
+        return cls(user_id, username, is_bot, role, alive)
+
+
+class Ballot:
+    """Голосування з інкрементальним підрахунком.
+
+    Кожен голос (і переголосування) оновлює лічильник кандидата, групи
+    кандидатів з однаковою кількістю голосів і множину тих, хто ще не
+    проголосував, тому завершення, лідер і нічия визначаються за O(1)
+    незалежно від кількості гравців.
+    """
+
+    __slots__ = ('votes', 'counts', 'by_count', 'top', 'pending', 'abstain')
+
+    def __init__(self, eligible: Iterable[int] = (), abstain=None):
+        self.votes: Dict[int, object] = {}  # voter: вибір
+        self.counts: Dict[object, int] = {}  # вибір: голосів
+        self.by_count: Dict[int, Set] = {}  # голосів: вибори з такою кількістю
+        self.top = 0  # найбільша кількість голосів за один вибір
+        self.pending: Set[int] = set(eligible)  # хто ще не проголосував
+        self.abstain = abstain  # вибір "утримався" не рахується в підсумку
+
+    @classmethod
+    def from_votes(cls, eligible: Iterable[int], votes: Dict[int, object], abstain=None) -> 'Ballot':
+        """Відновлення з уже поданих голосів"""
+        ballot = cls(eligible, abstain)
+        for voter, choice in votes.items():
+            ballot.cast(voter, choice)
+        return ballot
+
+    def cast(self, voter: int, choice):
+        """Голос або переголосування"""
+        if voter in self.votes:
+            self._move(self.votes[voter], -1)
+        self.votes[voter] = choice
+        self._move(choice, 1)
+        self.pending.discard(voter)
+
+    def _move(self, choice, delta: int):
+        if choice == self.abstain:
+            return
+        count = self.counts.get(choice, 0)
+        if count:
+            group = self.by_count[count]
+            group.discard(choice)
+            if not group:
+                del self.by_count[count]
+        count += delta
+        if count:
+            self.counts[choice] = count
+            self.by_count.setdefault(count, set()).add(choice)
+        else:
+            self.counts.pop(choice, None)
+        if count > self.top:
+            self.top = count
+        elif self.top not in self.by_count:
+            # Лідер втратив голос - новий максимум на одиницю менший (або голосів немає)
+            self.top = count
+
+    def count(self, choice) -> int:
+        return self.counts.get(choice, 0)
+
+    @property
+    def complete(self) -> bool:
+        """Усі, хто мав голосувати, проголосували"""
+        return not self.pending
+
+    @property
+    def tie(self) -> bool:
+        """Кілька виборів мають однакову найбільшу кількість голосів"""
+        return self.top > 0 and len(self.by_count[self.top]) > 1
+
+    def leader(self):
+        """Єдиний вибір з найбільшою кількістю голосів (None - голосів немає або нічия)"""
+        if not self.top:
+            return None
+        group = self.by_count[self.top]
+        return next(iter(group)) if len(group) == 1 else None
+
+
+class GameState:
+    """Стан однієї гри з підтримуваними індексами.
+
+    Індекси (alive_players, alive_humans, team_alive, role_players,
+    all_players) оновлюються лише через методи join/leave/set_roles/kill,
+    тому перевірки на кшталт перемоги не потребують обходу гравців.
+    """
+
+    # Прості поля, що зберігаються у знімку як є
+    SCALAR_FIELDS = (
+        'chat_id', 'admin_id', 'token', 'phase', 'phase_deadline', 'day_number',
+        'vote_nominee', 'started', 'last_healed', 'mafia_chat_enabled',
+        'detective_bullet_used', 'detective_shot_used', 'detective_shot_this_night',
+        'detective_error_target', 'rope_break_save', 'mafia_misfire',
+        'night_resolved', 'nominations_done', 'final_voting_done',
+        'discussion_started', 'special_event', 'generation', 'progress_mode', 'timers',
+    )
+
+    __slots__ = SCALAR_FIELDS + (
+        'players', 'bots', 'all_players', 'roster_version',
+        'alive_players', 'alive_humans', 'team_alive', 'role_players',
+        'night_actions', 'votes', 'vote_results', 'perks_messages',
+        'special_items', 'potato_throws', 'night_pending', 'nominations', 'final_ballot',
+    )
+
+    def __init__(self, chat_id: int, admin_id: int, special_event: Optional[str] = None, token: int = 0):
+        self.chat_id = chat_id
+        self.admin_id = admin_id
+        self.token = token  # випадковий ідентифікатор гри в кнопках (callbacks)
+        self.players: Dict[int, Player] = {}
+        self.bots: Dict[int, Player] = {}
+        self.all_players: Dict[int, Player] = {}  # люди, потім боти
+        self.roster_version = 0  # росте з кожною зміною складу (ключ кешу лобі)
+        self.phase = 'registration'
+        self.phase_deadline: Optional[float] = None
+        self.generation = 0  # номер переходу фази: застарілі таймери і кнопки ігноруються
+        self.day_number = 0
+        self.alive_players = _NO_PLAYERS
+        self.alive_humans = _NO_PLAYERS
+        self.team_alive: Dict[str, int] = {}  # team: живих
+        self.role_players: Dict[str, List[int]] = {}  # role: [user_id]
+        self.night_actions: Dict[int, Dict] = {}
+        self.night_pending: Set[int] = set()  # живі люди, що ще не походили цієї ночі
+        self.nominations = Ballot(abstain=0)  # висунення (0 - пропустити день)
+        self.votes: Dict[int, int] = self.nominations.votes
+        self.vote_nominee: Optional[int] = None
+        self.final_ballot = Ballot()  # ЗА/ПРОТИ виключення
+        self.vote_results: Dict[int, str] = self.final_ballot.votes
+        self.started = False
+        self.last_healed: Optional[int] = None
+        self.mafia_chat_enabled = True
+        self.detective_bullet_used = False
+        self.detective_shot_used = False
+        self.detective_shot_this_night: Optional[int] = None
+        self.detective_error_target: Optional[int] = None
+        self.rope_break_save: Optional[int] = None
+        self.mafia_misfire = False
+        self.perks_messages: List[str] = []
+        self.night_resolved = False
+        self.nominations_done = False
+        self.final_voting_done = False
+        self.discussion_started = False
+        self.special_event = special_event
+        self.progress_mode = 'live'  # ходи фази: live - один підсумок, each - повідомлення на кожен
+        self.timers: Optional[Dict[str, int]] = None  # таймери фаз чату поверх config.TIMERS (/timers)
+        self.special_items: Dict[int, str] = {}  # user_id: item_type
+        self.potato_throws: Dict[int, int] = {}  # user_id: target_id
+
+    @property
+    def bot_count(self) -> int:
+        return len(self.bots)
+
+    @property
+    def player_count(self) -> int:
+        return len(self.all_players)
+
+    def join(self, player: Player):
+        """Додавання гравця до ростеру"""
+        (self.bots if player.is_bot else self.players)[player.id] = player
+        self._rebuild_roster()
+
+    def leave(self, user_id: int):
+        """Видалення гравця з ростеру"""
+        self.players.pop(user_id, None)
+        self.bots.pop(user_id, None)
+        self._rebuild_roster()
+
+    def _rebuild_roster(self):
+        # Ростер змінюється лише під час реєстрації, тож перебудова дешева
+        self.all_players = {**self.players, **self.bots}
+        self.roster_version += 1
+
+    def set_roles(self, assignments: Iterable[Tuple[int, str]]):
+        """Запис ролей та побудова індексів живих гравців"""
+        for player_id, role in assignments:
+            player = self.all_players.get(player_id)
+            if player:
+                player.role = role
+        self.rebuild_indexes()
+        self.started = True
+
+    def rebuild_indexes(self):
+        """Повна перебудова індексів (після ролей або відновлення)"""
+        self.alive_players = {uid for uid, p in self.all_players.items() if p.alive}
+        self.alive_humans = {uid for uid in self.alive_players if uid in self.players}
+        self.team_alive = {'mafia': 0, 'citizens': 0}
+        self.role_players = {}
+        for uid, player in self.all_players.items():
+            self.role_players.setdefault(player.role, []).append(uid)
+            if player.alive:
+                self.team_alive[player.team] = self.team_alive.get(player.team, 0) + 1
+
+    def kill(self, user_id: int):
+        """Смерть гравця з оновленням індексів"""
+        player = self.all_players.get(user_id)
+        if not player or not player.alive:
+            return
+        player.alive = False
+        self.alive_players.discard(user_id)
+        self.alive_humans.discard(user_id)
+        if player.team in self.team_alive:
+            self.team_alive[player.team] -= 1
+
+    def winner(self) -> Optional[str]:
+        """Команда-переможець або None, якщо гра триває (O(1))"""
+        mafia_alive = self.team_alive.get('mafia', 0)
+        if not mafia_alive:
+            return 'citizens'
+        if mafia_alive >= self.team_alive.get('citizens', 0):
+            return 'mafia'
+        return None
+
+    def to_state(self) -> dict:
+        """Серіалізація для знімка (JSON-сумісна)"""
+        state = {key: getattr(self, key) for key in self.SCALAR_FIELDS}
+        state['players'] = [p.to_state() for p in self.all_players.values()]
+        state['night_actions'] = [
+            [user_id, info['action'], info['target']] for user_id, info in self.night_actions.items()
+        ]
+        for key in ('votes', 'vote_results', 'special_items', 'potato_throws'):
+            state[key] = list(getattr(self, key).items())
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'GameState':
+        """Відновлення зі знімка"""
+        game = cls(state['chat_id'], state['admin_id'])
+        for key in cls.SCALAR_FIELDS:
+            if key in state:  # знімки старіших версій можуть не мати нових полів
+                setattr(game, key, state[key])
+        for player_state in state['players']:
+            player = Player.from_state(player_state)
+            (game.bots if player.is_bot else game.players)[player.id] = player
+        game._rebuild_roster()
+        if game.started:
+            game.rebuild_indexes()
+        game.night_actions = {
+            user_id: {'action': action, 'target': target}
+            for user_id, action, target in state['night_actions']
+        }
+        for key in ('special_items', 'potato_throws'):
+            setattr(game, key, dict(state[key]))
+        game.reset_night(game.alive_humans - game.night_actions.keys() if game.phase == 'night' else ())
+        game.reset_nominations(dict(state['votes']))
+        game.reset_final_ballot(dict(state['vote_results']))
+        return game
+
+    def reset_night(self, pending: Iterable[int]):
+        self.night_pending = set(pending)
+
+    def reset_nominations(self, votes: Optional[Dict[int, int]] = None):
+        """Нове висунення: голосують усі живі"""
+        self.nominations = Ballot.from_votes(self.alive_players, votes or {}, abstain=0)
+        self.votes = self.nominations.votes
+
+    def reset_final_ballot(self, votes: Optional[Dict[int, str]] = None):
+        """Нове голосування ЗА/ПРОТИ: голосують усі живі"""
+        self.final_ballot = Ballot.from_votes(self.alive_players, votes or {})
+        self.vote_results = self.final_ballot.votes
 
 
 class MafiaGame:
-    def __init__(self):
-        self.games: Dict[int, Dict] = {}
+    def __init__(self, store: Optional[MemoryStore] = None):
+        self.games: Dict[int, GameState] = {}
         self.game_messages: Dict[int, int] = {}
+        # (chat_id, user_id) мертвих людей в активних іграх - для пре-фільтра повідомлень
+        self.dead_players: Set[Tuple[int, int]] = set()
+        # user_id: (chat_id, гравець) - гра людини для кнопок в особистих; одна активна гра на людину
+        self.user_games: Dict[int, Tuple[int, Player]] = {}
+        # chat_id: час останньої зміни гри; порядок - від найдавніше зміненої
+        self.activity: 'OrderedDict[int, float]' = OrderedDict()
+        # Ігри в реєстрації, той самий порядок (для ліміту відкритих лобі)
+        self.lobbies: 'OrderedDict[int, None]' = OrderedDict()
+        self.clock: Callable[[], float] = game_clock.now
+        self.store = store or MemoryStore()
+        self.events = None  # лог подій (eventlog.EventLog), якщо увімкнений
         
-    def create_game(self, chat_id: int, admin_id: int) -> Dict:
+    def attach_store(self, store: MemoryStore):
+        """Підключення сховища (до відновлення ігор)"""
+        self.store = store
+
+    def attach_event_log(self, events):
+        """Підключення логу подій (до відновлення ігор)"""
+        self.events = events
+        
+    # ============================================
+    # ЖУРНАЛ ЗМІН
+    # ============================================
+
+    def _apply(self, chat_id: int, op: str, args: list):
+        """Застосування зміни стану з записом у журнал"""
+        if op == 'create':
+            # Нова гра в тому ж чаті - старий журнал більше не потрібен
+            self.store.delete(chat_id)
+        self._mutate(chat_id, op, args)
+        if self.events is not None:
+            self.events.append(chat_id, op, args)
+        if op == 'end':
+            self.store.delete(chat_id)
+            return
+        if self.store.append(chat_id, op, args) and chat_id in self.games:
+            self.store.snapshot(chat_id, self.dump_game(chat_id))
+
+    def _mutate(self, chat_id: int, op: str, args: list):
+        """Застосування одного запису журналу до стану (без побічних ефектів)"""
+        if op == 'create':
+            admin_id, special_event = args[:2]
+            token = args[2] if len(args) > 2 else 0  # журнали до появи токена
+            self._forget_players(chat_id)
+            self.games[chat_id] = GameState(chat_id, admin_id, special_event, token)
+            self.game_messages.pop(chat_id, None)
+            self.lobbies[chat_id] = None
+            self._touch(chat_id)
+            return
+        if op == 'end':
+            self._forget_players(chat_id)
+            self.games.pop(chat_id, None)
+            self.game_messages.pop(chat_id, None)
+            self.activity.pop(chat_id, None)
+            self.lobbies.pop(chat_id, None)
+            return
+
+        game = self.games[chat_id]
+        if op == 'join':
+            user_id, username, is_bot = args
+            player = Player(user_id, username, is_bot)
+            game.join(player)
+            if not is_bot:
+                self.user_games[user_id] = (chat_id, player)
+        elif op == 'leave':
+            user_id, = args
+            game.leave(user_id)
+            if self.game_of(user_id) == chat_id:
+                del self.user_games[user_id]
+        elif op == 'roles':
+            assignments, items = args
+            game.set_roles(assignments)
+            game.special_items = {player_id: item for player_id, item in items}
+            self.lobbies.pop(chat_id, None)
+        elif op == 'lobby':
+            self.game_messages[chat_id] = args[0]
+        elif op == 'phase':
+            phase, day_number, deadline = args
+            game.phase = phase
+            game.phase_deadline = deadline
+            game.generation += 1
+            if day_number is not None:
+                game.day_number = day_number
+            # Скидання стану, який належить новій фазі
+            if phase == 'night':
+                game.night_actions = {}
+                game.reset_night(game.alive_humans)
+                game.perks_messages = []
+                game.night_resolved = False
+            elif phase == 'voting':
+                game.reset_nominations()
+                game.nominations_done = False
+            elif phase == 'final_voting':
+                game.reset_final_ballot()
+                game.final_voting_done = False
+        elif op == 'night':
+            user_id, action, target = args
+            game.night_actions[user_id] = {'action': action, 'target': target}
+            game.night_pending.discard(user_id)
+        elif op == 'vote':
+            user_id, target = args
+            game.nominations.cast(user_id, target)
+        elif op == 'fvote':
+            user_id, vote = args
+            game.final_ballot.cast(user_id, vote)
+        elif op == 'potato':
+            thrower_id, target_id = args
+            game.special_items.pop(thrower_id, None)
+            game.potato_throws[thrower_id] = target_id
+        elif op == 'kill':
+            for user_id in args:
+                game.kill(user_id)
+                if user_id in game.players:
+                    self.dead_players.add((chat_id, user_id))
+        elif op == 'set':
+            key, value = args
+            if key not in GameState.SCALAR_FIELDS:
+                raise ValueError(f"Невідоме поле гри: {key}")
+            setattr(game, key, value)
+        else:
+            raise ValueError(f"Невідома операція журналу: {op}")
+        self._touch(chat_id)
+
+    def _touch(self, chat_id: int):
+        """Гра змінилась - переносимо її в кінець черги простою (O(1))"""
+        self.activity[chat_id] = self.clock()
+        self.activity.move_to_end(chat_id)
+        if chat_id in self.lobbies:
+            self.lobbies.move_to_end(chat_id)
+
+    def _forget_players(self, chat_id: int):
+        """Прибирає людей чату з пре-фільтра мертвих і з індексу user_id -> гра"""
+        game = self.games.get(chat_id)
+        if game:
+            for user_id in game.players:
+                self.dead_players.discard((chat_id, user_id))
+                if self.game_of(user_id) == chat_id:
+                    del self.user_games[user_id]
+
+    def is_dead_player(self, chat_id: int, user_id: int) -> bool:
+        """O(1) перевірка: чи це мертвий гравець активної гри"""
+        return (chat_id, user_id) in self.dead_players
+
+    def game_of(self, user_id: int) -> Optional[int]:
+        """chat_id активної гри людини (O(1))"""
+        entry = self.user_games.get(user_id)
+        return entry[0] if entry else None
+
+    def player_in(self, chat_id: int, user_id: int) -> Optional[Player]:
+        """Гравець, якщо людина бере участь саме в цій грі (роль і стан - в Player)"""
+        entry = self.user_games.get(user_id)
+        return entry[1] if entry and entry[0] == chat_id else None
+
+    def dump_game(self, chat_id: int) -> dict:
+        """Серіалізація гри для знімка (JSON-сумісна)"""
+        state = self.games[chat_id].to_state()
+        state['game_message'] = self.game_messages.get(chat_id)
+        return state
+
+    def load_game(self, chat_id: int, state: dict):
+        """Відновлення гри зі знімка"""
+        message_id = state.get('game_message')
+        if message_id is not None:
+            self.game_messages[chat_id] = message_id
+        self._forget_players(chat_id)
+        game = self.games[chat_id] = GameState.from_state(state)
+        for user_id, player in game.players.items():
+            self.user_games[user_id] = (chat_id, player)
+            if game.started and not player.alive:
+                self.dead_players.add((chat_id, user_id))
+        if not game.started:
+            self.lobbies[chat_id] = None
+        # Простій рахується від відновлення, а не від часу до рестарту
+        self._touch(chat_id)
+
+    def restore(self) -> int:
+        """Відновлення ігор зі сховища: знімок + хвіст журналу"""
+        restored = 0
+        for chat_id, state, records in self.store.load():
+            if state is not None:
+                self.load_game(chat_id, state)
+            for op, args in records:
+                try:
+                    self._mutate(chat_id, op, args)
+                except (KeyError, ValueError) as e:
+                    logger.error(f"Помилка відновлення гри {chat_id} ({op}): {e}")
+                    break
+            if chat_id in self.games:
+                restored += 1
+                if self.events is not None:
+                    self.events.resume(chat_id, self.games[chat_id].token, self.dump_game(chat_id))
+        return restored
+
+    def replay(self, chat_id: int, records: Iterable[Record]) -> Optional[str]:
+        """Програвання подій гри з логу (без журналу); повертає переможця, якщо гра завершилась"""
+        mutate = self._mutate
+        for op, args in records:
+            if op == 'restore':
+                self.load_game(chat_id, args[0])
+            elif op == 'end':
+                # Стан завершеної гри лишається для перегляду
+                return args[0] if args else None
+            else:
+                mutate(chat_id, op, args)
+        return None
+
+    # ============================================
+    # ОПЕРАЦІЇ НАД ГРОЮ
+    # ============================================
+
+    def create_game(self, chat_id: int, admin_id: int) -> GameState:
         """Створення нової гри"""
         # Вибираємо спеціальну подію (30% шанс)
         special_event = None
         if random.random() < 0.30:
             special_event = random.choice(list(SPECIAL_EVENTS.keys()))
-        
-        self.games[chat_id] = {
-            'admin_id': admin_id,
-            'players': {},
-            'bots': {},
-            'bot_count': 0,
-            'phase': 'registration',
-            'day_number': 0,
-            'alive_players': set(),
-            'night_actions': {},
-            'votes': {},
-            'vote_nominee': None,
-            'vote_results': {},
-            'history': [],
-            'started': False,
-            'last_healed': None,
-            'mafia_chat_enabled': True,
-            'detective_bullet_used': False,
-            'detective_shot_this_night': None,
-            'detective_error_target': None,
-            'rope_break_save': None,
-            'mafia_misfire': False,
-            'perks_messages': [],
-            'night_resolved': False,
-            'nominations_done': False,
-            'final_voting_done': False,
-            'discussion_started': False,
-            'special_event': special_event,
-            'special_items': {},  # user_id: item_type
-            'potato_throws': {}  # user_id: target_id
-        }
+
+        self._apply(chat_id, 'create', [admin_id, special_event, random.getrandbits(32)])
         return self.games[chat_id]
+
+    def end_game(self, chat_id: int, winner: Optional[str] = None):
+        """Завершення гри та видалення її стану (winner - для логу подій)"""
+        if chat_id in self.games:
+            self._apply(chat_id, 'end', [winner])
+
+    def set_special_event(self, chat_id: int, special_event: Optional[str]):
+        """Встановлення спеціальної події гри"""
+        self.update_game(chat_id, special_event=special_event)
+
+    def set_game_message(self, chat_id: int, message_id: int):
+        """Запам'ятовує повідомлення з реєстрацією"""
+        self._apply(chat_id, 'lobby', [message_id])
+
+    def set_phase(self, chat_id: int, phase: str, timeout: Optional[float] = None,
+                  day_number: Optional[int] = None):
+        """Перехід у нову фазу (з дедлайном таймера для відновлення)"""
+        deadline = game_clock.wall() + timeout if timeout is not None else None
+        self._apply(chat_id, 'phase', [phase, day_number, deadline])
+
+    def update_game(self, chat_id: int, **fields):
+        """Зміна окремих полів гри (прапорці, кандидат тощо)"""
+        for key, value in fields.items():
+            self._apply(chat_id, 'set', [key, value])
+
+    def record_night_action(self, chat_id: int, user_id: int, action: str, target: int):
+        """Фіксує нічну дію гравця"""
+        self._apply(chat_id, 'night', [user_id, action, target])
+
+    def record_vote(self, chat_id: int, user_id: int, target: int):
+        """Фіксує висунення кандидата"""
+        self._apply(chat_id, 'vote', [user_id, target])
+
+    def record_final_vote(self, chat_id: int, user_id: int, vote: str):
+        """Фіксує голос ЗА/ПРОТИ"""
+        self._apply(chat_id, 'fvote', [user_id, vote])
+
+    def kill_players(self, chat_id: int, user_ids: Iterable[int]):
+        """Позначає гравців мертвими"""
+        user_ids = list(user_ids)
+        if user_ids:
+            self._apply(chat_id, 'kill', user_ids)
     
     def add_player(self, chat_id: int, user_id: int, username: str, is_bot: bool = False) -> bool:
         """Додавання гравця до гри"""
@@ -56,34 +571,21 @@ class MafiaGame:
             return False
         
         game = self.games[chat_id]
-        if game['phase'] != 'registration':
+        if game.phase != 'registration':
             return False
         
-        total_players = len(game['players']) + len(game['bots'])
-        if total_players >= 15:
+        if game.player_count >= MAX_PLAYERS:
             return False
         
-        if is_bot:
-            if user_id not in game['bots']:
-                game['bots'][user_id] = {
-                    'id': user_id,
-                    'username': username,
-                    'role': None,
-                    'alive': True,
-                    'is_bot': True
-                }
-                return True
-        else:
-            if user_id not in game['players']:
-                game['players'][user_id] = {
-                    'id': user_id,
-                    'username': username,
-                    'role': None,
-                    'alive': True,
-                    'is_bot': False
-                }
-                return True
-        return False
+        if user_id in (game.bots if is_bot else game.players):
+            return False
+
+        # Людина може бути лише в одній активній грі
+        if not is_bot and self.game_of(user_id) is not None:
+            return False
+
+        self._apply(chat_id, 'join', [user_id, username, is_bot])
+        return True
     
     def add_bots(self, chat_id: int, count: int) -> int:
         """Додає ботів до гри"""
@@ -91,26 +593,25 @@ class MafiaGame:
             return 0
         
         game = self.games[chat_id]
-        if game['phase'] != 'registration':
+        if game.phase != 'registration':
             return 0
         
-        total_players = len(game['players']) + len(game['bots'])
-        available_slots = 15 - total_players
+        available_slots = MAX_PLAYERS - game.player_count
         count = min(count, available_slots, len(BOT_NAMES))
         
-        available_names = [name for name in BOT_NAMES if name not in [b['username'] for b in game['bots'].values()]]
+        taken_names = {b.username for b in game.bots.values()}
+        available_names = [name for name in BOT_NAMES if name not in taken_names]
         random.shuffle(available_names)
         
         added = 0
         for i in range(count):
             if i >= len(available_names):
                 break
-            bot_id = -(i + 1 + len(game['bots']))  # Негативні ID для ботів
+            bot_id = -(i + 1 + len(game.bots))  # Негативні ID для ботів
             bot_name = available_names[i]
             if self.add_player(chat_id, bot_id, bot_name, is_bot=True):
                 added += 1
         
-        game['bot_count'] = len(game['bots'])
         return added
     
     def remove_player(self, chat_id: int, user_id: int) -> bool:
@@ -119,28 +620,19 @@ class MafiaGame:
             return False
         
         game = self.games[chat_id]
-        if game['phase'] != 'registration':
+        if game.phase != 'registration':
             return False
         
-        if user_id in game['players']:
-            del game['players'][user_id]
-            return True
-        elif user_id in game['bots']:
-            del game['bots'][user_id]
-            game['bot_count'] = len(game['bots'])
+        if user_id in game.all_players:
+            self._apply(chat_id, 'leave', [user_id])
             return True
         return False
     
-    def get_all_players(self, chat_id: int) -> dict:
-        """Отримати всіх гравців (людей + ботів)"""
+    def get_all_players(self, chat_id: int) -> Dict[int, Player]:
+        """Отримати всіх гравців (людей + ботів), без копіювання"""
         if chat_id not in self.games:
             return {}
-        
-        game = self.games[chat_id]
-        all_players = {}
-        all_players.update(game['players'])
-        all_players.update(game['bots'])
-        return all_players
+        return self.games[chat_id].all_players
     
     def assign_roles(self, chat_id: int) -> bool:
         """Розподіл ролей серед гравців"""
@@ -148,8 +640,7 @@ class MafiaGame:
             return False
         
         game = self.games[chat_id]
-        all_players = self.get_all_players(chat_id)
-        players = list(all_players.keys())
+        players = list(game.all_players)
         player_count = len(players)
 
         if player_count < 5:
@@ -167,8 +658,8 @@ class MafiaGame:
         
         roles_pool = roles_to_assign.copy()
 
-        human_ids = list(game['players'].keys())
-        bot_ids = list(game['bots'].keys())
+        human_ids = list(game.players.keys())
+        bot_ids = list(game.bots.keys())
         random.shuffle(human_ids)
         random.shuffle(bot_ids)
 
@@ -190,61 +681,49 @@ class MafiaGame:
             player_id = remaining_players.pop()
             assignments[player_id] = role
 
-        # Фінально зберігаємо ролі
-        for player_id, role in assignments.items():
-            if player_id in game['players']:
-                game['players'][player_id]['role'] = role
-            elif player_id in game['bots']:
-                game['bots'][player_id]['role'] = role
-
-        game['alive_players'] = set(players)
-        game['started'] = True
-        
         # Роздаємо спеціальні предмети якщо є подія
-        if game['special_event']:
-            event = SPECIAL_EVENTS[game['special_event']]
+        items = []
+        if game.special_event:
+            event = SPECIAL_EVENTS[game.special_event]
             for player_id in players:
                 if random.random() < event['item_chance']:
-                    game['special_items'][player_id] = event['special_item']
+                    items.append([player_id, event['special_item']])
 
+        # Фінально зберігаємо ролі
+        self._apply(chat_id, 'roles', [list(assignments.items()), items])
         return True
     
     def get_role_info(self, role_key: str) -> Dict:
         """Отримання інформації про роль"""
         return ROLES.get(role_key, ROLES['demyan'])
     
-    def get_player_info(self, chat_id: int, user_id: int) -> Optional[Dict]:
+    def get_player_info(self, chat_id: int, user_id: int) -> Optional[Player]:
         """Отримати інформацію про гравця"""
         if chat_id not in self.games:
             return None
-        
-        game = self.games[chat_id]
-        if user_id in game['players']:
-            return game['players'][user_id]
-        elif user_id in game['bots']:
-            return game['bots'][user_id]
-        return None
+        return self.games[chat_id].all_players.get(user_id)
     
     def is_bot(self, chat_id: int, user_id: int) -> bool:
         """Перевірка чи є гравець ботом"""
         if chat_id not in self.games:
             return False
-        return user_id in self.games[chat_id]['bots']
+        return user_id in self.games[chat_id].bots
     
     def get_mafia_members(self, chat_id: int) -> list:
-        """Отримання списку живих мафіозі"""
+        """Отримання списку живих мафіозі (O(k) за індексом ролей)"""
         if chat_id not in self.games:
             return []
         
         game = self.games[chat_id]
-        all_players = self.get_all_players(chat_id)
         mafia_members = []
         
-        for user_id, player_info in all_players.items():
-            if player_info['alive']:
-                role_info = self.get_role_info(player_info['role'])
-                if role_info['team'] == 'mafia':
-                    mafia_members.append((user_id, player_info))
+        for role_key, user_ids in game.role_players.items():
+            if self.get_role_info(role_key)['team'] != 'mafia':
+                continue
+            for user_id in user_ids:
+                player = game.all_players[user_id]
+                if player.alive:
+                    mafia_members.append((user_id, player))
         
         return mafia_members
     
@@ -254,22 +733,16 @@ class MafiaGame:
             return []
         
         game = self.games[chat_id]
-        all_players = self.get_all_players(chat_id)
-        citizens = []
-        
-        for user_id, player_info in all_players.items():
-            if player_info['alive']:
-                role_info = self.get_role_info(player_info['role'])
-                if role_info['team'] == 'citizens':
-                    citizens.append((user_id, player_info))
-        
-        return citizens
+        return [
+            (user_id, game.all_players[user_id]) for user_id in game.alive_players
+            if game.all_players[user_id].team == 'citizens'
+        ]
 
     def get_player_item(self, chat_id: int, user_id: int) -> Optional[str]:
         """Повертає спеціальний предмет гравця (якщо є)"""
         if chat_id not in self.games:
             return None
-        return self.games[chat_id]['special_items'].get(user_id)
+        return self.games[chat_id].special_items.get(user_id)
 
     def use_potato(self, chat_id: int, thrower_id: int, target_id: int) -> bool:
         """Фіксує кидок картоплі (одноразовий предмет)"""
@@ -277,18 +750,18 @@ class MafiaGame:
             return False
 
         game = self.games[chat_id]
-        if game['special_items'].get(thrower_id) != 'potato':
+        if game.special_items.get(thrower_id) != 'potato':
             return False
 
-        if thrower_id not in game['alive_players']:
+        if thrower_id not in game.alive_players:
             return False
 
-        if target_id == thrower_id or target_id not in game['alive_players']:
+        if target_id == thrower_id or target_id not in game.alive_players:
             return False
 
         # Забираємо предмет та зберігаємо вибір
-        del game['special_items'][thrower_id]
-        game['potato_throws'][thrower_id] = target_id
+        self._apply(chat_id, 'potato', [thrower_id, target_id])
         return True
 
-mafia_game = MafiaGame()
\ No newline at end of file
+
+mafia_game = MafiaGame()
@@ -2,8 +2,8 @@
 
 Повний функціонал:
 - Реєстрація гравців та ботів
-- Нічна фаза з таймером (45 сек)
-- Денна фаза з обговоренням (60 сек)
+- Нічна фаза з таймером (тривалість фаз - /timers)
+- Денна фаза з обговоренням (закінчується раніше, коли в чаті тихо)
 - Голосування за виключення
 - Логіка ботів (мафія/лікар/мирні)
 - Спеціальні події (Буковель + картопля)
@@ -12,10 +12,12 @@
 """
 
 import os
+import functools
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
+    CallbackContext,
     CommandHandler,
     CallbackQueryHandler,
     ContextTypes,
@@ -23,17 +25,36 @@ from telegram.ext import (
     filters,
 )
 from telegram.constants import ParseMode
-from collections import defaultdict
+from telegram.error import BadRequest
+from contextlib import asynccontextmanager
 import asyncio
 import random
-from typing import Optional, List, Tuple
+from collections import Counter
+from typing import Callable, Coroutine, Dict, NamedTuple, Optional, List, Set, Tuple
 
+from callbacks import (
+    ADD_BOTS, ADD_BOTS_MENU, BACK_TO_GAME, JOIN, LEAVE, NIGHT_CHECK, NIGHT_HEAL, NIGHT_KILL,
+    NO, NOMINATE, POTATO, SHOOT_MENU, START, VOTE_FOR, YES, Callback, decode,
+)
+from clock import game_clock
 from config import (
     ROLES, DEATH_PHRASES, SAVED_PHRASES, MAFIA_PHRASES, 
     DISCUSSION_PHRASES, MORNING_PHRASES, NIGHT_PHRASES,
-    POTATO_PHRASES, SPECIAL_EVENTS, GIF_PATHS
+    POTATO_PHRASES, SPECIAL_EVENTS, GIF_PATHS, PROGRESS_EDIT_WINDOW, PROGRESS_MODES,
+    MAX_PLAYERS, TIMERS, TIMER_LIMITS, DISCUSSION_QUIET,
+)
+from edits import CoalescedEdits, lobby_edits
+from engine import Event, Events, game_engine
+from game_state import Player, mafia_game
+from lifecycle import IDLE, LOBBY_CAP, game_sweeper
+from media_cache import media_cache
+from metrics import Collected, instrumented, phase_clock
+from outbound import FLAVOR, LANES, outbound
+from rendering import (
+    DEFAULT_NIGHT_PROMPT, NIGHT_BUTTONS, NIGHT_PROMPTS, TargetKeyboard, cached_lobby, game_button,
+    lobby_renders, role_card,
 )
-from game_state import mafia_game
+from timers import PhaseTimer, phase_timers
 
 # Налаштування логування
 logging.basicConfig(
@@ -48,19 +69,61 @@ logger = logging.getLogger(__name__)
 # ДОПОМІЖНІ ФУНКЦІЇ
 # ============================================
 
+# Один lock на тип GIF, щоб паралельні чати не завантажували той самий файл
+_gif_upload_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def _send_cached_animation(context: ContextTypes.DEFAULT_TYPE, chat_id: int, gif_type: str,
+                                 gif_path: str, caption: str = None):
+    """Відправка GIF через file_id з кешу (завантаження файлу лише раз)"""
+    file_id = media_cache.get(gif_type, gif_path)
+    if file_id:
+        try:
+            await context.bot.send_animation(
+                chat_id=chat_id,
+                animation=file_id,
+                caption=caption,
+                parse_mode=ParseMode.HTML
+            )
+            return
+        except BadRequest as e:
+            # Telegram не прийняв старий file_id - завантажуємо заново
+            logger.warning(f"Застарілий file_id для {gif_type}: {e}")
+            media_cache.invalidate(gif_type)
+
+    lock = _gif_upload_locks.setdefault(gif_type, asyncio.Lock())
+    async with lock:
+        # Поки чекали, інший чат міг вже завантажити файл
+        file_id = media_cache.get(gif_type, gif_path)
+        if file_id:
+            await context.bot.send_animation(
+                chat_id=chat_id,
+                animation=file_id,
+                caption=caption,
+                parse_mode=ParseMode.HTML
+            )
+            return
+
+        with open(gif_path, 'rb') as gif:
+            message = await context.bot.send_animation(
+                chat_id=chat_id,
+                animation=gif,
+                caption=caption,
+                parse_mode=ParseMode.HTML
+            )
+
+        media = message.animation or message.document
+        if media:
+            media_cache.put(gif_type, gif_path, media.file_id)
+
+
 async def send_gif(context: ContextTypes.DEFAULT_TYPE, chat_id: int, gif_type: str, caption: str = None):
     """Відправка GIF файлу"""
     try:
         gif_path = GIF_PATHS.get(gif_type)
         if gif_path and os.path.exists(gif_path):
-            with open(gif_path, 'rb') as gif:
-                await context.bot.send_animation(
-                    chat_id=chat_id,
-                    animation=gif,
-                    caption=caption,
-                    parse_mode=ParseMode.HTML
-                )
-                return
+            await _send_cached_animation(context, chat_id, gif_type, gif_path, caption)
+            return
         # Якщо GIF не знайдено, просто текст
         if caption:
             await context.bot.send_message(
@@ -78,6 +141,165 @@ async def send_gif(context: ContextTypes.DEFAULT_TYPE, chat_id: int, gif_type: s
             )
 
 
+async def fan_out(sends: List[Coroutine]):
+    """Паралельна розсилка гравцям (ліміти і порядок в чаті тримає outbound)"""
+    for result in await asyncio.gather(*sends, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.error(f"Помилка розсилки: {result}")
+
+
+# Декоративні рядки в чаті гри: у outbound пропускають уперед фази і кнопки дій
+FLAVOR_MESSAGE = {'priority': FLAVOR}
+# Перше повідомлення живого підсумку: далі воно редагується, тож outbound не зливає з ним інші рядки
+PROGRESS_MESSAGE = {'priority': FLAVOR, 'merge': False}
+
+
+# ============================================
+# СЕРІАЛІЗАЦІЯ ПОДІЙ ГРИ
+# ============================================
+
+class _GameLock:
+    """Lock однієї гри і кількість тих, хто його чекає або тримає"""
+    
+    __slots__ = ('lock', 'users')
+    
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+# chat_id: lock; запис живе, лише поки хтось працює з грою
+_game_locks: Dict[int, _GameLock] = {}
+
+
+@asynccontextmanager
+async def game_lock(chat_id: int):
+    """Гра як актор з одним споживачем: події одного чату виконуються по черзі"""
+    entry = _game_locks.get(chat_id)
+    if entry is None:
+        entry = _game_locks[chat_id] = _GameLock()
+    entry.users += 1
+    try:
+        async with entry.lock:
+            yield
+    finally:
+        entry.users -= 1
+        if entry.users == 0:
+            del _game_locks[chat_id]
+
+
+def group_chat(update: Update) -> Optional[int]:
+    """Гра визначається чатом, з якого прийшло оновлення"""
+    return update.effective_chat.id if update.effective_chat else None
+
+
+def serialized(chat_of: Callable[[Update], Optional[int]]):
+    """Декоратор хендлера: виконання під lock гри"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            chat_id = chat_of(update)
+            if chat_id is None:
+                return await handler(update, context)
+            async with game_lock(chat_id):
+                return await handler(update, context)
+        return wrapper
+    return decorator
+
+
+# chat_id: відкладені дії фаз гри (оголошення ботів)
+_delayed: Dict[int, Set[asyncio.Task]] = {}
+
+
+def phase_delay(context: ContextTypes.DEFAULT_TYPE, callback, delay: float, chat_id: int, **data):
+    """Дія через delay секунд годинника гри під lock гри; після зміни фази - no-op"""
+    generation = mafia_game.games[chat_id].generation
+    
+    async def run():
+        await game_clock.sleep(delay)
+        async with game_lock(chat_id):
+            game = mafia_game.games.get(chat_id)
+            if game is None or game.generation != generation:
+                return
+            try:
+                await callback(context, chat_id, **data)
+            except Exception:
+                logger.exception(f"Помилка відкладеної дії для чату {chat_id}")
+    
+    # Задача циклу, а не Application.create_task: дію можна запланувати і до
+    # старту Application (відновлення, бенчмарки), а зупиняє її stop_game_timers
+    task = asyncio.get_running_loop().create_task(run())
+    _delayed.setdefault(chat_id, set()).add(task)
+    task.add_done_callback(functools.partial(_delayed_done, chat_id))
+
+
+def _delayed_done(chat_id: int, task: asyncio.Task):
+    tasks = _delayed.get(chat_id)
+    if tasks is not None:
+        tasks.discard(task)
+        if not tasks:
+            del _delayed[chat_id]
+
+
+def cancel_delayed(chat_id: int):
+    """Скасування відкладених дій гри"""
+    current = asyncio.current_task()
+    for task in _delayed.pop(chat_id, ()):
+        if task is not current:
+            task.cancel()
+
+
+def arm_phase_timer(chat_id: int, callback, delay: float):
+    """Таймер фази гри (попередній таймер цієї гри скасовується)"""
+    phase_timers.arm(chat_id, callback, delay, mafia_game.games[chat_id].generation)
+
+
+def close_game(chat_id: int):
+    """Завершення гри разом з її таймером, відкладеними діями і редагуваннями"""
+    phase_timers.cancel(chat_id)
+    cancel_delayed(chat_id)
+    _chat_activity.pop(chat_id, None)
+    phase_clock.finish(chat_id)
+    lobby_edits.forget(chat_id)
+    lobby_renders.forget(chat_id)
+    drop_progress(chat_id)
+    mafia_game.end_game(chat_id)
+
+
+class DeadPlayerFilter(filters.MessageFilter):
+    """O(1) пре-фільтр: пропускає лише повідомлення мертвих гравців активних ігор"""
+    
+    def filter(self, message) -> bool:
+        user = message.from_user
+        return user is not None and mafia_game.is_dead_player(message.chat_id, user.id)
+
+
+DEAD_PLAYER = DeadPlayerFilter(name='DeadPlayer')
+
+# chat_id: коли в чаті востаннє писали під час обговорення (game_clock.wall())
+_chat_activity: Dict[int, float] = {}
+
+
+class DiscussionFilter(filters.MessageFilter):
+    """O(1) пре-фільтр: пропускає лише повідомлення чатів, де зараз обговорення"""
+    
+    def filter(self, message) -> bool:
+        return message.chat_id in _chat_activity
+
+
+DISCUSSION = DiscussionFilter(name='Discussion')
+
+
+async def note_chat_activity(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Повідомлення в обговоренні відсуває його кінець на DISCUSSION_QUIET секунд"""
+    message = update.message
+    if not message or message.from_user is None:
+        return
+    # Повідомлення мертвих видаляються - обговорення вони не продовжують
+    if message.chat_id in _chat_activity and not mafia_game.is_dead_player(message.chat_id, message.from_user.id):
+        _chat_activity[message.chat_id] = game_clock.wall()
+
+
 async def check_dead_player_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Блокує повідомлення від мертвих гравців"""
     if not update.message or not update.message.text:
@@ -86,163 +308,162 @@ async def check_dead_player_message(update: Update, context: ContextTypes.DEFAUL
     chat_id = update.message.chat_id
     user_id = update.message.from_user.id
     
-    if chat_id in mafia_game.games:
-        game = mafia_game.games[chat_id]
-        if game['started'] and user_id in game['players'] and not game['players'][user_id]['alive']:
-            try:
-                await update.message.delete()
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text="💀 <b>ТИ МЕРТВИЙ!</b>\n\nНе можеш писати в чат до кінця гри.\n🤐 Дотримуйся правил, мертвяк!",
-                    parse_mode=ParseMode.HTML
-                )
-            except Exception as e:
-                logger.error(f"Помилка видалення повідомлення мертвого: {e}")
+    if mafia_game.is_dead_player(chat_id, user_id):
+        try:
+            await update.message.delete()
+            await context.bot.send_message(
+                chat_id=user_id,
+                text="💀 <b>ТИ МЕРТВИЙ!</b>\n\nНе можеш писати в чат до кінця гри.\n🤐 Дотримуйся правил, мертвяк!",
+                parse_mode=ParseMode.HTML
+            )
+        except Exception as e:
+            logger.error(f"Помилка видалення повідомлення мертвого: {e}")
 
 
 # ============================================
-# ЛОГІКА БОТІВ
+# ОГОЛОШЕННЯ ХОДІВ
 # ============================================
 
-def bot_mafia_choice(game: dict, bot_id: int) -> Optional[int]:
-    """Вибір жертви для мафії"""
-    all_players = mafia_game.get_all_players(game['chat_id'])
-    
-    # Мафія не вбиває своїх
-    bot_role = game['bots'][bot_id]['role']
-    mafia_team = {'kishkel', 'rohalskyi'}
+# Фаза: текст оголошення бота і паузи між оголошеннями (сек)
+BOT_ANNOUNCEMENTS = {
+    'night': ("🤖 <b>{name}</b> зробив свій вибір...", 1, 3),
+    'voting': ("🤖 <b>{name}</b> висунув кандидата!", 1, 2),
+    'final_voting': ("🤖 <b>{name}</b> проголосував!", 0.5, 1.5),
+}
+
+# Фаза: заголовок живого підсумку ходів
+PROGRESS_TITLES = {
+    'night': "🌙 <b>Зробили вибір</b>",
+    'voting': "🗳 <b>Висунули кандидата</b>",
+    'final_voting': "🗳 <b>Проголосували</b>",
+}
+
+progress_edits = CoalescedEdits(window=PROGRESS_EDIT_WINDOW)
+
+
+class PhaseProgress:
+    """Живий підсумок ходів однієї фази: одне повідомлення в групі, що редагується"""
     
-    targets = []
-    for pid, pinfo in all_players.items():
-        if pinfo['alive'] and pinfo['role'] not in mafia_team:
-            targets.append(pid)
+    __slots__ = ('key', 'phase', 'total', 'names', 'message_id')
     
-    if not targets:
-        return None
+    def __init__(self, chat_id: int, generation: int, phase: str, total: int):
+        self.key = (chat_id, generation)
+        self.phase = phase
+        self.total = total
+        self.names: List[str] = []
+        self.message_id: Optional[int] = None
     
-    # Проста стратегія: випадковий вибір
-    return random.choice(targets)
+    def render(self) -> Tuple[str, None]:
+        return f"{PROGRESS_TITLES[self.phase]} {len(self.names)}/{self.total}:\n{', '.join(self.names)}", None
 
 
-def bot_doctor_choice(game: dict, bot_id: int) -> Optional[int]:
-    """Вибір цілі для лікаря"""
-    all_players = mafia_game.get_all_players(game['chat_id'])
-    
-    targets = []
-    for pid, pinfo in all_players.items():
-        if pinfo['alive'] and pid != bot_id:  # Не лікуємо себе
-            targets.append(pid)
-    
-    if not targets:
+# chat_id: підсумок поточної фази
+_progress: Dict[int, PhaseProgress] = {}
+
+
+def expected_moves(game) -> int:
+    """Скільки гравців має походити в поточній фазі"""
+    if game.phase == 'night':
+        # Люди з нічною дією (як у GameEngine._night_done) + боти, що вже записали дію
+        # (детектив-бот не ходить, мирні без дії не отримують кнопок)
+        humans = sum(1 for uid in game.alive_humans
+                     if mafia_game.get_role_info(game.all_players[uid].role).get('action'))
+        return humans + sum(1 for uid in game.night_actions if uid in game.bots)
+    return len(game.alive_players)
+
+
+def phase_progress(chat_id: int) -> Optional[PhaseProgress]:
+    """Підсумок поточної фази гри (новий, якщо фаза змінилась)"""
+    game = mafia_game.games.get(chat_id)
+    if game is None or game.phase not in PROGRESS_TITLES:
         return None
-    
-    # Випадковий вибір
-    return random.choice(targets)
+    progress = _progress.get(chat_id)
+    if progress is None or progress.key[1] != game.generation:
+        if progress is not None:
+            progress_edits.close(progress.key)
+        progress = _progress[chat_id] = PhaseProgress(chat_id, game.generation, game.phase, expected_moves(game))
+    return progress
 
 
-def bot_voting_choice(game: dict, bot_id: int) -> int:
-    """Вибір кандидата для голосування"""
-    all_players = mafia_game.get_all_players(game['chat_id'])
-    
-    # Боти можуть проголосувати за когось або пропустити
-    if random.random() < 0.8:  # 80% шанс проголосувати
-        targets = [pid for pid, pinfo in all_players.items() 
-                  if pinfo['alive'] and pid != bot_id]
-        if targets:
-            return random.choice(targets)
-    
-    return 0  # Пропустити день
+def move_progress(chat_id: int) -> Optional[PhaseProgress]:
+    """Підсумок, куди йде хід гравця; None - режим each (окреме повідомлення)"""
+    game = mafia_game.games.get(chat_id)
+    return phase_progress(chat_id) if game and game.progress_mode == 'live' else None
 
 
-# ============================================
-# ОБРОБКА ДІЙ БОТІВ
-# ============================================
+def drop_progress(chat_id: int):
+    """Гра завершена: підсумок більше не оновлюється"""
+    progress = _progress.pop(chat_id, None)
+    if progress is not None:
+        progress_edits.close(progress.key)
 
-async def process_bot_actions(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Обробка дій ботів під час нічної фази"""
-    game = mafia_game.games[chat_id]
-    
-    for bot_id, bot_info in game['bots'].items():
-        if not bot_info['alive']:
-            continue
-        
-        role_key = bot_info['role']
-        role_info = mafia_game.get_role_info(role_key)
-        action = role_info.get('action')
-        
-        if not action:
-            continue
-        
-        target = None
-        if action == 'kill':
-            target = bot_mafia_choice(game, bot_id)
-        elif action == 'heal':
-            target = bot_doctor_choice(game, bot_id)
-        # Детектив ботам не випадає
-        
-        if target:
-            game['night_actions'][bot_id] = {
-                'action': action,
-                'target': target
-            }
-            
-            await asyncio.sleep(random.uniform(1, 3))  # Імітація "думання"
-            
-            # ВИПРАВЛЕННЯ: Прибрано смайлик ролі щоб не палити бота
-            bot_name = bot_info['username']
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=f"🤖 <b>{bot_name}</b> зробив свій вибір...",
-                parse_mode=ParseMode.HTML
-            )
 
+async def announce_move(context: ContextTypes.DEFAULT_TYPE, chat_id: int, progress: Optional[PhaseProgress],
+                        name: str, text: str):
+    """Гравець походив: рядок у живому підсумку або окреме повідомлення (режим each)
 
-async def process_bot_votes(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Обробка голосів ботів за висунення кандидата"""
-    game = mafia_game.games[chat_id]
+    progress береться через move_progress до ходу в рушії: останній хід
+    закриває фазу або гру, і після нього підсумок був би вже чужим.
+    """
+    if progress is None:
+        # Під навантаженням outbound може злити такі рядки в одне повідомлення або відкинути
+        await context.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.HTML,
+                                       rate_limit_args=FLAVOR_MESSAGE)
+        return
     
-    for bot_id, bot_info in game['bots'].items():
-        if not bot_info['alive']:
-            continue
-        
-        await asyncio.sleep(random.uniform(1, 2))
-        
-        choice = bot_voting_choice(game, bot_id)
-        game['votes'][bot_id] = choice
-        
-        bot_name = bot_info['username']
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text=f"🤖 <b>{bot_name}</b> висунув кандидата!",
-            parse_mode=ParseMode.HTML
-        )
+    progress.names.append(name)
+    
+    async def send(text: str, markup):
+        if progress.message_id is None:
+            message = await context.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.HTML,
+                                                     rate_limit_args=PROGRESS_MESSAGE)
+            # None - outbound відкинув повідомлення; наступний хід надішле його знову
+            if message is not None:
+                progress.message_id = message.message_id
+        else:
+            await context.bot.edit_message_text(chat_id=chat_id, message_id=progress.message_id,
+                                                text=text, parse_mode=ParseMode.HTML,
+                                                rate_limit_args=FLAVOR_MESSAGE)
+    
+    progress_edits.request(progress.key, progress.render, send)
 
 
-async def process_bot_final_votes(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Боти голосують ЗА/ПРОТИ випадково"""
-    game = mafia_game.games[chat_id]
-    
-    for bot_id, bot_info in game['bots'].items():
-        if not bot_info['alive']:
-            continue
-        
-        await asyncio.sleep(random.uniform(0.5, 1.5))
-        
-        vote = random.choice(['yes', 'no'])
-        game['vote_results'][bot_id] = vote
-        
-        bot_name = bot_info['username']
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text=f"🤖 <b>{bot_name}</b> проголосував!",
-            parse_mode=ParseMode.HTML
-        )
+async def bot_announcement(context: ContextTypes.DEFAULT_TYPE, chat_id: int, player: str, text: str):
+    """Відкладене оголошення ходу бота (імітація "думання")"""
+    # Якщо фаза вже змінилась, phase_delay відкидає оголошення
+    await announce_move(context, chat_id, move_progress(chat_id), player, text)
+
+
+def schedule_bot_announcements(context: ContextTypes.DEFAULT_TYPE, chat_id: int, phase: str, bots: List[Player]):
+    """Планує оголошення ботів по черзі з випадковими паузами, не блокуючи хендлер"""
+    text, min_delay, max_delay = BOT_ANNOUNCEMENTS[phase]
+    # У грі переважно ботів паузи коротші, як і таймери фаз
+    pace = game_engine.pace(mafia_game.games[chat_id])
+    delay = 0.0
+    for bot in bots:
+        delay += random.uniform(min_delay, max_delay) * pace
+        phase_delay(context, bot_announcement, delay, chat_id,
+                    player=bot.username, text=text.format(name=bot.username))
 
 
 # ============================================
-# КОМАНДИ /start, /newgame, /status, /endgame
+# КОМАНДИ /start, /newgame, /status, /endgame, /votemode, /timers
 # ============================================
 
+# chat_id: режим оголошення ходів, обраний у чаті (переходить у наступні ігри)
+chat_progress_modes: Dict[int, str] = {}
+
+# chat_id: таймери фаз, змінені в чаті поверх config.TIMERS (переходять у наступні ігри)
+chat_timers: Dict[int, Dict[str, int]] = {}
+
+# Ключ config.TIMERS: назва в /timers
+TIMER_NAMES = {
+    'night': "🌙 Ніч",
+    'discussion': "🗣 Обговорення",
+    'voting': "🗳 Висунення",
+    'final_vote': "⚖️ Фінальне голосування",
+}
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /start"""
     if update.message and update.message.chat.type != 'private':
@@ -252,7 +473,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "🎮 Команди в групі:\n"
             "   /newgame - створити нову гру\n"
             "   /endgame - завершити поточну гру\n"
-            "   /status - статус гри\n\n"
+            "   /status - статус гри\n"
+            "   /votemode - підсумок ходів: одне повідомлення або по одному на хід\n"
+            "   /timers - тривалість фаз гри\n\n"
             "💡 <b>Важливо:</b> Спочатку напишіть боту /start в особисті повідомлення!",
             parse_mode=ParseMode.HTML
         )
@@ -272,12 +495,13 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@serialized(group_chat)
 async def newgame(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /newgame - створення нової гри"""
     chat_id = update.message.chat_id
     
     # Перевірка чи є вже активна гра
-    if chat_id in mafia_game.games and mafia_game.games[chat_id]['started']:
+    if chat_id in mafia_game.games and mafia_game.games[chat_id].started:
         await update.message.reply_text(
             "⚠️ <b>Гра вже йде!</b>\n\n"
             "Використовуйте /endgame щоб завершити поточну гру.",
@@ -290,21 +514,29 @@ async def newgame(update: Update, context: ContextTypes.DEFAULT_TYPE):
     game = mafia_game.create_game(chat_id, admin_id)
     
     # Вибір випадкової події
-    game['special_event'] = random.choice(list(SPECIAL_EVENTS.keys()))
+    mafia_game.set_special_event(chat_id, random.choice(list(SPECIAL_EVENTS.keys())))
+    if chat_id in chat_progress_modes:
+        mafia_game.update_game(chat_id, progress_mode=chat_progress_modes[chat_id])
+    if chat_id in chat_timers:
+        mafia_game.update_game(chat_id, timers=dict(chat_timers[chat_id]))
     
     # Відправка повідомлення про гру
     await send_game_message(context, chat_id)
+    # Забагато відкритих лобі - найдавніші закриваються у фоні (не під lock цього чату)
+    if game_sweeper.over_limit():
+        context.application.create_task(game_sweeper.sweep())
     
     await update.message.reply_text(
         "🎮 <b>НОВА ГРА СТВОРЕНА!</b> 🎮\n\n"
-        f"🎲 Подія: <b>{SPECIAL_EVENTS[game['special_event']]['name']}</b>\n"
-        f"<i>{SPECIAL_EVENTS[game['special_event']]['description']}</i>\n\n"
+        f"🎲 Подія: <b>{SPECIAL_EVENTS[game.special_event]['name']}</b>\n"
+        f"<i>{SPECIAL_EVENTS[game.special_event]['description']}</i>\n\n"
         "👥 Натисніть «ПРИЄДНАТИСЯ» щоб грати!\n"
         "🤖 Можна додати ботів для повної гри.",
         parse_mode=ParseMode.HTML
     )
 
 
+@serialized(group_chat)
 async def endgame(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /endgame - завершення гри"""
     chat_id = update.message.chat_id
@@ -314,7 +546,7 @@ async def endgame(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Очищення гри
-    mafia_game.end_game(chat_id)
+    close_game(chat_id)
     
     await update.message.reply_text(
         "🛑 <b>ГРУ ЗАВЕРШЕНО!</b> 🛑\n\n"
@@ -324,6 +556,73 @@ async def endgame(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@serialized(group_chat)
+async def votemode(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /votemode [live|each] - як оголошувати ходи гравців у групі"""
+    chat_id = update.message.chat_id
+    
+    if not context.args or context.args[0] not in PROGRESS_MODES:
+        game = mafia_game.games.get(chat_id)
+        current = game.progress_mode if game else chat_progress_modes.get(chat_id, 'live')
+        await update.message.reply_text(
+            f"🗳 Режим оголошень: <b>{current}</b>\n\n"
+            "/votemode live - один підсумок фази, що оновлюється\n"
+            "/votemode each - окреме повідомлення на кожен хід",
+            parse_mode=ParseMode.HTML
+        )
+        return
+    
+    mode = context.args[0]
+    chat_progress_modes[chat_id] = mode
+    if chat_id in mafia_game.games:
+        mafia_game.update_game(chat_id, progress_mode=mode)
+    
+    await update.message.reply_text(f"✅ Режим оголошень: <b>{mode}</b>", parse_mode=ParseMode.HTML)
+
+
+@serialized(group_chat)
+async def timers(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /timers [фаза сек | reset] - тривалість фаз гри в цьому чаті"""
+    chat_id = update.message.chat_id
+    game = mafia_game.games.get(chat_id)
+    # Після рестарту таймери чату є лише в збереженій грі
+    overrides = dict(chat_timers.get(chat_id) or (game.timers if game else None) or {})
+    args = context.args or []
+    low, high = TIMER_LIMITS
+    
+    if args == ['reset']:
+        overrides = {}
+    elif len(args) == 2 and args[0] in TIMERS and args[1].isdigit() and low <= int(args[1]) <= high:
+        overrides[args[0]] = int(args[1])
+    else:
+        current = "\n".join(f"   {name}: <b>{overrides.get(key, TIMERS[key])} сек</b>"
+                            for key, name in TIMER_NAMES.items())
+        adaptive = (f"\n\n⚡ Фаза закінчується раніше, коли всі живі гравці походили, а обговорення - "
+                    f"після {DISCUSSION_QUIET:.0f} сек тиші в чаті. Якщо ботів більше, ніж живих людей, "
+                    f"фази коротші.") if game_engine.adaptive else ""
+        await update.message.reply_text(
+            f"⏱ <b>Тривалість фаз:</b>\n{current}{adaptive}\n\n"
+            f"/timers {' | '.join(TIMERS)} &lt;сек&gt; - змінити ({low}-{high} сек)\n"
+            "/timers reset - як за замовчуванням",
+            parse_mode=ParseMode.HTML
+        )
+        return
+    
+    if overrides:
+        chat_timers[chat_id] = overrides
+    else:
+        chat_timers.pop(chat_id, None)
+    if game is not None:
+        mafia_game.update_game(chat_id, timers=overrides or None)
+    
+    await update.message.reply_text(
+        "✅ Таймери оновлено: " + (", ".join(f"{TIMER_NAMES[key]} - {seconds} сек" for key, seconds in overrides.items())
+                                 or "як за замовчуванням") + "\n<i>Діють з наступної фази.</i>",
+        parse_mode=ParseMode.HTML
+    )
+
+
+@serialized(group_chat)
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /status - статус гри"""
     chat_id = update.message.chat_id
@@ -338,19 +637,23 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     status_text = f"""
 📊 <b>СТАТУС ГРИ</b>
 
-🔄 Фаза: <b>{game['phase']}</b>
-📅 День: <b>{game['day_number']}</b>
+🔄 Фаза: <b>{game.phase}</b>
+📅 День: <b>{game.day_number}</b>
 👥 Гравців: <b>{len(all_players)}</b>
-🎲 Подія: <b>{SPECIAL_EVENTS.get(game['special_event'], {}).get('name', 'Немає')}</b>
+🎲 Подія: <b>{SPECIAL_EVENTS.get(game.special_event, {}).get('name', 'Немає')}</b>
 """
     
-    if game['started']:
-        alive_players = [p for p in all_players.values() if p['alive']]
-        dead_players = [p for p in all_players.values() if not p['alive']]
+    remaining = phase_timers.remaining(chat_id)
+    if remaining is not None:
+        status_text += f"⏱ До кінця фази: <b>{int(remaining)} сек</b>\n"
+    
+    if game.started:
+        alive_count = len(game.alive_players)
+        dead_count = len(all_players) - alive_count
         
-        status_text += f"\n✅ Живих: <b>{len(alive_players)}</b>"
-        if dead_players:
-            status_text += f"\n💀 Мертвих: <b>{len(dead_players)}</b>"
+        status_text += f"\n✅ Живих: <b>{alive_count}</b>"
+        if dead_count:
+            status_text += f"\n💀 Мертвих: <b>{dead_count}</b>"
     
     await update.message.reply_text(status_text, parse_mode=ParseMode.HTML)
 
@@ -359,12 +662,15 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # КОЛБЕКИ (INLINE BUTTONS)
 # ============================================
 
-async def join_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+# Хендлери кнопок викликає route_callback: payload уже розібраний і
+# перевірений, lock гри взятий
+
+async def join_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: Callback):
     """Приєднання до гри"""
     query = update.callback_query
     await query.answer()
     
-    chat_id = query.message.chat_id
+    chat_id = payload.chat_id
     user_id = query.from_user.id
     username = query.from_user.username or query.from_user.first_name
     
@@ -375,18 +681,22 @@ async def join_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     game = mafia_game.games[chat_id]
     all_players = mafia_game.get_all_players(chat_id)
     
-    if game['started']:
+    if game.started:
         await query.answer("⚠️ Гра вже почалась!", show_alert=True)
         return
     
-    if len(all_players) >= 15:
+    if len(all_players) >= MAX_PLAYERS:
         await query.answer("⚠️ Гра повна!", show_alert=True)
         return
     
-    if user_id in game['players']:
+    if user_id in game.players:
         await query.answer("⚠️ Ви вже в грі!", show_alert=True)
         return
     
+    if mafia_game.game_of(user_id) is not None:
+        await query.answer("⚠️ Ви вже граєте в іншому чаті!", show_alert=True)
+        return
+    
     # Додавання гравця
     mafia_game.add_player(chat_id, user_id, username, is_bot=False)
     
@@ -394,12 +704,12 @@ async def join_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await update_game_message(context, chat_id)
 
 
-async def add_bots_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def add_bots_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: Callback):
     """Меню додавання ботів"""
     query = update.callback_query
     await query.answer()
     
-    chat_id = query.message.chat_id
+    chat_id = payload.chat_id
     
     if chat_id not in mafia_game.games:
         await query.answer("⚠️ Гра не знайдена!", show_alert=True)
@@ -407,7 +717,7 @@ async def add_bots_menu_callback(update: Update, context: ContextTypes.DEFAULT_T
     
     game = mafia_game.games[chat_id]
     all_players = mafia_game.get_all_players(chat_id)
-    available_slots = 15 - len(all_players)
+    available_slots = MAX_PLAYERS - len(all_players)
     
     if available_slots <= 0:
         await query.answer("⚠️ Гра повна!", show_alert=True)
@@ -416,32 +726,33 @@ async def add_bots_menu_callback(update: Update, context: ContextTypes.DEFAULT_T
     keyboard = []
     for i in [1, 2, 3, 5, 10]:
         if i <= available_slots:
-            keyboard.append([InlineKeyboardButton(
+            keyboard.append([game_button(
                 f"🤖 Додати {i} бот{'а' if i in [2, 3, 4] else 'ів' if i > 4 else ''}",
-                callback_data=f"add_bots_{i}"
+                game, ADD_BOTS, arg=i
             )])
     
-    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_game")])
+    keyboard.append([game_button("🔙 Назад", game, BACK_TO_GAME)])
     
     await query.edit_message_text(
         f"🤖 <b>ДОДАТИ БОТІВ</b>\n\n"
-        f"👥 Гравців: {len(game['players'])}\n"
-        f"🤖 Ботів: {len(game['bots'])}\n"
+        f"👥 Гравців: {len(game.players)}\n"
+        f"🤖 Ботів: {len(game.bots)}\n"
         f"📊 Вільно: {available_slots}\n\n"
         f"<b>Скільки додати?</b>",
         reply_markup=InlineKeyboardMarkup(keyboard),
         parse_mode=ParseMode.HTML
     )
+    # Лобі замінене меню - наступне оновлення не можна пропускати як "без змін"
+    lobby_edits.invalidate(chat_id)
 
 
-async def add_bots_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def add_bots_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: Callback):
     """Додавання ботів"""
     query = update.callback_query
     await query.answer()
     
-    data = query.data.split('_')
-    count = int(data[2])
-    chat_id = query.message.chat_id
+    count = payload.arg
+    chat_id = payload.chat_id
     
     if chat_id not in mafia_game.games:
         await query.answer("⚠️ Гра не знайдена!", show_alert=True)
@@ -454,25 +765,26 @@ async def add_bots_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update_game_message(context, chat_id)
         
         game = mafia_game.games[chat_id]
-        bot_names = [b['username'] for b in game['bots'].values()]
+        bot_names = [b.username for b in game.bots.values()]
         
         await context.bot.send_message(
             chat_id=chat_id,
             text=f"🤖 <b>Боти приєднались!</b>\n\n"
                  f"🎭 {', '.join(bot_names)}\n\n"
                  f"<i>Можна починати!</i>",
-            parse_mode=ParseMode.HTML
+            parse_mode=ParseMode.HTML,
+            rate_limit_args=FLAVOR_MESSAGE
         )
     else:
         await query.answer("⚠️ Не вдалось додати ботів!", show_alert=True)
 
 
-async def leave_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def leave_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: Callback):
     """Вихід з гри"""
     query = update.callback_query
     await query.answer()
     
-    chat_id = query.message.chat_id
+    chat_id = payload.chat_id
     user_id = query.from_user.id
     username = query.from_user.username or query.from_user.first_name
     
@@ -487,141 +799,117 @@ async def leave_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
         await query.answer("⚠️ Ви не в грі або вона вже почалась!", show_alert=True)
 
 
+def render_lobby(chat_id: int) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+    """Текст і кнопки лобі гри (None - гра вже почалась або її немає)"""
+    game = mafia_game.games.get(chat_id)
+    if game is None or game.started:
+        return None
+    return cached_lobby(game)
+
+
 async def update_game_message(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Оновлення повідомлення про гру"""
+    """Оновлення повідомлення про гру (редагування за вікно зливаються в одне)"""
     if chat_id not in mafia_game.games or chat_id not in mafia_game.game_messages:
         return
     
-    game = mafia_game.games[chat_id]
-    all_players = mafia_game.get_all_players(chat_id)
-    
-    event_text = ""
-    if game['special_event']:
-        event_info = SPECIAL_EVENTS[game['special_event']]
-        event_text = f"\n\n🎲 <b>{event_info['emoji']} {event_info['name']}</b>\n<i>{event_info['description']}</i>"
-    
-    announcement_keyboard = [
-        [InlineKeyboardButton("➕ ПРИЄДНАТИСЯ", callback_data="join_game")],
-        [InlineKeyboardButton("🤖 ДОДАТИ БОТІВ", callback_data="add_bots_menu")],
-        [InlineKeyboardButton("🎯 ПОЧАТИ ГРУ", callback_data="start_game")],
-        [InlineKeyboardButton("❌ ВИЙТИ", callback_data="leave_game")],
-    ]
-    
-    players_list = ""
-    if game['players']:
-        players_list += "<b>👥 Гравці:</b>\n"
-        for i, pinfo in enumerate(game['players'].values(), 1):
-            players_list += f"   {i}. ✅ {pinfo['username']}\n"
-    
-    if game['bots']:
-        players_list += f"\n<b>🤖 Боти ({len(game['bots'])}):</b>\n"
-        for i, binfo in enumerate(game['bots'].values(), 1):
-            players_list += f"   {i}. 🤖 {binfo['username']}\n"
-    
-    if not players_list:
-        players_list = "<i>Поки що немає...</i>"
-    
-    total = len(all_players)
-    updated_text = f"""
-🎮 <b>ГРА: МАФІЯ</b> 🎮{event_text}
-
-<b>📊 Учасників ({total}/15):</b>
-{players_list}
-"""
+    async def send(text: str, markup: InlineKeyboardMarkup):
+        message_id = mafia_game.game_messages.get(chat_id)
+        if message_id is None:
+            return
+        try:
+            await context.bot.edit_message_text(
+                chat_id=chat_id,
+                message_id=message_id,
+                text=text,
+                reply_markup=markup,
+                parse_mode=ParseMode.HTML
+            )
+        except BadRequest as e:
+            # Той самий вміст вже в повідомленні - не помилка
+            if 'not modified' not in str(e):
+                raise
     
-    try:
-        await context.bot.edit_message_text(
-            chat_id=chat_id,
-            message_id=mafia_game.game_messages[chat_id],
-            text=updated_text,
-            reply_markup=InlineKeyboardMarkup(announcement_keyboard),
-            parse_mode=ParseMode.HTML
-        )
-    except Exception as e:
-        logger.error(f"Помилка оновлення повідомлення: {e}")
+    lobby_edits.request(chat_id, lambda: render_lobby(chat_id), send)
 
 
 async def send_game_message(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
     """Відправка повідомлення про гру"""
-    game = mafia_game.games[chat_id]
-    all_players = mafia_game.get_all_players(chat_id)
-    
-    event_text = ""
-    if game['special_event']:
-        event_info = SPECIAL_EVENTS[game['special_event']]
-        event_text = f"\n\n🎲 <b>{event_info['emoji']} {event_info['name']}</b>\n<i>{event_info['description']}</i>"
-    
-    announcement_keyboard = [
-        [InlineKeyboardButton("➕ ПРИЄДНАТИСЯ", callback_data="join_game")],
-        [InlineKeyboardButton("🤖 ДОДАТИ БОТІВ", callback_data="add_bots_menu")],
-        [InlineKeyboardButton("🎯 ПОЧАТИ ГРУ", callback_data="start_game")],
-        [InlineKeyboardButton("❌ ВИЙТИ", callback_data="leave_game")],
-    ]
-    
-    players_list = ""
-    if game['players']:
-        players_list += "<b>👥 Гравці:</b>\n"
-        for i, pinfo in enumerate(game['players'].values(), 1):
-            players_list += f"   {i}. ✅ {pinfo['username']}\n"
-    
-    if game['bots']:
-        players_list += f"\n<b>🤖 Боти ({len(game['bots'])}):</b>\n"
-        for i, binfo in enumerate(game['bots'].values(), 1):
-            players_list += f"   {i}. 🤖 {binfo['username']}\n"
-    
-    if not players_list:
-        players_list = "<i>Поки що немає...</i>"
-    
-    total = len(all_players)
-    message_text = f"""
-🎮 <b>ГРА: МАФІЯ</b> 🎮{event_text}
-
-<b>📊 Учасників ({total}/15):</b>
-{players_list}
-"""
+    content = render_lobby(chat_id)
+    if content is None:
+        return
+    text, markup = content
     
     try:
         message = await context.bot.send_message(
             chat_id=chat_id,
-            text=message_text,
-            reply_markup=InlineKeyboardMarkup(announcement_keyboard),
+            text=text,
+            reply_markup=markup,
             parse_mode=ParseMode.HTML
         )
-        mafia_game.game_messages[chat_id] = message.message_id
+        mafia_game.set_game_message(chat_id, message.message_id)
+        lobby_edits.sent(chat_id, content)
     except Exception as e:
         logger.error(f"Помилка відправки повідомлення: {e}")
 
 
+# ============================================
+# ВІДОБРАЖЕННЯ ПОДІЙ РУШІЯ
+# ============================================
+
+# Подія рушія: фаза, що з неї починається (для метрик тривалості фаз)
+PHASE_EVENTS = {
+    'night_started': 'night',
+    'discussion_started': 'discussion',
+    'voting_started': 'voting',
+    'final_voting_started': 'final_voting',
+}
+
+
+async def render(context: ContextTypes.DEFAULT_TYPE, chat_id: int, events: Events):
+    """Перетворює події рушія на повідомлення і таймери (по черзі)"""
+    for event in events:
+        phase = PHASE_EVENTS.get(event.kind)
+        if phase:
+            phase_clock.enter(chat_id, phase)
+        await EVENT_RENDERERS[event.kind](context, chat_id, event)
+
+
+async def render_bots_acted(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    # ВИПРАВЛЕННЯ: Прибрано смайлик ролі щоб не палити бота
+    # Рішення вже записані, в чат вони "надходять" з паузами
+    schedule_bot_announcements(context, chat_id, event['phase'], event['bots'])
+
+
 # ============================================
 # ПОЧАТОК ГРИ
 # ============================================
 
-async def start_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def start_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: Callback):
     """Початок гри"""
     query = update.callback_query
     await query.answer()
     
-    chat_id = query.message.chat_id
+    chat_id = payload.chat_id
     
     if chat_id not in mafia_game.games:
         await query.answer("⚠️ Гра не знайдена!", show_alert=True)
         return
     
-    game = mafia_game.games[chat_id]
     all_players = mafia_game.get_all_players(chat_id)
     
     if len(all_players) < 3:
         await query.answer("⚠️ Потрібно мінімум 3 гравці!", show_alert=True)
         return
     
-    # Позначаємо гру як розпочату
-    game['started'] = True
-    game['phase'] = 'night'
-    game['day_number'] = 1
-    
-    # Роздача ролей
-    mafia_game.distribute_roles(chat_id)
+    # Роздача ролей (позначає гру як розпочату) і перша ніч
+    events = game_engine.start_game(chat_id)
+    if not events:
+        await query.answer("⚠️ Потрібно мінімум 5 гравців!", show_alert=True)
+        return
     
+    # Відкладене редагування лобі не повинно перезаписати старт гри
+    lobby_edits.forget(chat_id)
+    lobby_renders.forget(chat_id)
     await query.edit_message_text(
         "🎮 <b>ГРА ПОЧАЛАСЬ!</b> 🎮\n\n"
         "🌙 Ніч опускається на село...\n"
@@ -629,46 +917,30 @@ async def start_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
         parse_mode=ParseMode.HTML
     )
     
-    # Відправка ролей гравцям
+    await render(context, chat_id, events)
+
+
+async def render_roles_assigned(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
     await send_roles_to_players(context, chat_id)
-    
-    # Початок першої ночі
-    await start_night(context, chat_id)
 
 
 async def send_roles_to_players(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
     """Відправка ролей гравцям"""
-    game = mafia_game.games[chat_id]
     all_players = mafia_game.get_all_players(chat_id)
     
-    for user_id, player_info in all_players.items():
-        role_key = player_info['role']
-        role_info = mafia_game.get_role_info(role_key)
-        
-        role_text = f"""
-🎭 <b>ВАША РОЛЬ:</b>
-
-{role_info['emoji']} <b>{role_info['full_name']}</b>
-
-📋 <b>Опис:</b>
-{role_info['description']}
-
-🎯 <b>Команда:</b> {'<b>🔴 МАФІЯ</b>' if role_info['team'] == 'mafia' else '<b>🔵 МИРНІ</b>'}
-"""
-        
+    async def send_role(user_id: int, role_text: str):
         try:
-            if player_info['is_bot']:
-                # Для ботів просто повідомлення в чат
-                pass
-            else:
-                # Для людей - в особисті
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=role_text,
-                    parse_mode=ParseMode.HTML
-                )
+            await context.bot.send_message(
+                chat_id=user_id,
+                text=role_text,
+                parse_mode=ParseMode.HTML
+            )
         except Exception as e:
             logger.error(f"Помилка відправки ролі {user_id}: {e}")
+    
+    # Ботам роль не надсилаємо, людям - в особисті (картки зібрані при імпорті)
+    await fan_out([send_role(user_id, role_card(player_info.role))
+                   for user_id, player_info in all_players.items() if not player_info.is_bot])
 
 
 # ============================================
@@ -677,31 +949,25 @@ async def send_roles_to_players(context: ContextTypes.DEFAULT_TYPE, chat_id: int
 
 async def start_night(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
     """Початок нічної фази"""
-    game = mafia_game.games[chat_id]
-    
-    # Очищення дій попередньої ночі
-    game['night_actions'] = {}
-    game['perks_messages'] = []
-    game['night_resolved'] = False
-    
-    # ВИПРАВЛЕННЯ: Відправляємо лише ОДИН GIF на початку ночі
-    await send_gif(
-        context,
-        chat_id,
-        'night',
-        f"🌙 <b>Ніч {game['day_number']}...</b> 🌙\n\n"
-        f"{random.choice(NIGHT_PHRASES)}\n\n"
-        f"<i>Село засинає...</i>"
-    )
-    
-    # Відправка кнопок дій живим гравцям
-    await send_night_actions(context, chat_id)
-    
-    # Обробка дій ботів
-    await process_bot_actions(context, chat_id)
+    await render(context, chat_id, game_engine.start_night(chat_id))
+
+
+async def render_night_started(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    # ВИПРАВЛЕННЯ: Відправляємо лише ОДИН GIF на початку ночі,
+    # паралельно з кнопками дій живим гравцям
+    await fan_out([
+        send_gif(
+            context,
+            chat_id,
+            'night',
+            f"🌙 <b>Ніч {event['day']}...</b> 🌙\n\n"
+            f"{random.choice(NIGHT_PHRASES)}\n\n"
+            f"<i>Село засинає...</i>"
+        ),
+        send_night_actions(context, chat_id),
+    ])
     
-    # Таймер на 45 секунд
-    context.job_queue.run_once(night_timeout, when=45, chat_id=chat_id, name=f"night_{chat_id}")
+    arm_phase_timer(chat_id, night_timeout, event['timeout'])
 
 
 async def send_night_actions(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
@@ -709,581 +975,402 @@ async def send_night_actions(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
     game = mafia_game.games[chat_id]
     all_players = mafia_game.get_all_players(chat_id)
     
-    for user_id, player_info in all_players.items():
-        if not player_info['alive'] or player_info['is_bot']:
-            continue
-        
-        role_key = player_info['role']
-        role_info = mafia_game.get_role_info(role_key)
-        action = role_info.get('action')
-        
-        if not action:
-            continue
-        
-        # Формуємо клавіатуру з цілями
-        targets = []
-        for target_id, target_info in all_players.items():
-            if target_id != user_id and target_info['alive']:
-                targets.append((target_id, target_info['username']))
-        
-        if not targets:
-            continue
-        
-        keyboard = []
-        for target_id, target_name in targets:
-            if action == 'kill':
-                keyboard.append([InlineKeyboardButton(
-                    f"🔪 {target_name}",
-                    callback_data=f"night_kill_{target_id}"
-                )])
-            elif action == 'heal':
-                keyboard.append([InlineKeyboardButton(
-                    f"💉 {target_name}",
-                    callback_data=f"night_heal_{target_id}"
-                )])
-            elif action == 'check':
-                keyboard.append([InlineKeyboardButton(
-                    f"🔍 {target_name}",
-                    callback_data=f"night_check_{target_id}"
-                )])
-        
-        # Додаткова дія для детектива - постріл
-        if action == 'check' and game.get('detective_shot_used', False) == False:
-            keyboard.append([InlineKeyboardButton(
-                "🔫 Постріл (один раз)",
-                callback_data="night_shoot_menu"
-            )])
-        
-        action_text = {
-            'kill': "🔪 <b>ВИБЕРІТЬ ЖЕРТВУ:</b>",
-            'heal': "💉 <b>ВИБЕРІТЬ КОГО ВРЯТУВАТИ:</b>",
-            'check': "🔍 <b>ВИБЕРІТЬ КОГО ПЕРЕВІРИТИ:</b>"
-        }
-        
+    # Живі цілі рахуємо один раз на фазу (в порядку реєстрації)
+    alive_targets = [(target_id, target_info.username) for target_id, target_info in all_players.items()
+                     if target_info.alive]
+    keyboards: Dict[str, TargetKeyboard] = {}  # дія: клавіатура фази, спільна для всіх з цією дією
+    
+    def keyboard_for(action: str) -> TargetKeyboard:
+        keyboard = keyboards.get(action)
+        if keyboard is None:
+            label, button_action = NIGHT_BUTTONS[action]
+            # Додаткова дія для детектива - постріл
+            tail = [game_button("🔫 Постріл (один раз)", game, SHOOT_MENU)] \
+                if action == 'check' and not game.detective_shot_used else ()
+            keyboard = keyboards[action] = TargetKeyboard(game, button_action, label, alive_targets, tail)
+        return keyboard
+    
+    async def send_actions(user_id: int, action: str, markup: InlineKeyboardMarkup):
         try:
             await context.bot.send_message(
                 chat_id=user_id,
-                text=action_text.get(action, "<b>ВАША ДІЯ:</b>"),
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                text=NIGHT_PROMPTS.get(action, DEFAULT_NIGHT_PROMPT),
+                reply_markup=markup,
                 parse_mode=ParseMode.HTML
             )
         except Exception as e:
             logger.error(f"Помилка відправки дій {user_id}: {e}")
-
-
-async def night_timeout(context: ContextTypes.DEFAULT_TYPE):
-    """Завершення нічної фази"""
-    chat_id = context.job.chat_id
-    game = mafia_game.games.get(chat_id)
-    
-    if not game or game['phase'] != 'night':
-        return
-    
-    # Якщо ніч вже оброблена - виходимо
-    if game.get('night_resolved', False):
-        return
-    
-    game['night_resolved'] = True
     
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text="⏰ <b>НІЧ ЗАКІНЧИЛАСЬ!</b>\n\n"
-             "📊 Обробляємо результати...",
-        parse_mode=ParseMode.HTML
-    )
+    sends = []
+    for user_id in game.alive_humans:
+        action = mafia_game.get_role_info(all_players[user_id].role).get('action')
+        if not action:
+            continue
+        
+        keyboard = keyboard_for(action)
+        if not keyboard.targets_for(user_id):
+            continue
+        
+        sends.append(send_actions(user_id, action, keyboard.markup_for(user_id)))
     
-    await process_night(context, chat_id)
+    await fan_out(sends)
 
 
-async def process_night(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Обробка результатів ночі"""
-    game = mafia_game.games[chat_id]
-    all_players = mafia_game.get_all_players(chat_id)
-
-    mafia_target: Optional[int] = None
-    healed_target: Optional[int] = None
-    check_results = []
-    detective_shot: Optional[int] = None
-    potato_kills = []
-
-    # Картопля з Буковеля
-    if game['special_event'] == 'bukovel':
-        for thrower_id, target_id in game.get('potato_throws', {}).items():
-            if random.random() < 0.20:  # 20% влучити
-                potato_kills.append((thrower_id, target_id))
-                game['perks_messages'].append(
-                    f"🥔💥 <b>{random.choice(POTATO_PHRASES)}</b>\n"
-                    f"💀 Бульба забрала життя!"
-                )
-
-    # Розбір нічних дій
-    for user_id, action_info in game['night_actions'].items():
-        action = action_info['action']
-        target = action_info['target']
-
-        if action == 'kill':
-            mafia_target = target
-        elif action == 'heal':
-            healed_target = target
-            game['last_healed'] = healed_target
-        elif action == 'check':
-            target_role_key = all_players[target]['role']
-            role_info = mafia_game.get_role_info(target_role_key)
-
-            detective_error = random.random() < 0.05
-
-            if target_role_key == 'kishkel':
-                is_mafia = False
-            else:
-                is_mafia = (role_info['team'] == 'mafia')
-                if detective_error:
-                    is_mafia = not is_mafia
-                    game['detective_error_target'] = target
-
-            check_results.append((user_id, target, is_mafia, detective_error))
-        elif action == 'shoot':
-            detective_shot = target
-
-    victims = set()
-    saved = False
-    mafia_misfire = False
-
-    # Логіка мафії
-    if mafia_target:
-        if mafia_target == healed_target:
-            saved = True
-            game['perks_messages'].append(
-                f"💉 <b>Федорчак врятував {all_players[healed_target]['username']}!</b>\n"
-                f"🙏 {random.choice(SAVED_PHRASES)}"
-            )
-        else:
-            victims.add(mafia_target)
-
-    # Логіка детектива - постріл
-    if detective_shot and detective_shot != healed_target:
-        victims.add(detective_shot)
-        game['detective_shot_used'] = True
-        game['perks_messages'].append(
-            "🔫 <b>Детектив відкрив вогонь!</b>\n💀 Постріл забрав життя!"
-        )
-
-    # Картопля
-    for thrower_id, target_id in potato_kills:
-        victims.add(target_id)
+async def night_timeout(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    """Завершення нічної фази"""
+    await render(context, chat_id, game_engine.end_night(chat_id))
 
-    game['mafia_misfire'] = mafia_misfire
 
-    # Застосовуємо смерті
-    for vid in victims:
-        all_players[vid]['alive'] = False
-        game['alive_players'].discard(vid)
+async def render_night_ended(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    if event['reason'] == 'timeout':
+        text = "⏰ <b>НІЧ ЗАКІНЧИЛАСЬ!</b>\n\n📊 Обробляємо результати..."
+    else:
+        text = "✅ <b>УСІ ЗРОБИЛИ ВИБІР!</b>\n\n📊 Обробляємо результати..."
+    await context.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.HTML)
 
-    # Результати детективу
-    for detective_id, target_id, is_mafia, had_error in check_results:
-        if detective_id not in game['players']:
-            continue
-        target_name = all_players[target_id]['username']
 
-        result_text = f"""
+async def render_detective_result(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    is_mafia = event['is_mafia']
+    result_text = f"""
 🔍 <b>━━━ РЕЗУЛЬТАТ РОЗСЛІДУВАННЯ ━━━</b> 🔍
 
-<b>Перевірений:</b> {target_name}
+<b>Перевірений:</b> {event['target'].username}
 
 <b>Результат:</b>
 {'🔴 <b>МАФІЯ!</b> Це злочинець!' if is_mafia else '🔵 <b>МИРНИЙ!</b> Чесна людина.'}
 
 {'⚠️ Обережно з цією інформацією!' if is_mafia else '✅ Можна довіряти.'}
 """
-        try:
-            await context.bot.send_message(
-                chat_id=detective_id,
-                text=result_text,
-                parse_mode=ParseMode.HTML
-            )
-        except Exception as e:
-            logger.error(f"Помилка детективу: {e}")
-
-    # День
-    game['phase'] = 'day'
+    try:
+        await context.bot.send_message(
+            chat_id=event['detective_id'],
+            text=result_text,
+            parse_mode=ParseMode.HTML
+        )
+    except Exception as e:
+        logger.error(f"Помилка детективу: {e}")
+
+
+def perk_text(kind: str, player: Player) -> str:
+    """Рядок блоку подій ночі"""
+    if kind == 'potato':
+        return f"🥔💥 <b>{random.choice(POTATO_PHRASES)}</b>\n💀 Бульба забрала життя!"
+    if kind == 'saved':
+        return f"💉 <b>Федорчак врятував {player.username}!</b>\n🙏 {random.choice(SAVED_PHRASES)}"
+    return "🔫 <b>Детектив відкрив вогонь!</b>\n💀 Постріл забрав життя!"
+
+
+async def render_morning(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    """Оголошення результатів ночі"""
+    day = event['day']
+    victims = event['victims']
+    saved = event['saved']
+    # 0 - живих людей немає, обговорення пропускається
+    if event['discussion']:
+        discussion = f"🗣 <b>ЧАС ОБГОВОРЕННЯ!</b> ({event['discussion']} сек)\n\n{random.choice(DISCUSSION_PHRASES)}"
+    else:
+        discussion = "🗳 <b>Без обговорення - одразу голосування.</b>"
 
     # Виправлення довгих ліній
     perks_block = ""
-    if game['perks_messages']:
-        perks_block = "\n\n━━━━━━━━━━━━━━\n\n" + "\n".join(game['perks_messages']) + "\n\n━━━━━━━━━━━━━━"
+    if event['perks']:
+        perks_block = "\n\n━━━━━━━━━━━━━━\n\n" + "\n".join(perk_text(*perk) for perk in event['perks']) + \
+            "\n\n━━━━━━━━━━━━━━"
 
-    # Оголошення результатів
     if victims:
         if len(victims) == 1:
-            killed = next(iter(victims))
-            killed_name = all_players[killed]['username']
-            killed_role = mafia_game.get_role_info(all_players[killed]['role'])
+            killed = victims[0]
+            killed_role = mafia_game.get_role_info(killed.role)
 
             death_phrase = random.choice(DEATH_PHRASES)
 
             night_result = f"""
-☀️ <b>━━━━━ РАНОК ДНЯ {game['day_number']} ━━━━━</b> ☀️
+☀️ <b>━━━━━ РАНОК ДНЯ {day} ━━━━━</b> ☀️
 
 💀 <b>ТРАГІЧНА НОВИНА!</b> 💀
 
 <i>Жителі села виявили страшну знахідку...</i>
 
-💀 <b>Загинув:</b> {killed_name}
+💀 <b>Загинув:</b> {killed.username}
 🎭 <b>Роль:</b> {killed_role['emoji']} {killed_role['full_name']}
 
 {death_phrase}{perks_block}
 
-🗣 <b>ЧАС ОБГОВОРЕННЯ!</b> (60 сек)
-
-{random.choice(DISCUSSION_PHRASES)}
+{discussion}
 """
         else:
             lines = []
-            for vid in victims:
-                pinfo = all_players[vid]
-                rinfo = mafia_game.get_role_info(pinfo['role'])
-                bot_mark = "🤖 " if pinfo['is_bot'] else ""
-                lines.append(f"💀 <b>{bot_mark}{pinfo['username']}</b> — {rinfo['emoji']} {rinfo['full_name']}")
+            for pinfo in victims:
+                rinfo = mafia_game.get_role_info(pinfo.role)
+                bot_mark = "🤖 " if pinfo.is_bot else ""
+                lines.append(f"💀 <b>{bot_mark}{pinfo.username}</b> — {rinfo['emoji']} {rinfo['full_name']}")
             victims_block = "\n".join(lines)
 
             night_result = f"""
-☀️ <b>━━━━━ РАНОК ДНЯ {game['day_number']} ━━━━━</b> ☀️
+☀️ <b>━━━━━ РАНОК ДНЯ {day} ━━━━━</b> ☀️
 
 💀 <b>КРИВАВА НІЧ!</b> 💀
 
 {victims_block}{perks_block}
 
-🗣 <b>ЧАС ОБГОВОРЕННЯ!</b> (60 сек)
-
-{random.choice(DISCUSSION_PHRASES)}
+{discussion}
 """
     elif saved:
-        saved_name = all_players[healed_target]['username']
         saved_phrase = random.choice(SAVED_PHRASES)
 
         night_result = f"""
-☀️ <b>━━━━━ РАНОК ДНЯ {game['day_number']} ━━━━━</b> ☀️
+☀️ <b>━━━━━ РАНОК ДНЯ {day} ━━━━━</b> ☀️
 
 🎉 <b>ДИВО!</b> 🎉
 
-💉 <b>Федорчак</b> врятував <b>{saved_name}</b>!
+💉 <b>Федорчак</b> врятував <b>{saved.username}</b>!
 
 {saved_phrase}{perks_block}
 
-🗣 <b>ЧАС ОБГОВОРЕННЯ!</b> (60 сек)
-
-{random.choice(DISCUSSION_PHRASES)}
+{discussion}
 """
     else:
         night_result = f"""
-☀️ <b>━━━━━ РАНОК ДНЯ {game['day_number']} ━━━━━</b> ☀️
+☀️ <b>━━━━━ РАНОК ДНЯ {day} ━━━━━</b> ☀️
 
 😌 <b>СПОКІЙНА НІЧ!</b> 😌
 
 🕊 Всі живі!{perks_block}
 
-🗣 <b>ЧАС ОБГОВОРЕННЯ!</b> (60 сек)
-
-{random.choice(DISCUSSION_PHRASES)}
+{discussion}
 """
 
     # ВИПРАВЛЕННЯ: Відправляємо лише ОДИН GIF замість двох
     await send_gif(context, chat_id, 'death' if victims else 'morning', night_result)
 
-    # Перевірка перемоги
-    if await check_victory(context, chat_id):
-        return
 
-    # Обговорення 60 секунд
-    game['phase'] = 'discussion'
-    game['discussion_started'] = True
-    context.job_queue.run_once(discussion_timeout, when=60, chat_id=chat_id, name=f"discussion_{chat_id}")
+async def render_discussion_started(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    if game_engine.adaptive and event['timeout']:
+        _chat_activity[chat_id] = game_clock.wall()
+    arm_phase_timer(chat_id, discussion_timeout, discussion_left(mafia_game.games[chat_id]))
 
 
 # ============================================
 # ДЕННА ФАЗА - ОБГОВОРЕННЯ ТА ГОЛОСУВАННЯ
 # ============================================
 
-async def discussion_timeout(context: ContextTypes.DEFAULT_TYPE):
-    """Завершення обговорення → голосування"""
-    chat_id = context.job.chat_id
-    game = mafia_game.games.get(chat_id)
-    if not game or game['phase'] != 'discussion':
+def discussion_left(game) -> float:
+    """Секунд до кінця обговорення: дедлайн фази або DISCUSSION_QUIET сек тиші, що настане раніше"""
+    end = game.phase_deadline
+    last = _chat_activity.get(game.chat_id)
+    if last is not None:
+        end = min(end, last + DISCUSSION_QUIET)
+    return max(0.0, end - game_clock.wall())
+
+
+async def discussion_timeout(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    """Завершення обговорення → голосування (вийшов час або в чаті тихо)"""
+    left = discussion_left(mafia_game.games[chat_id])
+    # У чаті писали - обговорення триває до наступної тиші (менше секунди - похибка таймера)
+    if left >= 1:
+        arm_phase_timer(chat_id, discussion_timeout, left)
         return
+    await render(context, chat_id, game_engine.end_discussion(chat_id))
 
+
+async def render_discussion_ended(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    _chat_activity.pop(chat_id, None)
     await context.bot.send_message(
         chat_id=chat_id,
         text="⏰ <b>ЧАС ОБГОВОРЕННЯ ЗАКІНЧИВСЯ!</b>\n\n🗳 Починаємо голосування...",
         parse_mode=ParseMode.HTML
     )
 
-    await start_voting(context, chat_id)
-
 
 async def start_voting(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
     """Початок голосування за висунення"""
+    await render(context, chat_id, game_engine.start_voting(chat_id))
+
+
+async def render_voting_started(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
     game = mafia_game.games[chat_id]
-    game['phase'] = 'voting'
-    game['votes'] = {}
-    
     all_players = mafia_game.get_all_players(chat_id)
-    alive_players = {uid: pinfo for uid, pinfo in all_players.items() if pinfo['alive']}
+    alive_players = {uid: pinfo for uid, pinfo in all_players.items() if pinfo.alive}
     
-    # Відправка кнопок голосування
-    for user_id, player_info in alive_players.items():
-        if player_info['is_bot']:
-            continue
-        
-        keyboard = []
-        
-        # Додаємо всіх живих гравців
-        for target_id, target_info in alive_players.items():
-            if target_id != user_id:
-                keyboard.append([InlineKeyboardButton(
-                    f"👤 {target_info['username']}",
-                    callback_data=f"nominate_{chat_id}_{target_id}"
-                )])
-        
-        # Опція пропустити день
-        keyboard.append([InlineKeyboardButton(
-            "🚫 Пропустити день",
-            callback_data=f"nominate_{chat_id}_0"
-        )])
-        
+    async def send_nominations(user_id: int, markup: InlineKeyboardMarkup):
         try:
             await context.bot.send_message(
                 chat_id=user_id,
                 text="🗳 <b>ВИСУНЬТЕ КАНДИДАТА:</b>\n\n"
                      "Кого підозрюєте в мафії?",
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=markup,
                 parse_mode=ParseMode.HTML
             )
         except Exception as e:
             logger.error(f"Помилка відправки голосування {user_id}: {e}")
     
-    # Боти голосують
-    await process_bot_votes(context, chat_id)
+    # Усі живі гравці і опція пропустити день - одна клавіатура на фазу,
+    # кожен отримує її без кнопки на себе
+    keyboard = TargetKeyboard(game, NOMINATE, "👤",
+                              [(target_id, target_info.username) for target_id, target_info in alive_players.items()],
+                              [game_button("🚫 Пропустити день", game, NOMINATE, 0)])
+    await fan_out([send_nominations(user_id, keyboard.markup_for(user_id))
+                   for user_id, player_info in alive_players.items() if not player_info.is_bot])
     
-    # Таймер на 30 секунд
-    context.job_queue.run_once(check_nominations_complete, when=30, chat_id=chat_id, name=f"nomination_{chat_id}")
+    arm_phase_timer(chat_id, nominations_timeout, event['timeout'])
 
 
-async def vote_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def vote_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: Callback):
     """Обробка голосів"""
     query = update.callback_query
     await query.answer()
     
-    data = query.data.split('_')
-    action = data[0]  # nominate або votefor
-    chat_id = int(data[1])
-    target_id = int(data[2])
+    nominate = payload.action == NOMINATE  # інакше ЗА/ПРОТИ
+    chat_id = payload.chat_id
+    target_id = payload.target
     user_id = query.from_user.id
     
+    # Кнопка з минулого голосування або підсумки вже оголошені - нічого не робимо
     game = mafia_game.games.get(chat_id)
-    if not game or game['phase'] != 'voting':
+    expected_phase = 'voting' if nominate else 'final_voting'
+    if not game or game.phase != expected_phase or game.generation != payload.generation or \
+            (game.nominations_done if nominate else game.final_voting_done):
         await query.edit_message_text("⚠️ Голосування завершилось!")
         return
     
+    # Гравець цієї гри за індексом user_id -> гра (O(1), без обходу ігор)
+    player = mafia_game.player_in(chat_id, user_id)
+    if player is None or not player.alive:
+        await query.edit_message_text("⚠️ Ви не можете голосувати!")
+        return
+    
+    # Ціль з payload: підроблена кнопка або гравець, що вже вибув
+    if nominate and target_id != 0 and target_id not in game.alive_players:
+        await query.edit_message_text("⚠️ Недійсна ціль!")
+        return
+    
     all_players = mafia_game.get_all_players(chat_id)
+    # Підсумок - до ходу: останній голос закриває фазу
+    progress = move_progress(chat_id)
     
     # Висунення кандидата
-    if action == 'nominate':
-        game['votes'][user_id] = target_id
+    if nominate:
+        events = game_engine.nominate(chat_id, user_id, target_id)
         
         if target_id == 0:
             vote_text = "✅ <b>ВИ ПРОПУСТИЛИ ДЕНЬ</b>\n\n⏳ Чекаємо на інших..."
         else:
-            target_name = all_players[target_id]['username']
+            target_name = all_players[target_id].username
             vote_text = f"✅ <b>ВИ ВИСУНУЛИ:</b> {target_name}\n\n⏳ Чекаємо на інших..."
-        
-        await query.edit_message_text(vote_text, parse_mode=ParseMode.HTML)
-        
-        voter_name = game['players'][user_id]['username']
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text=f"🗳 <b>{voter_name}</b> проголосував!",
-            parse_mode=ParseMode.HTML
-        )
-        
-        await check_nominations_complete(context, chat_id)
     
     # Фінальне голосування ЗА/ПРОТИ
-    elif action == 'votefor':
-        vote = data[3]  # yes або no
-        game['vote_results'][user_id] = vote
-        
-        nominee_name = all_players[game['vote_nominee']]['username']
+    else:
+        vote = 'yes' if payload.arg == YES else 'no'
+        nominee_name = all_players[game.vote_nominee].username
+        events = game_engine.final_vote(chat_id, user_id, vote)
         
         if vote == 'yes':
             vote_text = f"✅ <b>ВИ ЗА ВИКЛЮЧЕННЯ</b>\n\n👤 {nominee_name}\n\n⏳ Чекаємо..."
         else:
             vote_text = f"✅ <b>ВИ ПРОТИ ВИКЛЮЧЕННЯ</b>\n\n👤 {nominee_name}\n\n⏳ Чекаємо..."
-        
-        await query.edit_message_text(vote_text, parse_mode=ParseMode.HTML)
-        
-        voter_name = game['players'][user_id]['username']
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text=f"🗳 <b>{voter_name}</b> проголосував!",
-            parse_mode=ParseMode.HTML
-        )
-        
-        await check_final_voting_complete(context, chat_id)
+    
+    await query.edit_message_text(vote_text, parse_mode=ParseMode.HTML)
+    
+    voter_name = all_players[user_id].username
+    await announce_move(context, chat_id, progress, voter_name, f"🗳 <b>{voter_name}</b> проголосував!")
+    
+    await render(context, chat_id, events)
 
 
-async def check_nominations_complete(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Перевірка завершення висунення"""
-    game = mafia_game.games[chat_id]
+async def nominations_timeout(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    """Таймер висунення кандидатів: підсумки з тими голосами, що є"""
+    await render(context, chat_id, game_engine.close_nominations(chat_id))
+
+
+async def night_start_job(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    """Відкладений початок ночі після підсумків голосування"""
+    if chat_id not in mafia_game.games:
+        return
     
-    all_players = mafia_game.get_all_players(chat_id)
-    alive_count = sum(1 for p in all_players.values() if p['alive'])
-    
-    if len(game['votes']) >= alive_count:
-        # Підрахунок
-        nominations = defaultdict(int)
-        for nominated in game['votes'].values():
-            if nominated != 0:
-                nominations[nominated] += 1
-        
-        if not nominations:
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text="🚫 <b>ДЕНЬ ПРОПУЩЕНО!</b>\n\nНіхто не висунутий. Настає ніч...",
-                parse_mode=ParseMode.HTML
-            )
-            await asyncio.sleep(2)
-            await start_night(context, chat_id)
-            return
-        
-        # Знаходимо переможця
-        max_votes = max(nominations.values())
-        candidates = [uid for uid, votes in nominations.items() if votes == max_votes]
-        
-        if len(candidates) > 1:
-            # Нічия - нікого не виключаємо
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text="🤝 <b>НІЧИЯ!</b>\n\nНіхто не має більшості. Настає ніч...",
-                parse_mode=ParseMode.HTML
-            )
-            await asyncio.sleep(2)
-            await start_night(context, chat_id)
-            return
-        
-        nominee_id = candidates[0]
-        game['vote_nominee'] = nominee_id
-        
-        nominee_name = all_players[nominee_id]['username']
-        
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text=f"🎯 <b>ВИСУВАЄМО НА ВИКЛЮЧЕННЯ:</b>\n\n"
-                 f"👤 <b>{nominee_name}</b>\n\n"
-                 f"🗳 Голосуємо ЗА або ПРОТИ виключення:",
-            parse_mode=ParseMode.HTML
-        )
-        
-        await start_final_voting(context, chat_id)
+    await start_night(context, chat_id)
+
+
+async def render_night_scheduled(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    # Ніч настає через delay секунд, хендлер не чекає (замінює таймер голосування)
+    arm_phase_timer(chat_id, night_start_job, event['delay'])
+
+
+async def render_nominations_closed(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    outcome = event['outcome']
+    if outcome == 'skipped':
+        text = "🚫 <b>ДЕНЬ ПРОПУЩЕНО!</b>\n\nНіхто не висунутий. Настає ніч..."
+    elif outcome == 'tie':
+        text = "🤝 <b>НІЧИЯ!</b>\n\nНіхто не має більшості. Настає ніч..."
+    else:
+        text = (f"🎯 <b>ВИСУВАЄМО НА ВИКЛЮЧЕННЯ:</b>\n\n"
+                f"👤 <b>{event['nominee'].username}</b>\n\n"
+                f"🗳 Голосуємо ЗА або ПРОТИ виключення:")
+    await context.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.HTML)
 
 
 async def start_final_voting(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
     """Фінальне голосування ЗА/ПРОТИ"""
+    await render(context, chat_id, game_engine.start_final_voting(chat_id))
+
+
+async def render_final_voting_started(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
     game = mafia_game.games[chat_id]
-    game['phase'] = 'final_voting'
-    game['vote_results'] = {}
+    nominee = event['nominee']
     
-    all_players = mafia_game.get_all_players(chat_id)
-    alive_players = {uid: pinfo for uid, pinfo in all_players.items() if pinfo['alive']}
+    # Клавіатура однакова для всіх гравців
+    keyboard = InlineKeyboardMarkup([
+        [game_button("✅ ЗА виключення", game, VOTE_FOR, nominee.id, YES)],
+        [game_button("❌ ПРОТИ виключення", game, VOTE_FOR, nominee.id, NO)]
+    ])
     
-    nominee_name = all_players[game['vote_nominee']]['username']
-    
-    # Відправка кнопок фінального голосування
-    for user_id, player_info in alive_players.items():
-        if player_info['is_bot']:
-            continue
-        
-        keyboard = [
-            [InlineKeyboardButton("✅ ЗА виключення", callback_data=f"votefor_{chat_id}_{game['vote_nominee']}_yes")],
-            [InlineKeyboardButton("❌ ПРОТИ виключення", callback_data=f"votefor_{chat_id}_{game['vote_nominee']}_no")]
-        ]
-        
+    async def send_final_vote(user_id: int):
         try:
             await context.bot.send_message(
                 chat_id=user_id,
                 text=f"🗳 <b>ФІНАЛЬНЕ ГОЛОСУВАННЯ:</b>\n\n"
-                     f"👤 Кандидат: <b>{nominee_name}</b>\n\n"
+                     f"👤 Кандидат: <b>{nominee.username}</b>\n\n"
                      f"Ваше рішення:",
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=keyboard,
                 parse_mode=ParseMode.HTML
             )
         except Exception as e:
             logger.error(f"Помилка фінального голосування {user_id}: {e}")
     
-    # Боти голосують
-    await process_bot_final_votes(context, chat_id)
+    # Відправка кнопок фінального голосування
+    await fan_out([send_final_vote(user_id) for user_id in game.alive_humans])
     
-    # Таймер на 30 секунд
-    context.job_queue.run_once(check_final_voting_complete, when=30, chat_id=chat_id, name=f"final_vote_{chat_id}")
+    arm_phase_timer(chat_id, final_voting_timeout, event['timeout'])
 
 
-async def check_final_voting_complete(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Перевірка завершення фінального голосування"""
-    game = mafia_game.games[chat_id]
-    
-    all_players = mafia_game.get_all_players(chat_id)
-    alive_count = sum(1 for p in all_players.values() if p['alive'])
-    
-    # ВИПРАВЛЕННЯ: Додано перевірку наявності голосів і правильну логіку завершення
-    if len(game['vote_results']) >= alive_count and not game.get('final_voting_done'):
-        await process_final_voting(context, chat_id)
+async def final_voting_timeout(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    """Таймер фінального голосування: підсумки з тими голосами, що є"""
+    await render(context, chat_id, game_engine.close_final_voting(chat_id))
 
 
-async def process_final_voting(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Обробка фінального голосування"""
-    game = mafia_game.games[chat_id]
-    
-    # ВИПРАВЛЕННЯ: Додано перевірку щоб не обробляти два рази
-    if game.get('final_voting_done'):
-        return
-    game['final_voting_done'] = True
-    
-    yes_votes = sum(1 for v in game['vote_results'].values() if v == 'yes')
-    no_votes = sum(1 for v in game['vote_results'].values() if v == 'no')
-    total_votes = yes_votes + no_votes
+async def render_verdict(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    """Результати фінального голосування"""
+    nominee = event['nominee']
     
-    nominee_id = game['vote_nominee']
-    nominee_name = mafia_game.get_all_players(chat_id)[nominee_id]['username']
-    
-    if yes_votes > no_votes:
-        # Виключення
-        all_players = mafia_game.get_all_players(chat_id)
-        all_players[nominee_id]['alive'] = False
-        game['alive_players'].discard(nominee_id)
-        
-        nominee_role = mafia_game.get_role_info(all_players[nominee_id]['role'])
+    if event['eliminated']:
+        nominee_role = mafia_game.get_role_info(nominee.role)
         
         result_text = f"""
 ⚖️ <b>РЕЗУЛЬТАТИ ГОЛОСУВАННЯ:</b>
 
-👤 <b>{nominee_name}</b> ВИКЛЮЧЕНО!
+👤 <b>{nominee.username}</b> ВИКЛЮЧЕНО!
 🎭 Роль: {nominee_role['emoji']} {nominee_role['full_name']}
 
-📊 Голоси: {yes_votes} ЗА, {no_votes} ПРОТИ
+📊 Голоси: {event['yes']} ЗА, {event['no']} ПРОТИ
 """
         
         await send_gif(context, chat_id, 'death', result_text)
-        
-        # Перевірка перемоги
-        if await check_victory(context, chat_id):
-            return
-            
     else:
-        # Не виключено
         result_text = f"""
 ⚖️ <b>РЕЗУЛЬТАТИ ГОЛОСУВАННЯ:</b>
 
-👤 <b>{nominee_name}</b> ЗАЛИШАЄТЬСЯ!
+👤 <b>{nominee.username}</b> ЗАЛИШАЄТЬСЯ!
 
-📊 Голоси: {yes_votes} ЗА, {no_votes} ПРОТИ
+📊 Голоси: {event['yes']} ЗА, {event['no']} ПРОТИ
 """
         
         await context.bot.send_message(
@@ -1291,39 +1378,49 @@ async def process_final_voting(context: ContextTypes.DEFAULT_TYPE, chat_id: int)
             text=result_text,
             parse_mode=ParseMode.HTML
         )
-    
-    await asyncio.sleep(3)
-    await start_night(context, chat_id)
 
 
 # ============================================
 # НІЧНІ ДІЇ ГРАВЦІВ
 # ============================================
 
-async def night_action_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+# Дія кнопки: нічна дія ролі (як action у ROLES)
+NIGHT_ACTIONS = {NIGHT_KILL: 'kill', NIGHT_HEAL: 'heal', NIGHT_CHECK: 'check'}
+
+
+async def night_action_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: Callback):
     """Обробка нічних дій гравців"""
     query = update.callback_query
     await query.answer()
     
-    data = query.data.split('_')
-    action = data[1]  # kill, heal, check
-    target_id = int(data[2])
+    action = NIGHT_ACTIONS[payload.action]  # kill, heal, check
+    # Кнопки приходять в особистих, тому чат гри береться з payload
+    chat_id = payload.chat_id
+    target_id = payload.target
     user_id = query.from_user.id
-    chat_id = query.message.chat_id
     
     game = mafia_game.games.get(chat_id)
-    if not game or game['phase'] != 'night':
+    if not game or game.phase != 'night' or game.generation != payload.generation or game.night_resolved:
         await query.edit_message_text("⚠️ Ніч вже закінчилась!")
         return
     
-    # Зберігаємо дію
-    game['night_actions'][user_id] = {
-        'action': action,
-        'target': target_id
-    }
+    player = mafia_game.player_in(chat_id, user_id)
+    if player is None or not player.alive or mafia_game.get_role_info(player.role).get('action') != action:
+        await query.edit_message_text("⚠️ Ви не можете діяти цієї ночі!")
+        return
     
+    # Ціль з payload: підроблена кнопка або гравець, що вже вибув
+    if target_id not in game.alive_players:
+        await query.edit_message_text("⚠️ Недійсна ціль!")
+        return
+    
+    # Зберігаємо дію (якщо всі походили - рушій одразу підбиває ніч)
     all_players = mafia_game.get_all_players(chat_id)
-    target_name = all_players[target_id]['username']
+    user_name = all_players[user_id].username
+    target_name = all_players[target_id].username
+    # Підсумок - до ходу: останній хід закриває ніч
+    progress = move_progress(chat_id)
+    events = game_engine.night_action(chat_id, user_id, action, target_id)
     
     action_text = {
         'kill': f"🔪 Ви обрали жертву: {target_name}",
@@ -1337,60 +1434,18 @@ async def night_action_callback(update: Update, context: ContextTypes.DEFAULT_TY
     )
     
     # Повідомлення в чат (без розкриття ролі)
-    user_name = game['players'][user_id]['username']
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text=f"🤖 <b>{user_name}</b> зробив свій вибір...",
-        parse_mode=ParseMode.HTML
-    )
-    
-    await check_night_complete(context, chat_id)
-
-
-async def check_night_complete(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Перевірка чи всі зробили нічні дії"""
-    game = mafia_game.games[chat_id]
+    await announce_move(context, chat_id, progress, user_name, f"🤖 <b>{user_name}</b> зробив свій вибір...")
     
-    all_players = mafia_game.get_all_players(chat_id)
-    alive_humans = [uid for uid, pinfo in all_players.items() 
-                   if pinfo['alive'] and not pinfo['is_bot']]
-    
-    # Перевіряємо чи всі живі люди зробили дії
-    humans_with_actions = [uid for uid in alive_humans 
-                          if uid in game['night_actions']]
-    
-    if len(humans_with_actions) >= len(alive_humans):
-        # Всі зробили дії - можна завершувати ніч
-        if not game.get('night_resolved', False):
-            game['night_resolved'] = True
-            
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text="✅ <b>УСІ ЗРОБИЛИ ВИБІР!</b>\n\n📊 Обробляємо результати...",
-                parse_mode=ParseMode.HTML
-            )
-            
-            await process_night(context, chat_id)
+    await render(context, chat_id, events)
 
 
 # ============================================
-# ПЕРЕВІРКА ПЕРЕМОГИ
+# ПЕРЕМОГА
 # ============================================
 
-async def check_victory(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> bool:
-    """Перевірка умов перемоги"""
-    game = mafia_game.games[chat_id]
-    all_players = mafia_game.get_all_players(chat_id)
-    
-    alive_players = {uid: pinfo for uid, pinfo in all_players.items() if pinfo['alive']}
-    
-    mafia_alive = [uid for uid, pinfo in alive_players.items() 
-                  if mafia_game.get_role_info(pinfo['role'])['team'] == 'mafia']
-    citizens_alive = [uid for uid, pinfo in alive_players.items() 
-                     if mafia_game.get_role_info(pinfo['role'])['team'] == 'citizens']
-    
-    if not mafia_alive:
-        # Перемога мирних
+async def render_victory(context: ContextTypes.DEFAULT_TYPE, chat_id: int, event: Event):
+    """Оголошення переможця (гру рушій вже завершив)"""
+    if event['winner'] == 'citizens':
         victory_text = """
 🎉 <b>ПЕРЕМОГА МИРНИХ!</b> 🎉
 
@@ -1399,12 +1454,7 @@ async def check_victory(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> boo
 
 👏 Дякую за гру!
 """
-        await send_gif(context, chat_id, 'victory', victory_text)
-        mafia_game.end_game(chat_id)
-        return True
-    
-    elif len(mafia_alive) >= len(citizens_alive):
-        # Перемога мафії
+    else:
         victory_text = """
 😈 <b>ПЕРЕМОГА МАФІЇ!</b> 😈
 
@@ -1413,46 +1463,73 @@ async def check_victory(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> boo
 
 👏 Дякую за гру!
 """
-        await send_gif(context, chat_id, 'victory', victory_text)
-        mafia_game.end_game(chat_id)
-        return True
-    
-    return False
+    phase_timers.cancel(chat_id)
+    cancel_delayed(chat_id)
+    phase_clock.finish(chat_id)
+    drop_progress(chat_id)
+    await send_gif(context, chat_id, 'victory', victory_text)
+
+
+# Тип події рушія: відображення в Telegram
+EVENT_RENDERERS = {
+    'roles_assigned': render_roles_assigned,
+    'night_started': render_night_started,
+    'bots_acted': render_bots_acted,
+    'night_ended': render_night_ended,
+    'detective_result': render_detective_result,
+    'morning': render_morning,
+    'discussion_started': render_discussion_started,
+    'discussion_ended': render_discussion_ended,
+    'voting_started': render_voting_started,
+    'nominations_closed': render_nominations_closed,
+    'final_voting_started': render_final_voting_started,
+    'verdict': render_verdict,
+    'night_scheduled': render_night_scheduled,
+    'victory': render_victory,
+}
 
 
 # ============================================
 # СПЕЦІАЛЬНІ ПОДІЇ - КАРТОПЛЯ
 # ============================================
 
-async def potato_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def potato_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: Callback):
     """Обробка кидка картоплі"""
     query = update.callback_query
     await query.answer()
     
-    data = query.data.split('_')
-    target_id = int(data[2])
+    # Кнопка в особистих, чат гри - з payload
+    chat_id = payload.chat_id
+    target_id = payload.target
     user_id = query.from_user.id
-    chat_id = query.message.chat_id
     
     game = mafia_game.games.get(chat_id)
-    if not game or game['phase'] != 'night':
+    if not game or game.phase != 'night':
         await query.edit_message_text("⚠️ Зараз не можна кидати картоплю!")
         return
     
-    if game['special_event'] != 'bukovel':
+    player = mafia_game.player_in(chat_id, user_id)
+    if player is None or not player.alive:
+        await query.edit_message_text("⚠️ Ви не можете кидати картоплю!")
+        return
+    
+    if game.special_event != 'bukovel':
         await query.edit_message_text("⚠️ Зараз немає картоплі!")
         return
     
+    # Ціль з payload: підроблена кнопка або гравець, що вже вибув
+    if target_id == user_id or target_id not in game.alive_players:
+        await query.edit_message_text("⚠️ Недійсна ціль!")
+        return
+    
     all_players = mafia_game.get_all_players(chat_id)
     
-    if user_id not in all_players or not all_players[user_id]['alive']:
+    # Зберігаємо кидок (предмет одноразовий)
+    if not mafia_game.use_potato(chat_id, user_id, target_id):
         await query.edit_message_text("⚠️ Ви не можете кидати картоплю!")
         return
     
-    # Зберігаємо кидок
-    game['potato_throws'][user_id] = target_id
-    
-    target_name = all_players[target_id]['username']
+    target_name = all_players[target_id].username
     
     # ВИПРАВЛЕННЯ: Прибрано розкриття ролі бота
     await query.edit_message_text(
@@ -1466,14 +1543,167 @@ async def potato_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await context.bot.send_message(
         chat_id=chat_id,
         text="🥔 <i>Десь у темряві пролетіла картопля...</i>",
-        parse_mode=ParseMode.HTML
+        parse_mode=ParseMode.HTML,
+        rate_limit_args=FLAVOR_MESSAGE
     )
 
 
+# ============================================
+# ВІДНОВЛЕННЯ ПІСЛЯ РЕСТАРТУ
+# ============================================
+
+# Фаза: обробник таймера
+PHASE_TIMERS = {
+    'night': night_timeout,
+    'discussion': discussion_timeout,
+    'voting': nominations_timeout,
+    'final_voting': final_voting_timeout,
+}
+
+
+def _phase_timer_dispatch(application: Application):
+    """Виконання таймера фази під lock гри; таймер минулої фази - no-op"""
+    async def dispatch(timer: PhaseTimer):
+        async with game_lock(timer.chat_id):
+            game = mafia_game.games.get(timer.chat_id)
+            if game is None or game.generation != timer.generation:
+                return
+            context = CallbackContext(application, chat_id=timer.chat_id)
+            await timer.callback(context, timer.chat_id)
+    return dispatch
+
+
+def register_game_metrics(application: Application):
+    """Gauge і лічильники модулів, що рахуються під час запиту /metrics"""
+    def players():
+        counts = {'human': 0, 'bot': 0}
+        for game in mafia_game.games.values():
+            counts['human'] += len(game.players)
+            counts['bot'] += len(game.bots)
+        return counts
+    
+    def edits():
+        return {(kind, key): value
+                for kind, source in (('lobby', lobby_edits), ('progress', progress_edits))
+                for key, value in source.stats.items()}
+    
+    Collected('mafia_games', 'Active games by phase.',
+              lambda: Counter(game.phase for game in mafia_game.games.values()), ('phase',))
+    Collected('mafia_players', 'Players in active games.', players, ('kind',))
+    Collected('mafia_delayed_actions', 'Pending delayed phase actions (bot announcements).',
+              lambda: sum(len(tasks) for tasks in _delayed.values()))
+    Collected('mafia_phase_timers', 'Armed phase timers.', lambda: len(phase_timers))
+    Collected('mafia_phase_timer_events_total', 'Phase timer events.', lambda: dict(phase_timers.stats),
+              ('event',), kind='counter')
+    Collected('mafia_outbound_total', 'Outbound scheduler events.', lambda: dict(outbound.stats),
+              ('event',), kind='counter')
+    Collected('mafia_outbound_queue_depth', 'Bot API calls waiting in the outbound queue, by priority lane.',
+              lambda: dict(zip(LANES, outbound.waiting)), ('lane',))
+    Collected('mafia_games_evicted_total', 'Abandoned games closed by the sweeper, by reason.',
+              lambda: {reason: game_sweeper.stats[reason] for reason in (IDLE, LOBBY_CAP)},
+              ('reason',), kind='counter')
+    Collected('mafia_open_lobbies', 'Games still in registration.', lambda: len(mafia_game.lobbies))
+    Collected('mafia_callback_rejects_total', 'Button presses rejected before touching game state.',
+              lambda: dict(callback_rejects), ('reason',), kind='counter')
+    Collected('mafia_lobby_renders_total', 'Lobby renders served from cache (hit) or rebuilt (miss).',
+              lambda: {result: lobby_renders.stats[result] for result in ('hit', 'miss')},
+              ('result',), kind='counter')
+    Collected('mafia_message_edits_total', 'Coalesced message edits by message kind and event.', edits,
+              ('kind', 'event'), kind='counter')
+    Collected('mafia_event_log_total', 'Game event log: events, blocks, bytes and flushes written.',
+              lambda: dict(mafia_game.events.stats) if mafia_game.events is not None else {},
+              ('event',), kind='counter')
+
+
+async def restore_game_timers(application: Application):
+    """Запуск таймерів фаз і їх відновлення для ігор після рестарту"""
+    phase_timers.start(_phase_timer_dispatch(application))
+    
+    now = game_clock.wall()
+    for chat_id, game in mafia_game.games.items():
+        # Підсумки вже оголошені, але ніч не встигла початись до рестарту
+        if (game.phase == 'voting' and game.nominations_done) or \
+                (game.phase == 'final_voting' and game.final_voting_done):
+            phase_timers.arm(chat_id, night_start_job, 1.0, game.generation)
+            logger.info(f"⏱️ Початок ночі відновлено для чату {chat_id}")
+            continue
+        
+        callback = PHASE_TIMERS.get(game.phase)
+        if not callback or game.phase_deadline is None:
+            continue
+        
+        delay = game.phase_deadline - now
+        if game.phase == 'discussion' and game_engine.adaptive and delay > 0:
+            # Тишу до рестарту не знаємо - рахуємо від відновлення
+            _chat_activity[chat_id] = now
+            delay = discussion_left(game)
+        phase_timers.arm(chat_id, callback, max(1.0, delay), game.generation)
+        logger.info(f"⏱️ Таймер фази {game.phase} відновлено для чату {chat_id}")
+
+
+EVICTION_NOTICES = {
+    IDLE: "⌛ <b>Гру закрито через неактивність.</b>",
+    LOBBY_CAP: "⌛ <b>Реєстрацію закрито:</b> забагато відкритих ігор.",
+}
+
+
+def _evict_game(application: Application):
+    """Закриття покинутої гри для sweeper: те ж прибирання, що й /endgame, і повідомлення в чат"""
+    async def evict(chat_id: int, reason: str) -> bool:
+        async with game_lock(chat_id):
+            if not game_sweeper.due(chat_id, reason):
+                return False
+            message_id = mafia_game.game_messages.get(chat_id)
+            close_game(chat_id)
+        logger.info(f"🧹 Гру в чаті {chat_id} закрито ({reason})")
+        # Повідомлення - у фоні, щоб обхід не чекав на ліміти Telegram
+        application.create_task(_notify_evicted(application, chat_id, message_id, reason))
+        return True
+    return evict
+
+
+async def _notify_evicted(application: Application, chat_id: int, message_id: Optional[int], reason: str):
+    text = EVICTION_NOTICES[reason] + "\n\nСтворіть нову гру командою /newgame"
+    try:
+        if message_id is not None:
+            # Кнопки лобі більше нічого не роблять - прибираємо їх разом з текстом
+            await application.bot.edit_message_text(chat_id=chat_id, message_id=message_id,
+                                                    text=text, parse_mode=ParseMode.HTML)
+        else:
+            await application.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.HTML)
+    except Exception as e:
+        logger.error(f"Помилка повідомлення про закриття гри: {e}")
+
+
+def start_game_sweeper(application: Application):
+    """Періодичне прибирання покинутих ігор і дописування логу подій"""
+    game_sweeper.start(_evict_game(application))
+    if mafia_game.events is not None:
+        mafia_game.events.start()
+
+
+async def stop_game_timers(application: Application):
+    """Зупинка обслуговування таймерів фаз і прибирання ігор"""
+    await phase_timers.stop()
+    await game_sweeper.stop()
+    for chat_id in list(_delayed):
+        cancel_delayed(chat_id)
+    logger.info(f"🧹 Прибирання ігор: {dict(game_sweeper.stats)}")
+    if mafia_game.events is not None:
+        await mafia_game.events.stop()
+        logger.info(f"📼 Лог подій: {dict(mafia_game.events.stats)}")
+    logger.info(f"✏️ Редагування лобі: {dict(lobby_edits.stats)}, зекономлено {lobby_edits.saved}")
+    logger.info(f"✏️ Підсумки ходів: {dict(progress_edits.stats)}, зекономлено {progress_edits.saved}")
+
+
 # ============================================
 # РЕЄСТРАЦІЯ ОБРОБНИКІВ
 # ============================================
 
+# Бот обробляє лише повідомлення та натискання кнопок
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+
 def setup_handlers(application: Application):
     """Реєстрація всіх обробників"""
     
@@ -1482,32 +1712,24 @@ def setup_handlers(application: Application):
     application.add_handler(CommandHandler("newgame", newgame))
     application.add_handler(CommandHandler("endgame", endgame))
     application.add_handler(CommandHandler("status", status))
+    application.add_handler(CommandHandler("votemode", votemode))
+    application.add_handler(CommandHandler("timers", timers))
     
-    # Колбеки
-    application.add_handler(CallbackQueryHandler(join_game_callback, pattern="^join_game$"))
-    application.add_handler(CallbackQueryHandler(add_bots_menu_callback, pattern="^add_bots_menu$"))
-    application.add_handler(CallbackQueryHandler(add_bots_callback, pattern="^add_bots_"))
-    application.add_handler(CallbackQueryHandler(leave_game_callback, pattern="^leave_game$"))
-    application.add_handler(CallbackQueryHandler(start_game_callback, pattern="^start_game$"))
-    application.add_handler(CallbackQueryHandler(back_to_game_callback, pattern="^back_to_game$"))
-    
-    # Нічні дії
-    application.add_handler(CallbackQueryHandler(night_action_callback, pattern="^night_(kill|heal|check)_"))
-    application.add_handler(CallbackQueryHandler(vote_callback, pattern="^(nominate|votefor)_"))
-    
-    # Картопля
-    application.add_handler(CallbackQueryHandler(potato_callback, pattern="^potato_"))
+    # Усі кнопки - один маршрутизатор за payload у callback_data (callbacks.py)
+    application.add_handler(CallbackQueryHandler(route_callback))
     
-    # Блокування повідомлень від мертвих
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, check_dead_player_message))
+    # Блокування повідомлень від мертвих (дешевий пре-фільтр перевіряється першим)
+    application.add_handler(MessageHandler(DEAD_PLAYER & filters.TEXT & ~filters.COMMAND, check_dead_player_message))
+    # Активність в обговоренні - окрема група, щоб бачити й повідомлення, оброблені вище
+    application.add_handler(MessageHandler(DISCUSSION & ~filters.COMMAND, note_chat_activity), group=1)
 
 
-async def back_to_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def back_to_game_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: Callback):
     """Повернення до головного меню"""
     query = update.callback_query
     await query.answer()
     
-    chat_id = query.message.chat_id
+    chat_id = payload.chat_id
     
     if chat_id in mafia_game.games:
         await update_game_message(context, chat_id)
@@ -1515,6 +1737,72 @@ async def back_to_game_callback(update: Update, context: ContextTypes.DEFAULT_TY
         await query.edit_message_text("🎮 <b>ГРА: МАФІЯ</b> 🎮\n\nГру завершено!")
 
 
+# ============================================
+# МАРШРУТИЗАЦІЯ КНОПОК
+# ============================================
+
+class Route(NamedTuple):
+    """Обробник дії кнопки і правила відсіву застарілих натискань"""
+    handler: Callable
+    phase_bound: bool = False  # кнопка дійсна лише у фазі, в якій її надіслали
+    stale_text: Optional[str] = None  # замінює повідомлення із застарілою кнопкою (особисті)
+
+
+def _route(handler, phase_bound: bool = False, stale_text: Optional[str] = None) -> Route:
+    # Метрики хендлерів - під власними іменами, як коли кожен мав свій CallbackQueryHandler
+    return Route(instrumented(handler), phase_bound, stale_text)
+
+
+CALLBACK_ROUTES: Dict[int, Route] = {
+    JOIN: _route(join_game_callback),
+    ADD_BOTS_MENU: _route(add_bots_menu_callback),
+    ADD_BOTS: _route(add_bots_callback),
+    LEAVE: _route(leave_game_callback),
+    START: _route(start_game_callback),
+    BACK_TO_GAME: _route(back_to_game_callback),
+    NIGHT_KILL: _route(night_action_callback, True, "⚠️ Ніч вже закінчилась!"),
+    NIGHT_HEAL: _route(night_action_callback, True, "⚠️ Ніч вже закінчилась!"),
+    NIGHT_CHECK: _route(night_action_callback, True, "⚠️ Ніч вже закінчилась!"),
+    NOMINATE: _route(vote_callback, True, "⚠️ Голосування завершилось!"),
+    VOTE_FOR: _route(vote_callback, True, "⚠️ Голосування завершилось!"),
+    POTATO: _route(potato_callback, True, "⚠️ Зараз не можна кидати картоплю!"),
+}
+
+# malformed, unrouted, stale - натискання, відкинуті до стану гри
+callback_rejects: Counter = Counter()
+
+
+async def route_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Єдиний хендлер кнопок: розбір payload, відсів застарілих, виклик за таблицею під lock гри"""
+    query = update.callback_query
+    payload = decode(query.data)
+    if payload is None:
+        # Кнопка старого формату або пошкоджені дані
+        callback_rejects['malformed'] += 1
+        await query.answer("⚠️ Ця кнопка більше не працює", show_alert=True)
+        return
+    
+    route = CALLBACK_ROUTES.get(payload.action)
+    if route is None:
+        callback_rejects['unrouted'] += 1
+        await query.answer("⚠️ Ця дія поки недоступна", show_alert=True)
+        return
+    
+    game = mafia_game.games.get(payload.chat_id)
+    if game is None or game.token != payload.token or \
+            (route.phase_bound and game.generation != payload.generation):
+        callback_rejects['stale'] += 1
+        if route.stale_text:
+            await query.answer()
+            await query.edit_message_text(route.stale_text)
+        else:
+            await query.answer("⚠️ Гра не знайдена!", show_alert=True)
+        return
+    
+    async with game_lock(payload.chat_id):
+        await route.handler(update, context, payload)
+
+
 # ============================================
 # ГОЛОВНА ФУНКЦІЯ
 # ============================================
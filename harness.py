@@ -0,0 +1,258 @@
+"""In-process game harness: real handlers, an in-memory Bot API and a virtual clock.
+
+Бот збирається як у main.py (ті самі хендлери, outbound, таймери фаз і
+прибирання ігор), але запити до Bot API обробляє FakeTelegram у тому ж
+циклі подій, без HTTP, а game_clock - віртуальний. Гравці-люди
+натискають кнопки, які бот надіслав їм в особисті; решту роблять боти і
+таймери фаз. Ніч на 45 с і паузи оголошень ботів минають миттєво, тож
+повна гра на кілька днів проходить за мілісекунди.
+
+Гра відтворюється за seed: токени ігор, рішення ботів і натискання
+людей беруться з засіяних генераторів.
+
+Запуск (код виходу 1 - не всі ігри завершились або були помилки в лозі;
+--events - записати лог подій ігор для replay.py):
+    python harness.py --games 20 --players 5 --bots 5 --seed 1 [--events DIR]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import BaseRequest, RequestData
+
+from callbacks import ADD_BOTS, JOIN, SHOOT_MENU, START, decode, encode
+from clock import VirtualClock, game_clock
+from engine import game_engine
+from eventlog import EventLog
+from fake_telegram import FakeTelegram, callback_update, command_update
+from game_state import mafia_game
+from handlers import restore_game_timers, setup_handlers, start_game_sweeper, stop_game_timers
+from media_cache import media_cache
+from outbound import OutboundScheduler
+
+logger = logging.getLogger(__name__)
+
+# Тексти перемоги (render_victory): переможець
+WINNERS = {'ПЕРЕМОГА МИРНИХ': 'citizens', 'ПЕРЕМОГА МАФІЇ': 'mafia'}
+
+# Найдовша гра у віртуальному часі, сек
+GAME_LIMIT = 4 * 3600
+
+
+class InProcessRequest(BaseRequest):
+    """Запити бота без мережі: метод Bot API виконує FakeTelegram"""
+
+    def __init__(self, server: FakeTelegram):
+        self.server = server
+        self.texts: List[Tuple[int, str]] = []  # (chat_id, текст або підпис) усіх повідомлень бота
+
+    async def initialize(self):
+        """Нічого не потрібно"""
+
+    async def shutdown(self):
+        """Нічого не потрібно"""
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data is not None else {}
+        self.server.calls[api_method] += 1
+        try:
+            result = await self.server.call(api_method, params)
+        except LookupError:
+            return 404, b'{"ok": false, "error_code": 404, "description": "Not Found"}'
+        text = params.get('text') or params.get('caption')
+        if text and 'chat_id' in params:
+            self.texts.append((int(params['chat_id']), text))
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+class ErrorCounter(logging.Handler):
+    """Лічильник записів логу рівня ERROR і вище"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.records: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(self.format(record))
+
+
+class GameHarness:
+    """Бот з реальними хендлерами у віртуальному часі"""
+
+    # Скільки віртуальних секунд людина думає перед натисканням
+    REACTION = 1.0
+
+    def __init__(self, seed: int = 1, event_dir: Optional[str] = None):
+        self.seed = seed
+        self.events = EventLog(event_dir) if event_dir is not None else None  # лог подій ігор
+        self.rng = random.Random(seed)  # натискання людей
+        self.server = FakeTelegram()
+        self.request = InProcessRequest(self.server)
+        self.clock = VirtualClock()
+        self.errors = ErrorCounter()
+        self.application: Optional[Application] = None
+        self.days: Dict[int, int] = {}  # chat_id: останній день гри
+        self._previous_clock = None
+        self._previous_events = None
+        self._media_dir: Optional[tempfile.TemporaryDirectory] = None
+
+    async def __aenter__(self) -> 'GameHarness':
+        assert not mafia_game.games, "harness потребує порожнього MafiaGame"
+        # Годинник - до створення outbound: його bucket-и пам'ятають час
+        self._previous_clock = game_clock.use(self.clock)
+        random.seed(self.seed)
+        game_engine.rng.seed(self.seed)
+        # file_id GIF-ів фейкового сервера не повинні потрапити в справжній кеш
+        self._media_dir = tempfile.TemporaryDirectory()
+        media_cache.path = os.path.join(self._media_dir.name, 'media_cache.json')
+        media_cache.entries = {}
+        media_cache.load()
+        logging.getLogger().addHandler(self.errors)
+        self._previous_events = mafia_game.events
+        if self.events is not None:
+            mafia_game.attach_event_log(self.events)
+
+        self.application = (
+            Application.builder()
+            .token('1:harness')
+            .request(self.request)
+            .get_updates_request(self.request)
+            .rate_limiter(OutboundScheduler())
+            .concurrent_updates(True)
+            .job_queue(None)
+            .build()
+        )
+        setup_handlers(self.application)
+        await self.application.initialize()
+        await self.application.start()
+        await restore_game_timers(self.application)
+        start_game_sweeper(self.application)
+        return self
+
+    async def __aexit__(self, *exc):
+        await stop_game_timers(self.application)
+        await self.application.stop()
+        await self.application.shutdown()
+        mafia_game.attach_event_log(self._previous_events)
+        logging.getLogger().removeHandler(self.errors)
+        game_clock.use(self._previous_clock)
+        self._media_dir.cleanup()
+
+    async def send(self, update: dict):
+        """Оновлення через ті самі хендлери, що й у polling/webhook"""
+        await self.application.process_update(Update.de_json(update, self.application.bot))
+
+    def _lobby(self, chat_id: int):
+        """Повідомлення з реєстрацією і payload кнопки ПРИЄДНАТИСЯ"""
+        found = [(message_id, payload)
+                 for message_id, buttons in self.server.keyboards.get(chat_id, {}).items()
+                 for payload in map(decode, buttons) if payload is not None and payload.action == JOIN]
+        return max(found) if found else None
+
+    async def _press_buttons(self, user_ids: List[int]) -> int:
+        """Кожен гравець натискає випадкову кнопку в кожному своєму повідомленні"""
+        pressed = 0
+        keyboards = self.server.keyboards
+        for user_id in user_ids:
+            for message_id, buttons in list(keyboards.get(user_id, {}).items()):
+                keyboards[user_id].pop(message_id, None)
+                # Меню пострілу детектива ще не реалізоване - його не тиснемо
+                buttons = [data for data in buttons if decode(data).action != SHOOT_MENU]
+                if buttons:
+                    await self.send(callback_update(user_id, message_id, user_id, self.rng.choice(buttons)))
+                    pressed += 1
+        return pressed
+
+    async def play(self, chat_id: int, players: int = 5, bots: int = 5) -> bool:
+        """Повна гра в групі chat_id; False - гра не завершилась за GAME_LIMIT"""
+        user_ids = [abs(chat_id) * 100 + i for i in range(1, players + 1)]
+        await self.send(command_update(chat_id, user_ids[0], '/newgame'))
+        lobby = self._lobby(chat_id)
+        if lobby is None:
+            return False
+        message_id, join = lobby
+        for user_id in user_ids:
+            await self.send(callback_update(chat_id, message_id, user_id, encode(*join)))
+        if bots:
+            await self.send(callback_update(chat_id, message_id, user_ids[0],
+                                            encode(ADD_BOTS, chat_id, join.token, arg=bots)))
+        await self.send(callback_update(chat_id, message_id, user_ids[0], encode(START, chat_id, join.token)))
+
+        deadline = self.clock.now() + GAME_LIMIT
+        while chat_id in mafia_game.games and self.clock.now() < deadline:
+            self.days[chat_id] = mafia_game.games[chat_id].day_number
+            await self._press_buttons(user_ids)
+            # Людина думає REACTION секунд; тим часом ідуть таймери фаз і ходи ботів
+            await self.clock.sleep(self.REACTION)
+        return chat_id not in mafia_game.games
+
+    async def run(self, *games) -> List[bool]:
+        """Ігри play() одночасно; годинник переводить лише цей метод"""
+        # Кілька run_until у різних задачах поступались би одне одному без кінця
+        task = asyncio.ensure_future(asyncio.gather(*games))
+        await self.clock.run_until(task.done, limit=GAME_LIMIT + 60)
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return [False] * len(games)
+        return task.result()
+
+    def winners(self) -> Dict[int, str]:
+        """chat_id: переможець за текстом оголошення перемоги"""
+        result = {}
+        for chat_id, text in self.request.texts:
+            for marker, winner in WINNERS.items():
+                if marker in text:
+                    result[chat_id] = winner
+        return result
+
+
+async def _main(args) -> int:
+    chats = [-(1000 + i) for i in range(args.games)]
+    async with GameHarness(seed=args.seed, event_dir=args.events) as harness:
+        started = time.perf_counter()
+        finished = await harness.run(*(harness.play(chat_id, args.players, args.bots) for chat_id in chats))
+        elapsed = time.perf_counter() - started
+        virtual = harness.clock.now()
+    winners = Counter(harness.winners().values())
+    days = [harness.days.get(chat_id, 0) for chat_id in chats]
+    print(f"games: {args.games} ({args.players} people + {args.bots} bots each), seed {args.seed}")
+    print(f"  finished {sum(finished)}/{args.games}, days avg {sum(days) / len(days):.1f} max {max(days)}, "
+          f"winners: {dict(winners)}")
+    print(f"  virtual time {virtual:.0f} s, wall {elapsed * 1000:.0f} ms ({elapsed / args.games * 1000:.1f} ms/game), "
+          f"clock jumps {harness.clock.jumps}")
+    print(f"  bot api calls: {dict(harness.server.calls.most_common())}")
+    if args.events:
+        print(f"  event log: {dict(harness.events.stats)} in {args.events}")
+    for record in harness.errors.records[:10]:
+        print(f"  ERROR {record}")
+    return 0 if all(finished) and not harness.errors.records else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=1, help='ігор одночасно (кожна у своїй групі)')
+    parser.add_argument('--players', type=int, default=5, help='людей у грі')
+    parser.add_argument('--bots', type=int, default=5, help='ботів у грі')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--events', metavar='DIR', help='каталог логу подій ігор')
+    args = parser.parse_args()
+    # handlers при імпорті вмикає INFO - тут лише попередження і помилки
+    logging.getLogger().setLevel(logging.WARNING)
+    raise SystemExit(asyncio.run(_main(args)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Game lifecycle: idle TTLs per phase, a cap on open lobbies and a periodic sweeper.
+
+Гра, створена /newgame і так і не розпочата, або гра, що зависла
+(таймер загубився, бот не встиг завершити), лишалась у MafiaGame.games
+назавжди. MafiaGame тримає ігри в OrderedDict за часом останньої зміни
+стану, тож обхід іде від найдавніших і зупиняється на першій грі, яка
+молодша за найменший TTL: ціна обходу - кількість простійних ігор, а не
+всіх. Лобі додатково обмежені MAX_LOBBIES: зайві закриваються від
+найдавніше змінених (LRU).
+
+Sweeper лише знаходить ігри; закриває їх колбек evict (handlers), який
+прибирає таймер, відкладені дії, редагування, індекси і пише в чат.
+"""
+
+import asyncio
+import itertools
+import logging
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from clock import game_clock
+from config import GAME_IDLE_TTL, GAME_IDLE_TTL_DEFAULT, MAX_LOBBIES, SWEEP_INTERVAL
+from game_state import MafiaGame, mafia_game
+
+logger = logging.getLogger(__name__)
+
+# Причини закриття
+IDLE = 'idle'
+LOBBY_CAP = 'lobby_cap'
+
+Evict = Callable[[int, str], Awaitable[bool]]
+
+
+class GameSweeper:
+    """Пошук і закриття покинутих ігор"""
+
+    def __init__(self, games: MafiaGame, ttl: Dict[str, float] = GAME_IDLE_TTL,
+                 default_ttl: float = GAME_IDLE_TTL_DEFAULT, max_lobbies: int = MAX_LOBBIES,
+                 interval: float = SWEEP_INTERVAL):
+        self.games = games
+        self.ttl = ttl
+        self.default_ttl = default_ttl
+        self.max_lobbies = max_lobbies
+        self.interval = interval
+        self._evict: Optional[Evict] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Counter = Counter()  # sweeps, idle, lobby_cap, skipped
+
+    def ttl_of(self, phase: str) -> float:
+        return self.ttl.get(phase, self.default_ttl)
+
+    def idle(self, chat_id: int, now: Optional[float] = None) -> bool:
+        """Чи простоює гра довше TTL своєї фази"""
+        touched = self.games.activity.get(chat_id)
+        game = self.games.games.get(chat_id)
+        if touched is None or game is None:
+            return False
+        now = self.games.clock() if now is None else now
+        return now - touched >= self.ttl_of(game.phase)
+
+    def expired(self, now: Optional[float] = None) -> List[int]:
+        """Ігри, що простоюють довше TTL, від найдавніших"""
+        now = self.games.clock() if now is None else now
+        horizon = now - min(self.default_ttl, *self.ttl.values())
+        result = []
+        for chat_id, touched in self.games.activity.items():
+            if touched > horizon:
+                break
+            if self.idle(chat_id, now):
+                result.append(chat_id)
+        return result
+
+    def over_limit(self) -> List[int]:
+        """Найдавніше змінені лобі понад MAX_LOBBIES"""
+        excess = len(self.games.lobbies) - self.max_lobbies
+        return list(itertools.islice(self.games.lobbies, excess)) if excess > 0 else []
+
+    def due(self, chat_id: int, reason: str) -> bool:
+        """Перевірка перед закриттям: гра могла ожити, поки чекала на lock"""
+        if reason == LOBBY_CAP:
+            return chat_id in self.games.lobbies and len(self.games.lobbies) > self.max_lobbies
+        return self.idle(chat_id)
+
+    def candidates(self) -> List[Tuple[int, str]]:
+        """(chat_id, причина) для всіх ігор, які треба закрити зараз"""
+        due = [(chat_id, IDLE) for chat_id in self.expired()]
+        idle = {chat_id for chat_id, _ in due}
+        due += [(chat_id, LOBBY_CAP) for chat_id in self.over_limit() if chat_id not in idle]
+        return due
+
+    async def sweep(self) -> int:
+        """Один обхід: закриває покинуті ігри, повертає їх кількість"""
+        if self._evict is None:
+            return 0
+        self.stats['sweeps'] += 1
+        closed = 0
+        for chat_id, reason in self.candidates():
+            try:
+                evicted = await self._evict(chat_id, reason)
+            except Exception:
+                logger.exception(f"Помилка закриття гри {chat_id}")
+                continue
+            if evicted:
+                self.stats[reason] += 1
+                closed += 1
+            else:
+                self.stats['skipped'] += 1
+        if closed:
+            logger.info(f"🧹 Закрито покинутих ігор: {closed}, активних: {len(self.games.games)}")
+        return closed
+
+    def start(self, evict: Evict):
+        """Запуск періодичного обходу; evict(chat_id, причина) закриває гру"""
+        self._evict = evict
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await game_clock.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Помилка обходу ігор")
+
+
+game_sweeper = GameSweeper(mafia_game)
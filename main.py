@@ -1,14 +1,14 @@
 """Entry point for running the Mafia Telegram bot.
 
 Цей файл лише збирає застосунок, підключає хендлери
-і запускає long polling. Увесь ігровий код винесений
+і запускає long polling або webhook-сервер. Увесь ігровий код винесений
 в окремі модулі config.py, game_state.py та handlers.py.
 """
 
 import os
+import asyncio
 import logging
 
-from telegram import Update
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -17,27 +17,49 @@ from telegram.ext import (
     filters,
 )
 
+from config import EVENT_LOG_DIR, GAME_DB_PATH, RUN_MODE, TELEGRAM_API_URL, SHARD_BASE_PORT, SHARD_INDEX, SHARD_SECRET
+from eventlog import EventLog
+from game_state import mafia_game
+from metrics import instrument_handlers, start_metrics_server, stop_metrics_server
+from outbound import outbound
+from storage import SQLiteStore
+
 # Виправлено імпорти - тепер відповідають дійсним функціям в handlers.py
 from handlers import (
     start,
     newgame,
     status,
     endgame,
-    join_game_callback,
-    add_bots_menu_callback,
-    add_bots_callback,
-    leave_game_callback,
-    start_game_callback,
-    back_to_game_callback,
-    night_action_callback,
-    vote_callback,
-    potato_callback,
+    votemode,
+    timers,
+    route_callback,
     check_dead_player_message,
+    note_chat_activity,
+    register_game_metrics,
+    restore_game_timers,
+    start_game_sweeper,
+    stop_game_timers,
+    DEAD_PLAYER,
+    DISCUSSION,
+    ALLOWED_UPDATES,
 )
 
 logger = logging.getLogger(__name__)
 
 
+async def post_init(application: Application):
+    """Таймери фаз, прибирання ігор, метрики і ендпоінт /metrics після старту застосунку"""
+    await restore_game_timers(application)
+    start_game_sweeper(application)
+    register_game_metrics(application)
+    await start_metrics_server()
+
+
+async def post_shutdown(application: Application):
+    await stop_game_timers(application)
+    await stop_metrics_server()
+
+
 def main() -> None:
     """Головна функція запуску бота"""
     # Токен тепер безпечніше зчитується з змінної оточення
@@ -47,38 +69,82 @@ def main() -> None:
         logger.error("Вкажіть токен у змінній оточення TELEGRAM_BOT_TOKEN.")
         raise SystemExit(1)
 
-    application = Application.builder().token(TOKEN).build()
+    if RUN_MODE == 'sharded':
+        # Фронт лише маршрутизує оновлення; ігри живуть у процесах-воркерах
+        from sharding import run_front
+        logger.info("🚀 Запуск фронту шардів Mafia...")
+        asyncio.run(run_front(TOKEN, ALLOWED_UPDATES))
+        return
 
-    if application.job_queue is None:
-        logger.warning("⏱️ JobQueue недоступний — таймери гри не зможуть працювати.")
-        logger.warning('Встановіть залежність: pip install "python-telegram-bot[job-queue]"')
-        logger.warning("Бот продовжує роботу, але фази потрібно завершувати вручну.")
+    if EVENT_LOG_DIR:
+        # Кожен воркер пише події своїх ігор в окремий каталог
+        log_dir = os.path.join(EVENT_LOG_DIR, f"shard{SHARD_INDEX}") if RUN_MODE == 'shard' else EVENT_LOG_DIR
+        mafia_game.attach_event_log(EventLog(log_dir))
+
+    # Відновлення ігор, що йшли до рестарту
+    if GAME_DB_PATH:
+        # Кожен воркер має власне сховище своїх ігор
+        db_path = f"{GAME_DB_PATH}.shard{SHARD_INDEX}" if RUN_MODE == 'shard' else GAME_DB_PATH
+        mafia_game.attach_store(SQLiteStore(db_path))
+        restored = mafia_game.restore()
+        logger.info(f"💾 Відновлено ігор: {restored}")
+
+    # Події однієї гри серіалізує lock гри в handlers, тож оновлення
+    # різних чатів можна обробляти паралельно
+    builder = (
+        Application.builder()
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(True)
+    )
+    if RUN_MODE in ('webhook', 'shard'):
+        # aiohttp потрібен лише для режиму webhook
+        from webhook import WebhookBot, run_webhook
+        from telegram.request import HTTPXRequest
+        # Як у ApplicationBuilder: пул на 256 з'єднань для паралельних розсилок
+        builder = builder.bot(WebhookBot(
+            TOKEN, base_url=f"{TELEGRAM_API_URL}/bot", rate_limiter=outbound,
+            request=HTTPXRequest(connection_pool_size=256),
+        ))
+    else:
+        builder = builder.token(TOKEN).base_url(f"{TELEGRAM_API_URL}/bot").rate_limiter(outbound)
+    application = builder.build()
 
     # Реєстрація команд
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("newgame", newgame))
     application.add_handler(CommandHandler("status", status))
     application.add_handler(CommandHandler("endgame", endgame))
+    application.add_handler(CommandHandler("votemode", votemode))
+    application.add_handler(CommandHandler("timers", timers))
     
-    # Реєстрація колбеків
-    application.add_handler(CallbackQueryHandler(join_game_callback, pattern="^join_game$"))
-    application.add_handler(CallbackQueryHandler(add_bots_menu_callback, pattern="^add_bots_menu$"))
-    application.add_handler(CallbackQueryHandler(add_bots_callback, pattern="^add_bots_"))
-    application.add_handler(CallbackQueryHandler(leave_game_callback, pattern="^leave_game$"))
-    application.add_handler(CallbackQueryHandler(start_game_callback, pattern="^start_game$"))
-    application.add_handler(CallbackQueryHandler(back_to_game_callback, pattern="^back_to_game$"))
-    
-    # Нічні дії та голосування
-    application.add_handler(CallbackQueryHandler(night_action_callback, pattern="^night_(kill|heal|check)_"))
-    application.add_handler(CallbackQueryHandler(vote_callback, pattern="^(nominate|votefor)_"))
-    application.add_handler(CallbackQueryHandler(potato_callback, pattern="^potato_"))
+    # Усі кнопки - один маршрутизатор за payload у callback_data
+    application.add_handler(CallbackQueryHandler(route_callback))
     
     # Блокування повідомлень від мертвих
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, check_dead_player_message))
+    application.add_handler(MessageHandler(DEAD_PLAYER & filters.TEXT & ~filters.COMMAND, check_dead_player_message))
+    # Активність в обговоренні (тиша закінчує його раніше)
+    application.add_handler(MessageHandler(DISCUSSION & ~filters.COMMAND, note_chat_activity), group=1)
+
+    # Кількість викликів і час кожного хендлера - у /metrics
+    instrument_handlers(application)
 
     # Запуск бота
-    logger.info("🚀 Запуск бота Mafia...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if RUN_MODE == 'shard':
+        logger.info(f"🚀 Запуск воркера Mafia, шард {SHARD_INDEX}...")
+    else:
+        logger.info(f"🚀 Запуск бота Mafia ({RUN_MODE})...")
+    if RUN_MODE == 'webhook':
+        asyncio.run(run_webhook(application, allowed_updates=ALLOWED_UPDATES))
+    elif RUN_MODE == 'shard':
+        # Воркер чує лише фронт; webhook у Telegram реєструє фронт
+        asyncio.run(run_webhook(
+            application, allowed_updates=ALLOWED_UPDATES, listen='127.0.0.1',
+            port=SHARD_BASE_PORT + SHARD_INDEX, secret=SHARD_SECRET, register=False,
+            user_game=mafia_game.game_of,
+        ))
+    else:
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == "__main__":
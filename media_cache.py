@@ -0,0 +1,94 @@
+"""Telegram file_id cache for the phase GIFs.
+
+Кожен GIF завантажується в Telegram лише один раз: отриманий file_id
+зберігається в пам'яті та на диску і перевикористовується у всіх чатах.
+Якщо вміст файлу змінився (інший sha256) — запис вважається застарілим.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+from config import MEDIA_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, str]] = {}  # gif_type: {'sha256', 'file_id'}
+        self._hashes: Dict[str, Tuple[float, int, str]] = {}  # path: (mtime, size, sha256)
+        self._loaded = False
+
+    def load(self):
+        """Завантаження кешу з диску"""
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.entries = {
+                    key: value for key, value in data.items()
+                    if isinstance(value, dict) and 'sha256' in value and 'file_id' in value
+                }
+        except (OSError, ValueError) as e:
+            logger.error(f"Помилка читання кешу медіа: {e}")
+
+    def save(self):
+        """Атомарний запис кешу на диск"""
+        # Унікальне ім'я - воркери шардів можуть писати кеш одночасно
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Помилка запису кешу медіа: {e}")
+
+    def file_hash(self, path: str) -> str:
+        """sha256 файлу (перераховується лише коли змінились mtime або розмір)"""
+        stat = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+        self._hashes[path] = (stat.st_mtime, stat.st_size, file_hash)
+        return file_hash
+
+    def get(self, gif_type: str, path: str) -> Optional[str]:
+        """Повертає file_id, якщо він відповідає поточному вмісту файлу"""
+        if not self._loaded:
+            self.load()
+        entry = self.entries.get(gif_type)
+        if not entry:
+            return None
+        if entry['sha256'] != self.file_hash(path):
+            # Файл змінився - старий file_id вже не підходить
+            self.invalidate(gif_type)
+            return None
+        return entry['file_id']
+
+    def put(self, gif_type: str, path: str, file_id: str):
+        """Зберігає file_id після успішного завантаження"""
+        if not self._loaded:
+            self.load()
+        self.entries[gif_type] = {'sha256': self.file_hash(path), 'file_id': file_id}
+        self.save()
+
+    def invalidate(self, gif_type: str):
+        """Видаляє застарілий file_id"""
+        if self.entries.pop(gif_type, None) is not None:
+            self.save()
+
+
+media_cache = MediaCache(MEDIA_CACHE_PATH)
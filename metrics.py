@@ -0,0 +1,258 @@
+"""Prometheus-compatible metrics: counters, histograms, gauges and a /metrics endpoint.
+
+Невеликий власний реєстр замість prometheus_client: метрика - словник
+"кортеж міток: значення", інкремент - одна операція зі словником, тому
+інструментування хендлера коштує ~1 мкс. Gauge рахується під час
+запиту /metrics функцією, яка читає стан (ігри, черги, лічильники
+модулів), тож гарячі шляхи його не оновлюють. Формат відповіді -
+Prometheus text exposition 0.0.4.
+
+Ендпоінт слухає MAFIA_METRICS_LISTEN:MAFIA_METRICS_PORT (за
+замовчуванням 127.0.0.1:9464; воркер шарду - порт + 1 + індекс),
+MAFIA_METRICS_PORT=0 вимикає сервер.
+"""
+
+import bisect
+import functools
+import logging
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from clock import game_clock
+from config import METRICS_LISTEN, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+Labels = Tuple[str, ...]
+
+# Межі гістограм (сек)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PHASE_BUCKETS = (1, 2, 5, 10, 15, 30, 45, 60, 90, 120, 300)
+
+# Усі метрики процесу в порядку створення
+REGISTRY: List['Metric'] = []
+
+
+def _format_labels(names: Sequence[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """Спільне для всіх метрик: ім'я, опис, мітки, реєстрація"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        REGISTRY.append(self)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Лічильник, що лише зростає"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """Розподіл значень по кошиках (тривалості)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self.values: Dict[Labels, list] = {}  # мітки: [лічильники кошиків..., +Inf, сума]
+
+    def observe(self, value: float, *labels):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, entry in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry):
+                cumulative += count
+                bucket_labels = _format_labels(self.labels + ('le',), labels + (_format_value(bound),))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            label_text = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(entry[-1])}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Collected(Metric):
+    """Значення рахуються функцією під час запиту /metrics (gauge або лічильник модуля)"""
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Dict], labels: Sequence[str] = (),
+                 kind: str = 'gauge'):
+        super().__init__(name, help, labels)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self) -> Iterable[str]:
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            if not isinstance(labels, tuple):
+                labels = (labels,)
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+def render() -> str:
+    """Текст для /metrics"""
+    parts = []
+    for metric in REGISTRY:
+        try:
+            parts.append(metric.render())
+        except Exception as e:
+            logger.error(f"Помилка метрики {metric.name}: {e}")
+    return '\n'.join(parts) + '\n'
+
+
+# ============================================
+# МЕТРИКИ БОТА
+# ============================================
+
+handler_calls = Counter('mafia_handler_calls_total', 'Handler calls by handler and outcome.',
+                        ('handler', 'outcome'))
+handler_seconds = Histogram('mafia_handler_seconds', 'Handler run time.', ('handler',))
+api_calls = Counter('mafia_telegram_api_calls_total', 'Bot API calls by method and outcome.',
+                    ('method', 'outcome'))
+api_seconds = Histogram('mafia_telegram_api_seconds', 'Bot API call time, without throttling.', ('method',))
+retry_after_seconds = Counter('mafia_telegram_retry_after_seconds_total',
+                              'Seconds spent waiting on RetryAfter by method.', ('method',))
+outbound_queue_seconds = Histogram('mafia_outbound_queue_seconds',
+                                   'Time a Bot API call waited in the outbound queue, by priority lane.', ('lane',))
+phase_seconds = Histogram('mafia_phase_seconds', 'Game phase duration.', ('phase',), PHASE_BUCKETS)
+
+
+def instrumented(callback, name: Optional[str] = None):
+    """Обгортка async-хендлера: кількість викликів, помилки і час виконання"""
+    name = name or getattr(callback, '__name__', 'handler')
+    ok, error = (name, 'ok'), (name, 'error')
+    labels = (name,)
+    counts = handler_calls.values
+    clock = time.perf_counter
+
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        started = clock()
+        try:
+            result = await callback(*args, **kwargs)
+        except BaseException:
+            counts[error] = counts.get(error, 0) + 1
+            raise
+        finally:
+            handler_seconds.observe(clock() - started, *labels)
+        counts[ok] = counts.get(ok, 0) + 1
+        return result
+    return wrapper
+
+
+def instrument_handlers(application):
+    """Обгортає callback кожного зареєстрованого хендлера застосунку"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = instrumented(handler.callback)
+
+
+class PhaseClock:
+    """Тривалість фаз ігор: фаза триває до наступної фази або кінця гри"""
+
+    def __init__(self, histogram: Histogram = phase_seconds, clock: Callable[[], float] = game_clock.now):
+        self.histogram = histogram
+        self.clock = clock
+        self._current: Dict[int, Tuple[str, float]] = {}  # chat_id: (фаза, початок)
+
+    def enter(self, chat_id: int, phase: str):
+        now = self.clock()
+        self._observe(chat_id, now)
+        self._current[chat_id] = (phase, now)
+
+    def finish(self, chat_id: int):
+        self._observe(chat_id, self.clock())
+        self._current.pop(chat_id, None)
+
+    def _observe(self, chat_id: int, now: float):
+        current = self._current.get(chat_id)
+        if current is not None:
+            phase, started = current
+            self.histogram.observe(now - started, phase)
+
+
+phase_clock = PhaseClock()
+
+
+# ============================================
+# HTTP-ЕНДПОІНТ
+# ============================================
+
+_runner = None
+
+
+async def start_metrics_server(listen: str = METRICS_LISTEN, port: int = METRICS_PORT):
+    """Запуск HTTP-сервера з /metrics (port=0 - вимкнено)"""
+    global _runner
+    if not port:
+        return
+    try:
+        # aiohttp вже є для webhook; без нього бот працює, лише без /metrics
+        from aiohttp import web
+    except ImportError:
+        logger.warning("📈 aiohttp не встановлено - /metrics вимкнено")
+        return
+
+    async def handle_metrics(request):
+        return web.Response(text=render(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    _runner = web.AppRunner(app, access_log=None)
+    await _runner.setup()
+    await web.TCPSite(_runner, listen, port).start()
+    logger.info(f"📈 Метрики: http://{listen}:{port}/metrics")
+
+
+async def stop_metrics_server():
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
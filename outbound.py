@@ -0,0 +1,342 @@
+"""Outbound message scheduler: token-bucket rate limiting with priority lanes for all Bot API calls.
+
+Планувальник підключається до ExtBot як rate limiter, тому через нього
+проходить кожен запит бота. Глобальний bucket тримає ~30 повідомлень/с,
+окремий bucket на групу — ~20 повідомлень/хв. Запити в один чат
+виконуються по черзі, запити в різні чати — паралельно. На RetryAfter
+запит повторюється після паузи.
+
+Кожен запит має пріоритет (смугу): rate_limit_args={'priority': ...}.
+Без позначки особисті повідомлення (кнопки дій, ролі) - CRITICAL,
+групові (оголошення фаз) - PHASE; декоративні рядки ("X зробив свій
+вибір", картопля) позначаються FLAVOR. І в чергу чату, і до глобального
+bucket першими проходять вищі смуги, в межах смуги - FIFO. Під
+навантаженням FLAVOR не заважає важливому: запит, що чекав довше
+OUTBOUND_FLAVOR_MAX_WAIT або отримав RetryAfter, відкидається, а кілька
+декоративних текстів, що чекають в одному чаті, зливаються в одне
+повідомлення. Відкинутий чи злитий запит повертає None. Повідомлення,
+яке потім редагується (живий підсумок ходів), позначається 'merge':
+False: чужий текст, дописаний до нього, зник би з першим редагуванням.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Coroutine, Deque, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from clock import game_clock
+from config import OUTBOUND_GLOBAL_RATE, OUTBOUND_GROUP_RATE, OUTBOUND_MAX_RETRIES, OUTBOUND_FLAVOR_MAX_WAIT
+from metrics import api_calls, api_seconds, outbound_queue_seconds, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# Методи, які не є повідомленнями і не повинні чекати в черзі
+UNLIMITED_ENDPOINTS = frozenset({'answerCallbackQuery', 'getMe', 'setWebhook', 'deleteWebhook'})
+
+# Смуги пріоритету: менше число - раніше
+CRITICAL, PHASE, FLAVOR = range(3)
+LANES = ('critical', 'phase', 'flavor')
+
+# Злиті повідомлення не довші за ліміт Telegram
+MESSAGE_LIMIT = 4096
+
+# Результат очікування черги чату: запит злито з іншим
+_MERGED = object()
+
+
+class TokenBucket:
+    """Token bucket з резервуванням: токенів може бути менше нуля"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    # Похибка округлення: після sleep((1 - tokens) / rate) токенів може бути 0.999...
+    EPSILON = 1e-9
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # токенів на секунду
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = game_clock.now()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """Забирає токен; повертає, скільки секунд треба почекати"""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def take(self, now: float) -> bool:
+        """Забирає токен, лише якщо він є"""
+        self._refill(now)
+        if self.tokens >= 1 - self.EPSILON:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait(self, now: float) -> float:
+        """Секунд до появи цілого токена"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 - self.EPSILON else (1 - self.tokens) / self.rate
+
+    def idle(self, now: float) -> bool:
+        """Bucket повний - його можна забути"""
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class PriorityGate:
+    """Глобальний bucket: токени видаються очікуючим за смугою, FIFO в межах смуги"""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.lanes: List[Deque[asyncio.Future]] = [deque() for _ in LANES]
+        self._pump: Optional[asyncio.Task] = None
+
+    async def acquire(self, priority: int) -> bool:
+        """Токен для запиту; False - довелось чекати"""
+        if not any(self.lanes) and self.bucket.take(game_clock.now()):
+            return True
+        future = asyncio.get_running_loop().create_future()
+        self.lanes[priority].append(future)
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.get_running_loop().create_task(self._run())
+        await future
+        return False
+
+    def _next(self) -> Optional[asyncio.Future]:
+        for lane in self.lanes:
+            while lane:
+                future = lane.popleft()
+                if not future.done():  # скасовані пропускаються
+                    return future
+        return None
+
+    async def _run(self):
+        while any(self.lanes):
+            delay = self.bucket.wait(game_clock.now())
+            if delay > 0:
+                await game_clock.sleep(delay)
+                continue
+            future = self._next()
+            if future is None:
+                break
+            self.bucket.take(game_clock.now())
+            future.set_result(None)
+
+
+class _ChatQueue:
+    """Черга одного чату: хто зараз надсилає, хто чекає (за смугою) і bucket групи"""
+
+    __slots__ = ('bucket', 'users', 'busy', 'waiters')
+
+    def __init__(self, bucket: Optional[TokenBucket]):
+        self.bucket = bucket
+        self.users = 0  # скільки запитів зараз чекають або виконуються
+        self.busy = False
+        self.waiters: List[list] = []  # купа [смуга, порядок, future, data, endpoint, чи можна зливати]
+
+
+class _Ticket:
+    """Запит у черзі: смуга, чи можна зливати з іншими, і час постановки"""
+
+    __slots__ = ('priority', 'merge', 'enqueued', 'waiting')
+
+    def __init__(self, priority: int, merge: bool = True):
+        self.priority = priority
+        self.merge = merge
+        self.enqueued = game_clock.now()
+        self.waiting = True
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """Rate limiter для ExtBot зі смугами пріоритету, per-chat порядком і повторами на RetryAfter"""
+
+    def __init__(self, global_rate: float = OUTBOUND_GLOBAL_RATE,
+                 group_per_minute: float = OUTBOUND_GROUP_RATE,
+                 max_retries: int = OUTBOUND_MAX_RETRIES,
+                 flavor_max_wait: float = OUTBOUND_FLAVOR_MAX_WAIT):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.gate = PriorityGate(self.global_bucket)
+        self.group_rate = group_per_minute / 60
+        self.group_capacity = group_per_minute
+        self.max_retries = max_retries
+        self.flavor_max_wait = flavor_max_wait
+        self._chats: Dict[Union[int, str], _ChatQueue] = {}
+        self._seq = itertools.count()
+        self.waiting: List[int] = [0] * len(LANES)  # запитів у черзі за смугою
+        self.stats: Counter = Counter()  # sent, throttled, retried, failed, dropped, merged
+
+    async def initialize(self):
+        """Нічого не потрібно"""
+
+    async def shutdown(self):
+        """Нічого не потрібно"""
+
+    @staticmethod
+    def priority_of(rate_limit_args: Optional[Dict], chat_id) -> int:
+        """Смуга запиту: явна позначка або за типом чату"""
+        if rate_limit_args and 'priority' in rate_limit_args:
+            return rate_limit_args['priority']
+        # Особисті - кнопки дій і ролі гравця, групи - оголошення фаз
+        return CRITICAL if isinstance(chat_id, int) and chat_id > 0 else PHASE
+
+    def _chat(self, chat_id: Union[int, str]) -> _ChatQueue:
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            # Групи (від'ємний id або @username) мають власний ліміт
+            is_group = not isinstance(chat_id, int) or chat_id < 0
+            bucket = TokenBucket(self.group_rate, self.group_capacity) if is_group else None
+            queue = self._chats[chat_id] = _ChatQueue(bucket)
+        return queue
+
+    def _release(self, chat_id: Union[int, str], queue: _ChatQueue):
+        queue.users -= 1
+        if queue.users == 0 and (queue.bucket is None or queue.bucket.idle(game_clock.now())):
+            del self._chats[chat_id]
+
+    async def _enter(self, queue: _ChatQueue, ticket: _Ticket, data: Dict, endpoint: str):
+        """Черга чату; повертає _MERGED, якщо запит злили з іншим"""
+        if not queue.busy and not queue.waiters:
+            queue.busy = True
+            return None
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(queue.waiters, [ticket.priority, next(self._seq), future, data, endpoint, ticket.merge])
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Черга вже передана цьому запиту - передаємо далі
+            if future.done() and not future.cancelled() and future.result() is not _MERGED:
+                self._leave(queue)
+            raise
+
+    def _leave(self, queue: _ChatQueue):
+        while queue.waiters:
+            future = heapq.heappop(queue.waiters)[2]
+            if not future.done():
+                future.set_result(None)
+                return
+        queue.busy = False
+
+    def _merge(self, queue: _ChatQueue, data: Dict, endpoint: str):
+        """Дописує до декоративного тексту інші такі ж, що чекають у цьому чаті"""
+        if endpoint != 'sendMessage' or data.get('reply_markup') is not None:
+            return
+        rest = {key: value for key, value in data.items() if key != 'text'}
+        length = len(data['text'])
+        for entry in sorted(queue.waiters, key=lambda entry: entry[1]):
+            priority, _, future, other, other_endpoint, mergeable = entry
+            if priority != FLAVOR or not mergeable or other_endpoint != endpoint or future.done():
+                continue
+            if {key: value for key, value in other.items() if key != 'text'} != rest:
+                continue
+            length += 1 + len(other['text'])
+            if length > MESSAGE_LIMIT:
+                break
+            data['text'] += '\n' + other['text']
+            future.set_result(_MERGED)
+            self.stats['merged'] += 1
+
+    def _dequeued(self, ticket: _Ticket):
+        if ticket.waiting:
+            ticket.waiting = False
+            self.waiting[ticket.priority] -= 1
+
+    async def _throttle(self, queue: Optional[_ChatQueue], ticket: _Ticket):
+        throttled = False
+        if queue is not None and queue.bucket is not None:
+            delay = queue.bucket.reserve(game_clock.now())
+            if delay > 0:
+                throttled = True
+                await game_clock.sleep(delay)
+        if not await self.gate.acquire(ticket.priority):
+            throttled = True
+        if throttled:
+            self.stats['throttled'] += 1
+        if ticket.waiting:
+            self._dequeued(ticket)
+            outbound_queue_seconds.observe(game_clock.now() - ticket.enqueued, LANES[ticket.priority])
+
+    async def _call(self, callback: Callable[..., Coroutine[Any, Any, Any]], args, kwargs,
+                    endpoint: str, queue: Optional[_ChatQueue], ticket: _Ticket):
+        for attempt in range(self.max_retries + 1):
+            await self._throttle(queue, ticket)
+            try:
+                result = await self._send(callback, args, kwargs, endpoint)
+            except RetryAfter as e:
+                retry_after_seconds.inc(endpoint, amount=e.retry_after)
+                if ticket.priority == FLAVOR:
+                    # Декоративне повідомлення не варте очікування під флудом
+                    self.stats['dropped'] += 1
+                    return None
+                if attempt == self.max_retries:
+                    self.stats['failed'] += 1
+                    raise
+                self.stats['retried'] += 1
+                logger.warning(f"⏳ {endpoint}: RetryAfter {e.retry_after} с (спроба {attempt + 1})")
+                await game_clock.sleep(e.retry_after)
+                continue
+            self.stats['sent'] += 1
+            return result
+
+    @staticmethod
+    async def _send(callback: Callable[..., Coroutine[Any, Any, Any]], args, kwargs, endpoint: str):
+        """Одна спроба виклику Bot API з метриками"""
+        started = time.perf_counter()
+        try:
+            result = await callback(*args, **kwargs)
+        except RetryAfter:
+            api_calls.inc(endpoint, 'retry_after')
+            raise
+        except Exception:
+            api_calls.inc(endpoint, 'error')
+            raise
+        finally:
+            api_seconds.observe(time.perf_counter() - started, endpoint)
+        api_calls.inc(endpoint, 'ok')
+        return result
+
+    async def process_request(self, callback: Callable[..., Coroutine[Any, Any, Any]], args: Any,
+                              kwargs: Dict[str, Any], endpoint: str, data: Dict[str, Any],
+                              rate_limit_args: Optional[Any]) -> Union[bool, Dict, List[Dict], None]:
+        if endpoint in UNLIMITED_ENDPOINTS:
+            return await self._send(callback, args, kwargs, endpoint)
+
+        chat_id = data.get('chat_id')
+        # 'merge': False - повідомлення потім редагується, зливати з ним чужі тексти не можна
+        merge = not rate_limit_args or rate_limit_args.get('merge', True)
+        ticket = _Ticket(self.priority_of(rate_limit_args, chat_id), merge)
+        self.waiting[ticket.priority] += 1
+        try:
+            if chat_id is None:
+                return await self._call(callback, args, kwargs, endpoint, None, ticket)
+
+            queue = self._chat(chat_id)
+            queue.users += 1
+            try:
+                if await self._enter(queue, ticket, data, endpoint) is _MERGED:
+                    return None
+                try:
+                    if ticket.priority == FLAVOR:
+                        if game_clock.now() - ticket.enqueued > self.flavor_max_wait:
+                            self.stats['dropped'] += 1
+                            return None
+                        if ticket.merge:
+                            self._merge(queue, data, endpoint)
+                    return await self._call(callback, args, kwargs, endpoint, queue, ticket)
+                finally:
+                    self._leave(queue)
+            finally:
+                self._release(chat_id, queue)
+        finally:
+            self._dequeued(ticket)
+
+
+outbound = OutboundScheduler()
@@ -0,0 +1,168 @@
+"""Pre-rendered texts and keyboards: role cards, lobby and per-phase target keyboards.
+
+Статичні тексти - картки ролей, підказки нічних дій, банери подій -
+збираються з ROLES і SPECIAL_EVENTS один раз при імпорті, а не f-рядком
+на кожного гравця.
+
+Клавіатура з цілями будується раз на фазу: кожна кнопка (payload і
+InlineKeyboardButton) створюється один раз, а варіант для гравця - це
+ті самі рядки без його власної кнопки. Раніше кожен отримувач мав свої
+n-1 кнопок, тобто n² на фазу.
+
+Лобі кешується за версією ростеру: натискання, що не змінили склад
+(повторний вхід, "Назад" з меню ботів), не перебудовують текст і кнопки.
+"""
+
+from collections import Counter
+from typing import Callable, Dict, Iterable, Sequence, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from callbacks import ADD_BOTS_MENU, JOIN, LEAVE, NIGHT_CHECK, NIGHT_HEAL, NIGHT_KILL, START, encode
+from config import MAX_PLAYERS, ROLES, SPECIAL_EVENTS
+from game_state import GameState
+
+
+def game_button(text: str, game: GameState, action: int, target: int = 0, arg: int = 0) -> InlineKeyboardButton:
+    """Кнопка гри: дія, chat_id, токен і покоління фази в callback_data"""
+    return InlineKeyboardButton(text, callback_data=encode(action, game.chat_id, game.token, game.generation,
+                                                          target, arg))
+
+
+# ============================================
+# СТАТИЧНІ ТЕКСТИ
+# ============================================
+
+def _role_card(role: Dict) -> str:
+    team = '<b>🔴 МАФІЯ</b>' if role['team'] == 'mafia' else '<b>🔵 МИРНІ</b>'
+    return f"""
+🎭 <b>ВАША РОЛЬ:</b>
+
+{role['emoji']} <b>{role['full_name']}</b>
+
+📋 <b>Опис:</b>
+{role['description']}
+
+🎯 <b>Команда:</b> {team}
+"""
+
+
+# Роль: картка, що надсилається гравцю в особисті
+ROLE_CARDS = {key: _role_card(role) for key, role in ROLES.items()}
+
+
+def role_card(role_key: str) -> str:
+    """Картка ролі (невідома роль - як мирний, так само як get_role_info)"""
+    return ROLE_CARDS.get(role_key, ROLE_CARDS['demyan'])
+
+
+# Нічна дія: заголовок повідомлення з кнопками
+NIGHT_PROMPTS = {
+    'kill': "🔪 <b>ВИБЕРІТЬ ЖЕРТВУ:</b>",
+    'heal': "💉 <b>ВИБЕРІТЬ КОГО ВРЯТУВАТИ:</b>",
+    'check': "🔍 <b>ВИБЕРІТЬ КОГО ПЕРЕВІРИТИ:</b>",
+}
+DEFAULT_NIGHT_PROMPT = "<b>ВАША ДІЯ:</b>"
+
+# Нічна дія: позначка на кнопці цілі і дія кнопки
+NIGHT_BUTTONS = {
+    'kill': ("🔪", NIGHT_KILL),
+    'heal': ("💉", NIGHT_HEAL),
+    'check': ("🔍", NIGHT_CHECK),
+}
+
+# Подія: рядок у лобі
+EVENT_BANNERS = {
+    key: f"\n\n🎲 <b>{event['emoji']} {event['name']}</b>\n<i>{event['description']}</i>"
+    for key, event in SPECIAL_EVENTS.items()
+}
+
+
+# ============================================
+# КЛАВІАТУРИ ФАЗ
+# ============================================
+
+class TargetKeyboard:
+    """Кнопки-цілі фази: спільні для всіх отримувачів, варіант гравця - без його рядка"""
+
+    __slots__ = ('rows', 'positions', 'tail')
+
+    def __init__(self, game: GameState, action: int, label: str, targets: Sequence[Tuple[int, str]],
+                 tail: Iterable[InlineKeyboardButton] = ()):
+        self.rows = tuple((game_button(f"{label} {name}", game, action, target_id),) for target_id, name in targets)
+        self.positions = {target_id: i for i, (target_id, _) in enumerate(targets)}
+        self.tail = tuple((button,) for button in tail)  # рядки після цілей, однакові для всіх
+
+    def targets_for(self, user_id: int) -> int:
+        """Скільки цілей бачить гравець (себе не бачить)"""
+        return len(self.rows) - (user_id in self.positions)
+
+    def markup_for(self, user_id: int) -> InlineKeyboardMarkup:
+        """Клавіатура гравця: ті самі кнопки, без кнопки на себе"""
+        i = self.positions.get(user_id)
+        rows = self.rows if i is None else self.rows[:i] + self.rows[i + 1:]
+        return InlineKeyboardMarkup(rows + self.tail)
+
+
+# ============================================
+# ЛОБІ
+# ============================================
+
+def lobby(game: GameState) -> Tuple[str, InlineKeyboardMarkup]:
+    """Текст і кнопки лобі"""
+    keyboard = InlineKeyboardMarkup([
+        [game_button("➕ ПРИЄДНАТИСЯ", game, JOIN)],
+        [game_button("🤖 ДОДАТИ БОТІВ", game, ADD_BOTS_MENU)],
+        [game_button("🎯 ПОЧАТИ ГРУ", game, START)],
+        [game_button("❌ ВИЙТИ", game, LEAVE)],
+    ])
+
+    sections = []
+    if game.players:
+        sections.append("<b>👥 Гравці:</b>\n" + "".join(
+            f"   {i}. ✅ {player.username}\n" for i, player in enumerate(game.players.values(), 1)))
+    if game.bots:
+        sections.append(f"\n<b>🤖 Боти ({len(game.bots)}):</b>\n" + "".join(
+            f"   {i}. 🤖 {bot.username}\n" for i, bot in enumerate(game.bots.values(), 1)))
+    players_list = "".join(sections) or "<i>Поки що немає...</i>"
+
+    text = f"""
+🎮 <b>ГРА: МАФІЯ</b> 🎮{EVENT_BANNERS.get(game.special_event, "")}
+
+<b>📊 Учасників ({len(game.all_players)}/{MAX_PLAYERS}):</b>
+{players_list}
+"""
+    return text, keyboard
+
+
+class RenderCache:
+    """Останній рендер кожного чату, дійсний, поки не змінився ключ"""
+
+    def __init__(self):
+        self._entries: Dict[int, tuple] = {}  # chat_id: (ключ, рендер)
+        self.stats: Counter = Counter()  # hit, miss
+
+    def get(self, chat_id: int, key, build: Callable[[], object]):
+        entry = self._entries.get(chat_id)
+        if entry is not None and entry[0] == key:
+            self.stats['hit'] += 1
+            return entry[1]
+        self.stats['miss'] += 1
+        value = build()
+        self._entries[chat_id] = (key, value)
+        return value
+
+    def forget(self, chat_id: int):
+        self._entries.pop(chat_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+lobby_renders = RenderCache()
+
+
+def cached_lobby(game: GameState) -> Tuple[str, InlineKeyboardMarkup]:
+    """Лобі з кешу: перебудова лише після зміни складу або події"""
+    return lobby_renders.get(game.chat_id, (game.token, game.generation, game.roster_version, game.special_event),
+                             lambda: lobby(game))
@@ -0,0 +1,133 @@
+"""Replay games from the event log: list games, rebuild any game's state at any event.
+
+Стан відтворюється тими ж переходами MafiaGame, що й відновлення ігор
+після рестарту (_mutate), тож це саме той стан, який бачив бот після
+події з цим індексом. Гра впізнається за chat_id і токеном: у групі
+могло бути кілька ігор, без токена береться остання.
+
+Запуск:
+    python replay.py logs/events-*.bin                         # ігри у файлах
+    python replay.py logs/events-*.bin --game -1001 --at 40    # стан після 40 подій
+    python replay.py logs/events-*.bin --game -1001:123 --events   # події гри з індексами
+    python replay.py logs/events-*.bin --game -1001 --json     # стан як у знімку
+    python replay.py logs/events-*.bin --bench                 # відтворення всіх ігор, подій/с
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from eventlog import load_games
+from game_state import MafiaGame
+from storage import Record
+
+GameKey = Tuple[int, int]  # (chat_id, токен)
+
+
+def rebuild(chat_id: int, records: List[Record], at: Optional[int] = None) -> Tuple[MafiaGame, Optional[str]]:
+    """Стан гри після перших at подій (усіх, якщо None) і переможець, якщо гра завершилась"""
+    games = MafiaGame()
+    winner = games.replay(chat_id, records if at is None else records[:at])
+    return games, winner
+
+
+def find_game(games: Dict[GameKey, List[Record]], spec: str) -> GameKey:
+    """Гра за 'chat_id' або 'chat_id:токен'"""
+    chat, _, token = spec.partition(':')
+    keys = [key for key in games if key[0] == int(chat) and (not token or key[1] == int(token))]
+    if not keys:
+        raise SystemExit(f"Гри {spec} немає в лозі")
+    return keys[-1]
+
+
+def describe(games: MafiaGame, chat_id: int, winner: Optional[str]) -> str:
+    """Стан гри для людини"""
+    game = games.games.get(chat_id)
+    if game is None:
+        return "гри немає (ще не створена)"
+    lines = [f"phase {game.phase}, day {game.day_number}, generation {game.generation}"
+             + (f", winner {winner}" if winner else "")]
+    for player in game.all_players.values():
+        marks = ('bot ' if player.is_bot else '') + ('' if player.alive else 'dead')
+        lines.append(f"  {player.id:>12} {player.username:<20} {player.role or '-':<12} {marks}")
+    if game.night_actions:
+        lines.append(f"  night actions: {game.night_actions}")
+    if game.potato_throws:
+        lines.append(f"  potato throws: {game.potato_throws}")
+    if game.votes:
+        lines.append(f"  nominations: {game.votes}")
+    if game.vote_results:
+        lines.append(f"  final ballot on {game.vote_nominee}: {game.vote_results}")
+    return '\n'.join(lines)
+
+
+def bench(games: Dict[GameKey, List[Record]], paths: List[str], seeks: int = 1000):
+    """Відтворення всіх ігор до кінця і стану випадкових ігор на випадкових подіях"""
+    started = time.perf_counter()
+    load_games(paths)
+    decoded = time.perf_counter() - started
+    events = sum(len(records) for records in games.values())
+
+    started = time.perf_counter()
+    for (chat_id, _), records in games.items():
+        rebuild(chat_id, records)
+    replayed = time.perf_counter() - started
+
+    rng = random.Random(1)
+    keys = list(games)
+    started = time.perf_counter()
+    for _ in range(seeks):
+        key = rng.choice(keys)
+        rebuild(key[0], games[key], rng.randint(1, len(games[key])))
+    seek = (time.perf_counter() - started) / seeks
+
+    print(f"games {len(games)}, events {events}")
+    print(f"  decode  {decoded:.3f} s ({events / decoded:,.0f} events/s)")
+    print(f"  replay  {replayed:.3f} s ({events / replayed:,.0f} events/s)")
+    print(f"  decode + replay {events / (decoded + replayed):,.0f} events/s")
+    print(f"  state at a random event: {seek * 1e6:.0f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', metavar='FILE', help='файли events-YYYY-MM-DD.bin')
+    parser.add_argument('--game', metavar='CHAT[:TOKEN]', help='гра для відтворення')
+    parser.add_argument('--at', type=int, help='кількість подій (за замовчуванням - усі)')
+    parser.add_argument('--events', action='store_true', help='події гри з індексами')
+    parser.add_argument('--json', action='store_true', help='стан гри як у знімку')
+    parser.add_argument('--bench', action='store_true', help='швидкість відтворення всіх ігор')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    games = load_games(args.paths)
+    if args.bench:
+        bench(games, args.paths)
+        return
+    if args.game is None:
+        for (chat_id, token), records in games.items():
+            end = records[-1]
+            result = f"winner {end[1][0]}" if end[0] == 'end' and end[1] else f"last {end[0]}"
+            print(f"{chat_id}:{token}  {len(records)} events, {result}")
+        return
+
+    chat_id, token = find_game(games, args.game)
+    records = games[(chat_id, token)]
+    if args.events:
+        for index, (op, op_args) in enumerate(records[:args.at], 1):
+            print(f"{index:>5} {op:<8} {json.dumps(op_args, ensure_ascii=False)}")
+        return
+    mafia, winner = rebuild(chat_id, records, args.at)
+    if args.json:
+        state = mafia.dump_game(chat_id) if chat_id in mafia.games else None
+        print(json.dumps(state, ensure_ascii=False, indent=1))
+        return
+    at = len(records) if args.at is None else min(args.at, len(records))
+    print(f"game {chat_id}:{token}, event {at}/{len(records)}")
+    print(describe(mafia, chat_id, winner))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,354 @@
+"""Sharded deployment: a front process routes updates to worker processes by chat_id.
+
+Фронт отримує оновлення від Telegram (webhook або long polling) і
+пересилає кожне у воркер, що володіє грою: номер шарду = chat_id % N.
+Кнопки в особистих (нічні дії, голосування) несуть chat_id гри в
+payload callback_data (callbacks.py), тому потрапляють у той самий
+шард, що й групові події.
+Воркер - звичайний main.py в режимі 'shard': власний MafiaGame, своє
+сховище і webhook-сервер на 127.0.0.1, який чує лише фронт.
+Відповідь воркера (inline answerCallbackQuery) фронт повертає Telegram.
+
+Одна активна гра на людину: у межах шарду це перевіряє сам воркер
+(MafiaGame.game_of), а між шардами - фронт. Він пам'ятає шард, де
+людина приєдналась до гри (запис - лише після того, як шард підтвердив
+приєднання через /user-game), і перед приєднанням у чат іншого шарду
+питає той шард, чи гра ще триває. Поки приєднання однієї людини в
+дорозі, її приєднання через інші шарди відхиляються: перевірка і
+резервування - один крок без await, тож два швидкі натискання в різних
+чатах не проходять обидва. Після рестарту фронту пам'ять порожня:
+ігри, відновлені воркерами, до наступного приєднання перевіряються
+лише в межах свого шарду.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+import sys
+from collections import Counter
+from typing import Dict, List, Optional
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+from callbacks import JOIN, decode
+from config import (
+    TELEGRAM_API_URL, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+    SHARD_FRONT_MODE, SHARD_COUNT, SHARD_BASE_PORT,
+)
+from webhook import SECRET_HEADER
+
+logger = logging.getLogger(__name__)
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+
+def update_chat_id(update: dict) -> Optional[int]:
+    """chat_id гри, якій належить оновлення (сирий JSON від Telegram)"""
+    query = update.get('callback_query')
+    if query:
+        payload = decode(query.get('data'))
+        if payload is not None:
+            return payload.chat_id
+        message = query.get('message')
+        if message:
+            return message['chat']['id']
+        return query['from']['id']
+
+    for key in ('message', 'edited_message', 'channel_post'):
+        message = update.get(key)
+        if message:
+            return message['chat']['id']
+    return None
+
+
+def shard_for(chat_id: Optional[int], shards: int) -> int:
+    """Номер шарду для чату (оновлення без чату - у шард 0)"""
+    return chat_id % shards if chat_id is not None else 0
+
+
+class ShardFront:
+    """Фронт: запуск воркерів і маршрутизація оновлень"""
+
+    def __init__(self, token: str, allowed_updates: List[str], shards: int = SHARD_COUNT,
+                 base_port: int = SHARD_BASE_PORT):
+        self.token = token
+        self.allowed_updates = allowed_updates
+        self.shards = shards
+        self.secret = secrets.token_hex(16)  # фронт -> воркер
+        # Telegram -> фронт: без MAFIA_WEBHOOK_SECRET - випадковий на цей запуск
+        self.webhook_secret = WEBHOOK_SECRET or secrets.token_hex(32)
+        self.urls = [f"http://127.0.0.1:{base_port + i}{WEBHOOK_PATH}" for i in range(shards)]
+        self.health_urls = [f"http://127.0.0.1:{base_port + i}/readyz" for i in range(shards)]
+        self.user_game_urls = [f"http://127.0.0.1:{base_port + i}/user-game" for i in range(shards)]
+        # user_id: шард, де людина приєдналась до гри (підтверджено воркером)
+        self.user_shards: Dict[int, int] = {}
+        self._joining: Dict[int, List] = {}  # user_id: [шард, приєднань у дорозі]
+        self.workers: List[asyncio.subprocess.Process] = []
+        self.session: Optional[ClientSession] = None
+        self.stats: Counter = Counter()  # shard: пересланих оновлень
+        self.rejected_joins = 0  # приєднань, відхилених через гру в іншому шарді
+        self._chat_locks: Dict[int, List] = {}  # chat_id: [lock, users]
+        self._tasks: set = set()
+
+    # ---------- воркери ----------
+
+    async def start_workers(self):
+        """Запуск N процесів main.py у режимі 'shard'"""
+        for index in range(self.shards):
+            env = dict(os.environ, TELEGRAM_BOT_TOKEN=self.token, MAFIA_RUN_MODE='shard',
+                       MAFIA_SHARDS=str(self.shards), MAFIA_SHARD_INDEX=str(index),
+                       MAFIA_SHARD_SECRET=self.secret)
+            process = await asyncio.create_subprocess_exec(sys.executable, MAIN_PATH, env=env)
+            self.workers.append(process)
+        logger.info(f"🧩 Запущено воркерів: {self.shards}")
+
+    async def wait_ready(self, timeout: float = 60):
+        """Чекаємо, поки всі воркери відповідають на /readyz"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        pending = set(range(self.shards))
+        while pending:
+            for index in list(pending):
+                if self.workers[index].returncode is not None:
+                    raise RuntimeError(f"Воркер {index} завершився з кодом {self.workers[index].returncode}")
+                try:
+                    async with self.session.get(self.health_urls[index]) as response:
+                        if response.status == 200:
+                            pending.discard(index)
+                except OSError:
+                    pass
+            if pending:
+                if loop.time() > deadline:
+                    raise RuntimeError(f"Воркери не готові: {sorted(pending)}")
+                await asyncio.sleep(0.2)
+        logger.info("🧩 Усі воркери готові")
+
+    async def stop_workers(self):
+        for process in self.workers:
+            if process.returncode is None:
+                process.send_signal(signal.SIGTERM)
+        for process in self.workers:
+            try:
+                await asyncio.wait_for(process.wait(), 10)
+            except asyncio.TimeoutError:
+                process.kill()
+
+    # ---------- маршрутизація ----------
+
+    def claim_join(self, user_id: int, shard: int) -> bool:
+        """Резервує приєднання через shard; False - людина вже приєднується через інший"""
+        # Перевірка і запис без await між ними: конкурентний forward не вклиниться
+        entry = self._joining.get(user_id)
+        if entry is None:
+            entry = self._joining[user_id] = [shard, 0]
+        elif entry[0] != shard:
+            return False
+        entry[1] += 1
+        return True
+
+    def release_join(self, user_id: int):
+        entry = self._joining[user_id]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._joining[user_id]
+
+    async def user_game(self, shard: int, user_id: int) -> Optional[int]:
+        """chat_id активної гри людини в шарді (None - не грає або шард не відповів)"""
+        async with self.session.get(self.user_game_urls[shard], params={'user_id': str(user_id)},
+                                    headers={SECRET_HEADER: self.secret}) as response:
+            if response.status != 200:
+                logger.error(f"Шард {shard} відповів {response.status} на /user-game")
+                return None
+            data = await response.json()
+        return data.get('chat_id')
+
+    async def playing_elsewhere(self, user_id: int, shard: int) -> bool:
+        """Чи має людина активну гру в іншому шарді, ніж shard"""
+        previous = self.user_shards.get(user_id)
+        if previous is None or previous == shard:
+            return False
+        if await self.user_game(previous, user_id) is not None:
+            return True
+        # Гра там закінчилась - запис більше не потрібен
+        if self.user_shards.get(user_id) == previous:
+            del self.user_shards[user_id]
+        return False
+
+    async def confirm_join(self, user_id: int, shard: int, answer: Optional[dict]):
+        """Запам'ятовує шард лише після успішного приєднання"""
+        if answer is None:
+            # Немає inline-відповіді (воркер ще обробляє або помилка) - результату не видно,
+            # вважаємо, що людина приєдналась; зайвий запис нікого не блокує: перевірка питає сам шард
+            self.user_shards[user_id] = shard
+        elif await self.user_game(shard, user_id) is not None:
+            self.user_shards[user_id] = shard
+        elif self.user_shards.get(user_id) == shard:
+            # Лобі повне, гра почалась тощо
+            del self.user_shards[user_id]
+
+    async def forward(self, update: dict) -> Optional[dict]:
+        """Пересилає оновлення у шард гри; повертає inline-відповідь воркера"""
+        chat_id = update_chat_id(update)
+        shard = shard_for(chat_id, self.shards)
+
+        query = update.get('callback_query')
+        payload = decode(query.get('data')) if query else None
+        if payload is None or payload.action != JOIN:
+            return await self._post(chat_id, shard, update)
+
+        user_id = query['from']['id']
+        if not self.claim_join(user_id, shard):
+            self.rejected_joins += 1
+            return already_playing(query)
+        try:
+            if await self.playing_elsewhere(user_id, shard):
+                self.rejected_joins += 1
+                return already_playing(query)
+            answer = await self._post(chat_id, shard, update)
+            await self.confirm_join(user_id, shard, answer)
+            return answer
+        finally:
+            self.release_join(user_id)
+
+    async def _post(self, chat_id: Optional[int], shard: int, update: dict) -> Optional[dict]:
+        self.stats[shard] += 1
+
+        # Оновлення одного чату пересилаються по черзі - воркер отримує їх у порядку надходження
+        entry = self._chat_locks.get(chat_id)
+        if entry is None:
+            entry = self._chat_locks[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self.session.post(self.urls[shard], json=update,
+                                             headers={SECRET_HEADER: self.secret}) as response:
+                    body = await response.read()
+                    if response.status != 200:
+                        logger.error(f"Шард {shard} відповів {response.status}")
+                        return None
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[chat_id]
+        return inline_answer(body)
+
+    async def api(self, method: str, **params):
+        """Виклик Bot API напряму (фронту не потрібен ExtBot)"""
+        url = f"{TELEGRAM_API_URL}/bot{self.token}/{method}"
+        async with self.session.post(url, json=params) as response:
+            data = await response.json()
+        if not data.get('ok'):
+            raise RuntimeError(f"{method}: {data.get('description')}")
+        return data['result']
+
+    # ---------- webhook ----------
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(token, self.webhook_secret):
+            return web.Response(status=403)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        answer = await self.forward(update)
+        if answer:
+            return web.json_response(answer)
+        return web.Response()
+
+    async def run_webhook(self, stop: asyncio.Event):
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle_update)
+        app.router.add_get('/healthz', lambda request: web.Response(text='ok'))
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, WEBHOOK_LISTEN, WEBHOOK_PORT).start()
+        logger.info(f"🌐 Фронт слухає {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        try:
+            await self.api('setWebhook', url=WEBHOOK_URL + WEBHOOK_PATH, secret_token=self.webhook_secret,
+                           allowed_updates=self.allowed_updates)
+            await stop.wait()
+        finally:
+            await runner.cleanup()
+
+    # ---------- long polling ----------
+
+    async def _forward_polled(self, update: dict):
+        answer = await self.forward(update)
+        if answer and answer.get('method'):
+            # Воркер відповів inline - у polling відповідь треба надіслати запитом
+            method = answer.pop('method')
+            try:
+                await self.api(method, **answer)
+            except Exception as e:
+                logger.error(f"Помилка {method}: {e}")
+
+    async def run_polling(self, stop: asyncio.Event):
+        await self.api('deleteWebhook')
+        offset = None
+        logger.info("🔄 Фронт отримує оновлення через long polling")
+        while not stop.is_set():
+            params = {'timeout': 30, 'allowed_updates': self.allowed_updates}
+            if offset is not None:
+                params['offset'] = offset
+            try:
+                updates = await self.api('getUpdates', **params)
+            except Exception as e:
+                logger.error(f"Помилка getUpdates: {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                offset = update['update_id'] + 1
+                task = asyncio.ensure_future(self._forward_polled(update))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+
+def already_playing(query: dict) -> dict:
+    """Inline-відповідь на приєднання людини, що грає в чаті іншого шарду"""
+    return {'method': 'answerCallbackQuery', 'callback_query_id': query['id'],
+            'text': "⚠️ Ви вже граєте в іншому чаті!", 'show_alert': True}
+
+
+def inline_answer(body: bytes) -> Optional[dict]:
+    """Тіло відповіді воркера: JSON з inline-методом або порожнє"""
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+async def run_front(token: str, allowed_updates: List[str], mode: str = SHARD_FRONT_MODE):
+    """Запуск фронту з воркерами до SIGINT/SIGTERM"""
+    front = ShardFront(token, allowed_updates)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    # Довгий getUpdates не повинен обриватись таймаутом сесії
+    front.session = ClientSession(timeout=ClientTimeout(total=None, sock_read=60))
+    try:
+        await front.start_workers()
+        await front.wait_ready()
+        if mode == 'polling':
+            poller = asyncio.ensure_future(front.run_polling(stop))
+            await stop.wait()
+            poller.cancel()
+        else:
+            await front.run_webhook(stop)
+    finally:
+        logger.info(f"🧩 Оновлень по шардах: {dict(sorted(front.stats.items()))}, "
+                    f"відхилено приєднань до другої гри: {front.rejected_joins}")
+        await front.stop_workers()
+        await front.session.close()
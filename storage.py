@@ -0,0 +1,121 @@
+"""Storage backends for MafiaGame: in-memory and SQLite write-ahead journal.
+
+Кожна зміна стану гри записується як компактний запис (op, args) у
+журнал. Періодично для гри робиться знімок стану, а старі записи
+журналу видаляються, тому відновлення після рестарту програє лише
+короткий хвіст записів.
+"""
+
+import json
+import logging
+import sqlite3
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Кожні N записів журналу для гри робимо знімок стану
+SNAPSHOT_EVERY = 64
+
+Record = Tuple[str, list]
+
+
+class MemoryStore:
+    """Сховище за замовчуванням: нічого не зберігає (стан лише в пам'яті)"""
+
+    def append(self, chat_id: int, op: str, args: list) -> bool:
+        """Запис зміни; повертає True, якщо час зробити знімок"""
+        return False
+
+    def snapshot(self, chat_id: int, state: dict):
+        """Збереження повного стану гри"""
+
+    def delete(self, chat_id: int):
+        """Видалення всіх даних гри"""
+
+    def load(self) -> Iterator[Tuple[int, Optional[dict], List[Record]]]:
+        """Повертає (chat_id, знімок, хвіст журналу) для кожної збереженої гри"""
+        return iter(())
+
+    def close(self):
+        """Закриття сховища"""
+
+
+class SQLiteStore(MemoryStore):
+    """Журнал змін у SQLite (WAL) зі знімками стану"""
+
+    def __init__(self, path: str, snapshot_every: int = SNAPSHOT_EVERY):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self._pending: Dict[int, int] = defaultdict(int)  # chat_id: записів після знімка
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                args TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS journal_chat ON journal (chat_id, seq);
+            CREATE TABLE IF NOT EXISTS snapshots (
+                chat_id INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                state TEXT NOT NULL
+            );
+            """
+        )
+
+    def append(self, chat_id: int, op: str, args: list) -> bool:
+        self.conn.execute(
+            "INSERT INTO journal (chat_id, op, args) VALUES (?, ?, ?)",
+            (chat_id, op, json.dumps(args, ensure_ascii=False, separators=(',', ':')))
+        )
+        self._pending[chat_id] += 1
+        return self._pending[chat_id] >= self.snapshot_every
+
+    def snapshot(self, chat_id: int, state: dict):
+        # Знімок і обрізання журналу - в одній транзакції
+        with self.conn:
+            self.conn.execute("BEGIN")
+            seq = self.conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM journal WHERE chat_id = ?", (chat_id,)
+            ).fetchone()[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO snapshots (chat_id, seq, state) VALUES (?, ?, ?)",
+                (chat_id, seq, json.dumps(state, ensure_ascii=False, separators=(',', ':')))
+            )
+            self.conn.execute("DELETE FROM journal WHERE chat_id = ? AND seq <= ?", (chat_id, seq))
+        self._pending[chat_id] = 0
+
+    def delete(self, chat_id: int):
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.execute("DELETE FROM journal WHERE chat_id = ?", (chat_id,))
+            self.conn.execute("DELETE FROM snapshots WHERE chat_id = ?", (chat_id,))
+        self._pending.pop(chat_id, None)
+
+    def load(self) -> Iterator[Tuple[int, Optional[dict], List[Record]]]:
+        snapshots: Dict[int, Tuple[int, dict]] = {}
+        for chat_id, seq, state in self.conn.execute("SELECT chat_id, seq, state FROM snapshots"):
+            snapshots[chat_id] = (seq, json.loads(state))
+
+        tails: Dict[int, List[Record]] = defaultdict(list)
+        for chat_id, seq, op, args in self.conn.execute(
+            "SELECT chat_id, seq, op, args FROM journal ORDER BY seq"
+        ):
+            snap = snapshots.get(chat_id)
+            if snap and seq <= snap[0]:
+                continue
+            tails[chat_id].append((op, json.loads(args)))
+
+        for chat_id in snapshots.keys() | tails.keys():
+            snap = snapshots.get(chat_id)
+            records = tails.get(chat_id, [])
+            self._pending[chat_id] = len(records)
+            yield chat_id, snap[1] if snap else None, records
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,75 @@
+"""Outbound does not merge flavor lines into a message that is edited afterwards.
+
+Картопля і перше повідомлення живого підсумку ходів чекають у черзі
+одного чату з однаковими параметрами. Злиття дописало б картоплю до
+підсумку (і перше ж редагування підсумку стерло б її) або підсумок до
+картоплі (і підсумок лишився б без message_id).
+
+Запуск: python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.constants import ParseMode  # noqa: E402
+
+from clock import VirtualClock, game_clock  # noqa: E402
+from handlers import FLAVOR_MESSAGE, PROGRESS_MESSAGE  # noqa: E402
+from outbound import PHASE, OutboundScheduler  # noqa: E402
+
+CHAT = -100
+POTATO = ("🥔 <i>Десь у темряві пролетіла картопля...</i>", FLAVOR_MESSAGE)
+TALLY = ("🌙 <b>Зробили вибір</b> 1/3:\nplayer1", PROGRESS_MESSAGE)
+
+
+async def queue_together(*messages) -> tuple:
+    """Повідомлення стають у чергу чату, поки він зайнятий оголошенням фази"""
+    previous = game_clock.use(VirtualClock())
+    scheduler = OutboundScheduler()
+    sent = []
+    release = asyncio.Event()
+
+    async def phase(endpoint: str, data: dict):
+        await release.wait()
+        return True
+
+    async def send_message(endpoint: str, data: dict):
+        # Як Bot._do_post: злитий текст outbound дописує в data
+        sent.append(data['text'])
+        return {'message_id': len(sent)}
+
+    def request(callback, text: str, rate_limit_args: dict):
+        data = {'chat_id': CHAT, 'text': text, 'parse_mode': ParseMode.HTML}
+        return asyncio.ensure_future(
+            scheduler.process_request(callback, ('sendMessage', data), {}, 'sendMessage', data, rate_limit_args))
+
+    try:
+        busy = request(phase, "🌙 <b>НІЧ</b>", {'priority': PHASE})
+        await asyncio.sleep(0)
+        queued = [request(send_message, text, args) for text, args in messages]
+        await asyncio.sleep(0)
+        release.set()
+        await busy
+        results = await asyncio.gather(*queued)
+    finally:
+        game_clock.use(previous)
+    return results, sent, scheduler.stats
+
+
+def test_tally_not_merged_with_potato():
+    for messages in ((POTATO, TALLY), (TALLY, POTATO)):
+        results, sent, stats = asyncio.run(queue_together(*messages))
+        assert sent == [text for text, _ in messages]
+        assert all(result is not None for result in results)
+        assert not stats['merged']
+
+
+def test_flavor_lines_still_merged():
+    lines = [(f"🤖 <b>Бот {i}</b> зробив свій вибір...", FLAVOR_MESSAGE) for i in range(3)]
+    results, sent, stats = asyncio.run(queue_together(*lines))
+    assert sent == ['\n'.join(text for text, _ in lines)]
+    assert results[1:] == [None, None]
+    assert stats['merged'] == 2
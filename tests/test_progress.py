@@ -0,0 +1,60 @@
+"""The live move tally of every phase counts each move once and ends at N/N.
+
+Гри лише з людьми (оголошення ботів відкладені, і фаза закривається
+раніше, ніж вони всі прозвучать), тож кожен хід потрапляє в підсумок
+одразу. Останній хід, що закриває фазу чи гру, має бути в підсумку
+своєї фази, а не наступної; вночі рахуються лише ролі з нічною дією.
+
+Запуск: python -m pytest tests
+"""
+
+import asyncio
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers import PROGRESS_TITLES  # noqa: E402
+from harness import GameHarness  # noqa: E402
+
+GAMES = 8
+PLAYERS = 6
+TALLY = re.compile(r'(?P<title>.+) (?P<count>\d+)/(?P<total>\d+):\n(?P<names>.*)', re.S)
+
+
+def tallies(texts) -> list:
+    """Останній стан кожного підсумку: (фаза, ходів, очікується, імена)"""
+    titles = {title: phase for phase, title in PROGRESS_TITLES.items()}
+    finished, current = [], {}
+    for chat_id, text in texts:
+        match = TALLY.fullmatch(text)
+        if match is None or match['title'] not in titles:
+            continue
+        state = (titles[match['title']], int(match['count']), int(match['total']),
+                 match['names'].split(', ') if match['names'] else [])
+        previous = current.get(chat_id)
+        # Нова фаза або новий підсумок тієї ж фази (наступний день)
+        if previous is not None and (previous[0] != state[0] or state[1] <= previous[1]):
+            finished.append(previous)
+        current[chat_id] = state
+    return finished + list(current.values())
+
+
+async def play() -> tuple:
+    async with GameHarness(seed=3) as harness:
+        # Ігри по черзі: блокування завантаження GIF живуть між циклами подій тестів
+        finished = [await harness.run(harness.play(-(i + 1), players=PLAYERS, bots=0)) for i in range(GAMES)]
+    return finished, harness.request.texts, harness.errors.records
+
+
+def test_progress_tally_complete():
+    finished, texts, errors = asyncio.run(play())
+    assert all(result == [True] for result in finished)
+    assert not errors
+
+    results = tallies(texts)
+    assert {phase for phase, _, _, _ in results} == set(PROGRESS_TITLES)
+    for phase, count, total, names in results:
+        assert count == len(names) == len(set(names)), (phase, count, names)
+        assert count == total, (phase, count, total, names)
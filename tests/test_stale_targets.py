@@ -0,0 +1,88 @@
+"""Buttons with a target that is not an alive player are rejected, not crashed on.
+
+Ціль кнопки приходить з callback_data, тож підроблена кнопка або ціль,
+що вже вибула, не повинна ламати хендлер KeyError-ом: гравець бачить
+"Недійсна ціль", хід не записується, в лозі немає помилок.
+
+Запуск: python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import CallbackContext  # noqa: E402
+
+import handlers  # noqa: E402
+from callbacks import NIGHT_CHECK, NIGHT_HEAL, NIGHT_KILL, NOMINATE, encode  # noqa: E402
+from fake_telegram import callback_update  # noqa: E402
+from game_state import mafia_game  # noqa: E402
+from harness import GameHarness  # noqa: E402
+
+HUMAN = 1
+STRANGER = 999999  # id, якого немає в грі
+ACTIONS = {'kill': NIGHT_KILL, 'heal': NIGHT_HEAL, 'check': NIGHT_CHECK}
+
+
+def make_game(chat_id: int) -> str:
+    """Гра з людиною і 9 ботами; повертає нічну дію ролі людини (або None)"""
+    mafia_game.create_game(chat_id, admin_id=HUMAN)
+    mafia_game.add_player(chat_id, HUMAN, "player1")
+    mafia_game.add_bots(chat_id, 9)
+    mafia_game.assign_roles(chat_id)
+    return mafia_game.get_role_info(mafia_game.games[chat_id].players[HUMAN].role).get('action')
+
+
+async def press(harness: GameHarness, chat_id: int, action: int, target: int) -> str:
+    """Людина тисне кнопку з ціллю target; повертає останній текст бота їй"""
+    game = mafia_game.games[chat_id]
+    data = encode(action, chat_id, game.token, game.generation, target)
+    await harness.send(callback_update(HUMAN, 1, HUMAN, data))
+    return [text for to, text in harness.request.texts if to == HUMAN][-1]
+
+
+async def run() -> dict:
+    results = {}
+    async with GameHarness(seed=3) as harness:
+        context = CallbackContext(harness.application)
+
+        # Ніч: людина з нічною дією, ціль - чужий id і мертвий гравець
+        chat_id = -1
+        role_action = make_game(chat_id)
+        while role_action not in ACTIONS:
+            handlers.close_game(chat_id)
+            chat_id -= 1
+            role_action = make_game(chat_id)
+        action = ACTIONS[role_action]
+        await handlers.start_night(context, chat_id)
+        game = mafia_game.games[chat_id]
+        dead = next(uid for uid in game.bots if uid in game.alive_players)
+        mafia_game.kill_players(chat_id, [dead])
+        results['night_stranger'] = await press(harness, chat_id, action, STRANGER)
+        results['night_dead'] = await press(harness, chat_id, action, dead)
+        results['night_recorded'] = HUMAN in game.night_actions
+        handlers.close_game(chat_id)
+
+        # Висунення: чужий id
+        chat_id -= 1
+        make_game(chat_id)
+        await handlers.start_voting(context, chat_id)
+        game = mafia_game.games[chat_id]
+        results['nominate_stranger'] = await press(harness, chat_id, NOMINATE, STRANGER)
+        results['nominate_recorded'] = HUMAN in game.votes
+        handlers.close_game(chat_id)
+
+        await harness.clock.settle()
+        results['errors'] = harness.errors.records
+    return results
+
+
+def test_invalid_targets_rejected():
+    results = asyncio.run(run())
+    for key in ('night_stranger', 'night_dead', 'nominate_stranger'):
+        assert 'Недійсна ціль' in results[key], (key, results[key])
+    assert not results['night_recorded']
+    assert not results['nominate_recorded']
+    assert not results['errors']
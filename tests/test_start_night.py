@@ -0,0 +1,90 @@
+"""start_night returns without waiting for bot announcements, and the announcements arrive on time.
+
+Той самий сценарій, що й benchmarks/bench_start_night.py: 1 людина + 14
+ботів у GameHarness з віртуальним годинником і RTT 50 мс на запит до
+Bot API, тож тест триває частки секунди.
+
+Запуск: python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from telegram.ext import Application, CallbackContext  # noqa: E402
+
+from bench_start_night import SlowRequest, measure  # noqa: E402
+from clock import VirtualClock, game_clock  # noqa: E402
+from game_state import mafia_game  # noqa: E402
+from handlers import BOT_ANNOUNCEMENTS, close_game, phase_delay  # noqa: E402
+from harness import GameHarness  # noqa: E402
+
+RTT = 0.05
+NIGHTS = 5
+
+
+async def run_nights() -> tuple:
+    harness = GameHarness(seed=7)
+    harness.request = SlowRequest(harness.server)
+    async with harness:
+        harness.request.rtt = RTT
+        results = [await measure(harness, -(night + 1)) for night in range(NIGHTS)]
+        harness.request.rtt = 0.0
+    return results, harness.errors.records
+
+
+def create_task_warnings(caught) -> list:
+    return [w for w in caught if 'create_task' in str(w.message) or 'not running' in str(w.message)]
+
+
+def test_start_night_latency():
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        results, errors = asyncio.run(run_nights())
+
+    _, min_delay, max_delay = BOT_ANNOUNCEMENTS['night']
+    for result in results:
+        # Хендлер тримають лише запити фази (GIF і кнопки паралельно), а не паузи ботів
+        assert result['returned'] < min_delay / 2, result
+        assert result['armed'], result
+        assert result['acting'] > 0
+        assert result['moves'] == result['acting'], result
+        # Паузи 1-3 с на кожного бота з дією, плюс запити на оголошення
+        assert result['announced'] <= result['acting'] * max_delay + 1, result
+    assert not errors
+    assert not create_task_warnings(caught)
+
+
+async def delayed_outside_application() -> list:
+    """phase_delay з Application, який не запускали (як у бенчмарках і при відновленні)"""
+    clock = VirtualClock()
+    previous = game_clock.use(clock)
+    chat_id = -999
+    fired = []
+
+    async def callback(context, chat_id, value):
+        fired.append((clock.now(), value))
+
+    try:
+        application = Application.builder().token('1:test').job_queue(None).build()
+        mafia_game.create_game(chat_id, admin_id=1)
+        phase_delay(CallbackContext(application, chat_id=chat_id), callback, 2.0, chat_id, value='done')
+        await clock.advance(5)
+    finally:
+        close_game(chat_id)
+        game_clock.use(previous)
+    return fired
+
+
+def test_phase_delay_outside_application():
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        fired = asyncio.run(delayed_outside_application())
+    assert fired == [(2.0, 'done')]
+    # Відкладені дії не йдуть через Application.create_task, який поза запущеним Application попереджає
+    assert not create_task_warnings(caught)
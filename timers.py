@@ -0,0 +1,148 @@
+"""Phase timer manager: one active deadline per game on a single heap.
+
+Замість окремого job APScheduler на кожну фазу кожної гри всі дедлайни
+лежать в одній купі (heapq), яку обслуговує одна asyncio-задача. Гра має
+не більше одного активного таймера: новий arm() замінює попередній,
+cancel() прибирає його при достроковому завершенні фази, remaining()
+показує, скільки часу лишилось. Скасовані записи видаляються з купи
+ліниво, а коли їх накопичується забагато - купа перебудовується.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from clock import game_clock
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseTimer:
+    """Активний дедлайн фази однієї гри"""
+
+    __slots__ = ('chat_id', 'deadline', 'callback', 'generation', 'cancelled')
+
+    def __init__(self, chat_id: int, deadline: float, callback: Callable, generation: Optional[int]):
+        self.chat_id = chat_id
+        self.deadline = deadline
+        self.callback = callback
+        self.generation = generation  # покоління фази гри на момент arm()
+        self.cancelled = False
+
+
+class PhaseTimers:
+    """Менеджер таймерів фаз для всіх ігор"""
+
+    def __init__(self, clock: Callable[[], float] = game_clock.now):
+        self.clock = clock
+        self._heap: List[Tuple[float, int, PhaseTimer]] = []
+        self._active: Dict[int, PhaseTimer] = {}  # chat_id: таймер
+        self._seq = itertools.count()
+        self._dispatch: Optional[Callable[[PhaseTimer], Awaitable[Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running: set = set()  # задачі колбеків, що виконуються
+        self.stats: Counter = Counter()  # armed, cancelled, fired
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def start(self, dispatch: Callable[[PhaseTimer], Awaitable[Any]]):
+        """Запуск обслуговування купи; dispatch викликається для кожного дедлайну"""
+        self._dispatch = dispatch
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Зупинка (активні таймери лишаються в пам'яті)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def arm(self, chat_id: int, callback: Callable, delay: float,
+            generation: Optional[int] = None) -> PhaseTimer:
+        """Ставить таймер фази гри, замінюючи попередній"""
+        self.cancel(chat_id, count=False)
+        timer = PhaseTimer(chat_id, self.clock() + delay, callback, generation)
+        self._active[chat_id] = timer
+        heapq.heappush(self._heap, (timer.deadline, next(self._seq), timer))
+        self.stats['armed'] += 1
+        # Новий дедлайн раніший за поточний - будимо цикл
+        if self._wakeup is not None and self._heap[0][2] is timer:
+            self._wakeup.set()
+        return timer
+
+    def cancel(self, chat_id: int, count: bool = True) -> bool:
+        """Скасування таймера гри (фаза завершилась достроково або гра закінчилась)"""
+        timer = self._active.pop(chat_id, None)
+        if timer is None:
+            return False
+        timer.cancelled = True
+        if count:
+            self.stats['cancelled'] += 1
+        # Скасовані записи лишаються в купі; перебудова, коли їх більше половини
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._active):
+            self._compact()
+        return True
+
+    def remaining(self, chat_id: int) -> Optional[float]:
+        """Скільки секунд лишилось до дедлайну фази (None - таймера немає)"""
+        timer = self._active.get(chat_id)
+        if timer is None:
+            return None
+        return max(0.0, timer.deadline - self.clock())
+
+    def get(self, chat_id: int) -> Optional[PhaseTimer]:
+        return self._active.get(chat_id)
+
+    def _compact(self):
+        self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+        heapq.heapify(self._heap)
+
+    def pop_due(self, now: float) -> List[PhaseTimer]:
+        """Забирає з купи всі таймери з дедлайном <= now"""
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            timer = heapq.heappop(heap)[2]
+            if timer.cancelled:
+                continue
+            del self._active[timer.chat_id]
+            due.append(timer)
+        return due
+
+    def next_deadline(self) -> Optional[float]:
+        """Найближчий дійсний дедлайн"""
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            for timer in self.pop_due(self.clock()):
+                self.stats['fired'] += 1
+                task = asyncio.ensure_future(self._fire(timer))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            await game_clock.wait(self._wakeup, timeout)
+
+    async def _fire(self, timer: PhaseTimer):
+        try:
+            await self._dispatch(timer)
+        except Exception:
+            logger.exception(f"Помилка таймера фази для чату {timer.chat_id}")
+
+
+phase_timers = PhaseTimers()
@@ -0,0 +1,186 @@
+"""Webhook run mode: built-in aiohttp server as an alternative to long polling.
+
+Сервер приймає оновлення від Telegram, перевіряє секретний токен і
+передає їх у Application. Для натискань кнопок перший answerCallbackQuery
+повертається прямо у відповіді на webhook, що економить один HTTP-запит.
+Також доступні /healthz (процес живий) та /readyz (бот готовий), а у
+воркера шардів - /user-game (у якій грі людина, для фронту).
+"""
+
+import asyncio
+import hmac
+import logging
+import secrets
+import signal
+from typing import Callable, Dict, Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application, ExtBot
+
+from config import (
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH,
+    WEBHOOK_SECRET, WEBHOOK_INLINE_ANSWERS, WEBHOOK_INLINE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookBot(ExtBot):
+    """ExtBot, що може віддати answerCallbackQuery у відповідь на webhook"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._inline_answers: Dict[str, asyncio.Future] = {}
+
+    def expect_answer(self, callback_query_id: str) -> asyncio.Future:
+        """Реєструє очікування відповіді на колбек"""
+        future = asyncio.get_running_loop().create_future()
+        self._inline_answers[callback_query_id] = future
+        return future
+
+    def forget_answer(self, callback_query_id: str):
+        self._inline_answers.pop(callback_query_id, None)
+
+    async def answer_callback_query(self, callback_query_id: str, text: str = None,
+                                    show_alert: bool = None, url: str = None,
+                                    cache_time: int = None, **kwargs) -> bool:
+        future = self._inline_answers.pop(callback_query_id, None)
+        if future is not None and not future.done():
+            params = {'callback_query_id': callback_query_id}
+            for key, value in (('text', text), ('show_alert', show_alert),
+                               ('url', url), ('cache_time', cache_time)):
+                if value is not None:
+                    params[key] = value
+            future.set_result(params)
+            return True
+        return await super().answer_callback_query(
+            callback_query_id, text=text, show_alert=show_alert, url=url,
+            cache_time=cache_time, **kwargs
+        )
+
+
+class WebhookServer:
+    """HTTP-сервер для webhook, health та readiness"""
+
+    def __init__(self, application: Application, path: str = WEBHOOK_PATH,
+                 secret: Optional[str] = WEBHOOK_SECRET,
+                 inline_answers: bool = WEBHOOK_INLINE_ANSWERS,
+                 user_game: Optional[Callable[[int], Optional[int]]] = None):
+        if not secret:
+            # Без токена будь-хто, хто бачить порт, міг би слати підроблені оновлення
+            raise ValueError("Webhook-сервер потребує секретного токена")
+        self.application = application
+        self.path = path
+        self.secret = secret
+        self.inline_answers = inline_answers and isinstance(application.bot, WebhookBot)
+        self.ready = False
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get('/healthz', self.handle_health)
+        self.app.router.add_get('/readyz', self.handle_ready)
+        self.user_game = user_game
+        if user_game is not None:
+            self.app.router.add_get('/user-game', self.handle_user_game)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.Response(text='ok')
+
+    async def handle_ready(self, request: web.Request) -> web.Response:
+        if self.ready and self.application.running:
+            return web.Response(text='ready')
+        return web.Response(status=503, text='not ready')
+
+    async def handle_user_game(self, request: web.Request) -> web.Response:
+        """chat_id активної гри людини в цьому процесі (null - не грає)"""
+        token = request.headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(token, self.secret):
+            return web.Response(status=403)
+        try:
+            user_id = int(request.query['user_id'])
+        except (KeyError, ValueError):
+            return web.Response(status=400)
+        return web.json_response({'chat_id': self.user_game(user_id)})
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(token, self.secret):
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        bot = self.application.bot
+        update = Update.de_json(data, bot)
+        if update is None:
+            return web.Response(status=400)
+
+        query = update.callback_query
+        if not (self.inline_answers and query):
+            await self.application.update_queue.put(update)
+            return web.Response()
+
+        future = bot.expect_answer(query.id)
+        await self.application.update_queue.put(update)
+        try:
+            params = await asyncio.wait_for(asyncio.shield(future), WEBHOOK_INLINE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Хендлер не встиг - відповідь піде звичайним запитом
+            bot.forget_answer(query.id)
+            return web.Response()
+        return web.json_response({'method': 'answerCallbackQuery', **params})
+
+
+async def run_webhook(application: Application, allowed_updates: list,
+                      listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT,
+                      secret: Optional[str] = WEBHOOK_SECRET, register: bool = True,
+                      user_game: Optional[Callable[[int], Optional[int]]] = None):
+    """Запуск бота в режимі webhook до SIGINT/SIGTERM.
+
+    register=False - webhook у Telegram реєструє хтось інший (фронт шардів),
+    і секрет обов'язковий; інакше без MAFIA_WEBHOOK_SECRET генерується
+    випадковий токен на цей запуск.
+    """
+    if not secret and register:
+        secret = secrets.token_hex(32)
+        logger.info("🔑 MAFIA_WEBHOOK_SECRET не задано - згенеровано секретний токен webhook")
+    server = WebhookServer(application, secret=secret, user_game=user_game)
+    runner = web.AppRunner(server.app)
+    await runner.setup()
+    site = web.TCPSite(runner, listen, port)
+    await site.start()
+    logger.info(f"🌐 Webhook сервер слухає {listen}:{port}{WEBHOOK_PATH}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    try:
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        if register:
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL + WEBHOOK_PATH,
+                secret_token=secret,
+                allowed_updates=allowed_updates,
+            )
+        server.ready = True
+        await stop.wait()
+    finally:
+        server.ready = False
+        await runner.cleanup()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)